@@ -0,0 +1,57 @@
+"""Compare the DataFrame based graph build with the streaming converter.
+
+python benchmarks/bench_convert.py --sizes 10000 100000 1000000
+"""
+
+import argparse
+import time
+
+from synthetic import load_pipeline, path_result, subgraph_result
+
+
+def build_via_df(app, result):
+    # the former build path: result_to_df, then iterrows and render_pd_item
+    model = app.GraphModel()
+    result_df = app.result_to_df(result)
+    for _, row in result_df.iterrows():
+        for item in row:
+            app.render_pd_item(model, item)
+    return model
+
+
+def build_streaming(app, result):
+    return app.create_graph(result)
+
+
+def timed(build, app, result):
+    start = time.perf_counter()
+    model = build(app, result)
+    return time.perf_counter() - start, model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    args = parser.parse_args()
+
+    app = load_pipeline()
+    print(
+        f"{'shape':<10}{'edges':>10}{'dataframe s':>14}{'streaming s':>14}{'speedup':>9}"
+    )
+    for size in args.sizes:
+        for shape, make in (("path", path_result), ("subgraph", subgraph_result)):
+            result = make(size)
+            df_seconds, model_df = timed(build_via_df, app, result)
+            stream_seconds, model = timed(build_streaming, app, result)
+            assert model.node_ids == model_df.node_ids
+            assert model.num_edges == model_df.num_edges
+            print(
+                f"{shape:<10}{size:>10}{df_seconds:>14.3f}{stream_seconds:>14.3f}"
+                f"{df_seconds / stream_seconds:>8.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
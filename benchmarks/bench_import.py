@@ -0,0 +1,83 @@
+"""Time a bulk import of a synthetic space, per batch size and concurrency.
+
+The CSV files of a space are written by a bulk export of MockStorage, then
+imported into a MockImportGraphd, which takes every INSERT statement in
+--delay seconds, the round trip to graphd and storaged. Rows per second
+should grow with both the rows per statement and the sessions sending them
+while the delay dominates.
+
+python benchmarks/bench_import.py --batch-rows 64 256 1024 --workers 1 4 8
+python benchmarks/bench_import.py --delay 0.02 --fail-every 10
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from synthetic import MockImportGraphd, MockStorage, load_pipeline
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--vertices", type=int, default=20_000)
+    parser.add_argument("--edges", type=int, default=100_000)
+    parser.add_argument("--batch-rows", type=int, nargs="+", default=[64, 256, 1024])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument(
+        "--delay", type=float, default=0.005, help="seconds per INSERT statement"
+    )
+    parser.add_argument(
+        "--fail-every",
+        type=int,
+        default=0,
+        metavar="N",
+        help="fail every N-th statement, to be retried",
+    )
+    args = parser.parse_args()
+
+    ng = load_pipeline()
+    ng.IMPORT_RETRY_SECONDS = 0.0
+    source = MockStorage(args.vertices, args.edges)
+    with tempfile.TemporaryDirectory() as directory:
+        for _ in ng.bulk_export(source, "bench", ["player"], ["follow"], directory):
+            pass
+        files = sorted(os.listdir(directory))
+        print(
+            f"{'batch':>8}{'workers':>8}{'rows':>10}{'seconds':>10}"
+            f"{'rows/s':>10}{'retries':>8}"
+        )
+        for batch_rows in args.batch_rows:
+            for workers in args.workers:
+                graphd = MockImportGraphd(args.delay, args.fail_every)
+                manager = ng.get_session_manager()
+                manager.close()
+                manager.pool_factory = graphd
+
+                def records():
+                    for name in files:
+                        with open(os.path.join(directory, name), "rb") as f:
+                            yield from ng.graph_records(name, f)
+
+                start = time.perf_counter()
+                for imported in ng.bulk_import(
+                    records(),
+                    "bench",
+                    "mock",
+                    9669,
+                    batch_rows=batch_rows,
+                    workers=workers,
+                ):
+                    pass
+                seconds = time.perf_counter() - start
+                rows = sum(graphd.inserted.values())
+                print(
+                    f"{batch_rows:>8}{workers:>8}{rows:>10}{seconds:>10.2f}"
+                    f"{rows / seconds:>10.0f}{imported.retries:>8}"
+                )
+
+
+if __name__ == "__main__":
+    main()
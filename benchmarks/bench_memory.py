@@ -0,0 +1,95 @@
+"""Hold the artifacts of many app sessions under the memory caps.
+
+Every session stores what a batch of the app does: its result and graph,
+spilled to disk when evicted, and the table and HTML page of the graph,
+dropped when evicted. Then each session comes back to its graph and table,
+as a rerun of the app does, loading or building them again.
+
+    held    bytes charged in memory once all sessions stored their batch
+    rss     max resident memory of the process
+    store   seconds to store the batches of all sessions
+    access  seconds for all sessions to get their graph and table back
+
+python benchmarks/bench_memory.py --sessions 10 --size 100000
+python benchmarks/bench_memory.py --session-max-mb 1024 --max-mb 100000
+"""
+
+import argparse
+import resource
+import tempfile
+import time
+
+from synthetic import SHAPES, MockGraphd, load_pipeline
+
+SPACE = "bench"
+
+
+def store_batch(ng, artifacts, result) -> None:
+    artifacts.put(("result", 0), result, spill=True)
+    model = ng.create_graph(result)
+    artifacts.put(("graph",), model, spill=True)
+    artifacts.put(("frame", 0), ng.result_frame(result))
+    artifacts.put(("export", 1, "html"), ng.compact_html(ng.to_network(model)))
+
+
+def access(ng, artifacts) -> None:
+    if artifacts.get(("graph",)) is None:
+        raise RuntimeError("a spilled graph was lost")
+    if artifacts.get(("frame", 0)) is None:
+        artifacts.put(("frame", 0), ng.result_frame(artifacts.get(("result", 0))))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--size", type=int, default=20_000, help="edges per result")
+    parser.add_argument("--shape", choices=list(SHAPES), default="edges")
+    parser.add_argument("--session-max-mb", type=float, default=None)
+    parser.add_argument("--max-mb", type=float, default=None)
+    args = parser.parse_args()
+
+    ng = load_pipeline()
+    statement = f"-- {args.shape} {args.size}"
+    ng.get_session_manager().pool_factory = MockGraphd(
+        {statement: SHAPES[args.shape](args.size)}
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        manager = ng.MemoryManager(
+            session_max_bytes=(
+                int(args.session_max_mb * 2**20)
+                if args.session_max_mb
+                else ng.SESSION_MEMORY_MAX_BYTES
+            ),
+            max_bytes=int(args.max_mb * 2**20) if args.max_mb else ng.MEMORY_MAX_BYTES,
+            directory=directory,
+        )
+        # decoded once, the sessions share it as they would equal results
+        result = ng.run_statements([statement], SPACE, "mock", 9669)[0][0]
+        sessions = [manager.session() for _ in range(args.sessions)]
+        start = time.perf_counter()
+        for artifacts in sessions:
+            store_batch(ng, artifacts, result)
+        stored = time.perf_counter() - start
+        held = manager.stats()
+        start = time.perf_counter()
+        for artifacts in sessions:
+            access(ng, artifacts)
+        accessed = time.perf_counter() - start
+        stats = manager.stats()
+    # kilobytes on Linux
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    print(
+        f"{'sessions':>10}{'held MB':>10}{'rss MB':>10}{'store s':>10}"
+        f"{'access s':>10}{'spilled':>10}{'dropped':>10}{'loaded':>10}"
+    )
+    print(
+        f"{args.sessions:>10}{held['bytes'] / 2**20:>10.1f}{rss / 2**20:>10.1f}"
+        f"{stored:>10.2f}{accessed:>10.2f}{stats['spilled']:>10}"
+        f"{stats['dropped']:>10}{stats['loaded']:>10}"
+    )
+
+
+if __name__ == "__main__":
+    main()
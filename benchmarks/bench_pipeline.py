@@ -0,0 +1,206 @@
+"""Time every stage of an export on synthetic results, no NebulaGraph needed.
+
+Statements are answered by a MockGraphd, then each result goes through the
+stages of the app and the command line:
+
+    fetch   run_statements, with thrift decoding of the response
+    cast    result_frame, the table shown and exported as CSV
+    graph   create_graph
+    layout  layout_model, for graphs above LARGE_GRAPH_NODES vertices
+    analytics  analyze, PageRank, eigenvector centrality and communities
+    style   to_network, vertex sizes and colors included
+    gexf    write_gexf
+    html    the pyvis page, as downloaded
+    html_compact  compact_html
+    csv     the CSV of the cast table
+    parquet graph_tables and both tables as Parquet
+
+Peak memory per stage is measured in a second pass, under tracemalloc, so it
+doesn't slow down the timings.
+
+python benchmarks/bench_pipeline.py --sizes 10000 100000 --json head.json
+python benchmarks/bench_pipeline.py --compare base.json head.json
+"""
+
+import argparse
+import json
+import platform
+import resource
+import subprocess
+import time
+import tracemalloc
+from collections import OrderedDict
+
+from synthetic import REPO_ROOT, SHAPES, MockGraphd, load_pipeline
+
+SPACE = "bench"
+
+
+def run_pipeline(ng, statement: str, measure) -> dict:
+    """Run the stages on the result of statement, measure(stage, fn) runs each."""
+    executed = measure(
+        "fetch", lambda: ng.run_statements([statement], SPACE, "mock", 9669)
+    )
+    result = executed[0][0]
+    frame = measure("cast", lambda: ng.result_frame(result))
+    model = measure("graph", lambda: ng.create_graph(result))
+    if model.num_nodes > ng.LARGE_GRAPH_NODES:
+        measure("layout", lambda: ng.layout_model(model))
+    measure("analytics", lambda: ng.analyze(model))
+    g = measure("style", lambda: ng.to_network(model))
+    measure("gexf", lambda: ng.write_gexf(model).read())
+    measure("html", lambda: ng.generate_download_html(g))
+    measure("html_compact", lambda: ng.compact_html(g))
+    measure("csv", lambda: frame.to_csv(index=False))
+    measure(
+        "parquet",
+        lambda: [ng.table_bytes(table) for table in ng.graph_tables([result])],
+    )
+    return {"vertices": model.num_nodes, "edges": model.num_edges}
+
+
+def timed(seconds: dict):
+    def measure(stage, fn):
+        start = time.perf_counter()
+        out = fn()
+        elapsed = time.perf_counter() - start
+        seconds[stage] = min(seconds.get(stage, elapsed), elapsed)
+        return out
+
+    return measure
+
+
+def traced(peaks: dict):
+    def measure(stage, fn):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        out = fn()
+        peaks[stage] = tracemalloc.get_traced_memory()[1] - before
+        return out
+
+    return measure
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args) -> dict:
+    ng = load_pipeline()
+    # imported lazily by the pipeline, not to be charged to the first case
+    import pandas  # noqa: F401
+    import pyvis.network  # noqa: F401
+
+    cases = [(shape, size) for size in args.sizes for shape in args.shapes]
+    statements = {f"-- {shape} {size}": (shape, size) for shape, size in cases}
+    ng.get_session_manager().pool_factory = MockGraphd(
+        {
+            statement: SHAPES[shape](size)
+            for statement, (shape, size) in statements.items()
+        }
+    )
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "repeat": args.repeat,
+        "results": [],
+    }
+    print(f"{'shape':<10}{'edges':>10}  {'stage':<14}{'seconds':>10}{'peak MB':>10}")
+    for statement, (shape, size) in statements.items():
+        seconds, peaks = OrderedDict(), OrderedDict()
+        for _ in range(args.repeat):
+            counts = run_pipeline(ng, statement, timed(seconds))
+        if args.memory:
+            tracemalloc.start()
+            try:
+                run_pipeline(ng, statement, traced(peaks))
+            finally:
+                tracemalloc.stop()
+        stages = OrderedDict()
+        for stage, elapsed in seconds.items():
+            stages[stage] = {"seconds": round(elapsed, 6)}
+            if stage in peaks:
+                stages[stage]["peak_bytes"] = peaks[stage]
+            peak = f"{peaks[stage] / 2**20:>10.1f}" if stage in peaks else ""
+            print(f"{shape:<10}{size:>10}  {stage:<14}{elapsed:>10.3f}{peak}")
+        report["results"].append(
+            {"shape": shape, "size": size, **counts, "stages": stages}
+        )
+    # kilobytes on Linux
+    report["max_rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return report
+
+
+def compare(base_path: str, head_path: str) -> None:
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(head_path) as f:
+        head = json.load(f)
+    print(f"{base_path} ({base['commit']}) -> {head_path} ({head['commit']})")
+    print(
+        f"{'shape':<10}{'edges':>10}  {'stage':<14}"
+        f"{'base s':>10}{'head s':>10}{'ratio':>8}"
+    )
+    base_results = {(r["shape"], r["size"]): r for r in base["results"]}
+    for result in head["results"]:
+        former = base_results.get((result["shape"], result["size"]))
+        if former is None:
+            continue
+        for stage, measured in result["stages"].items():
+            if stage not in former["stages"]:
+                continue
+            before = former["stages"][stage]["seconds"]
+            after = measured["seconds"]
+            print(
+                f"{result['shape']:<10}{result['size']:>10}  {stage:<14}"
+                f"{before:>10.3f}{after:>10.3f}{after / max(before, 1e-9):>7.2f}x"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument(
+        "--shapes", nargs="+", choices=list(SHAPES), default=list(SHAPES)
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=1, help="runs per case, the fastest is kept"
+    )
+    parser.add_argument(
+        "--no-memory",
+        dest="memory",
+        action="store_false",
+        help="skip the tracemalloc pass",
+    )
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        metavar=("BASE", "HEAD"),
+        help="compare two reports instead of running",
+    )
+    args = parser.parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = run(args)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
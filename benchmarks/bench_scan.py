@@ -0,0 +1,79 @@
+"""Time a bulk export of a synthetic space and measure its peak memory.
+
+MockStorage stands in for storaged, so no NebulaGraph is needed. The CSV
+export streams, so its peak memory should stay flat as the space grows,
+bounded by the batches in flight (SCAN_QUEUE_BATCHES); the GEXF one builds
+the whole GraphModel.
+
+python benchmarks/bench_scan.py --vertices 100000 --edges 1000000 --workers 8
+python benchmarks/bench_scan.py --gexf --delay 0.01
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from synthetic import MockStorage, load_pipeline
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--vertices", type=int, default=20_000)
+    parser.add_argument("--edges", type=int, default=100_000)
+    parser.add_argument("--parts", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-rows", type=int, default=None)
+    parser.add_argument(
+        "--delay", type=float, default=0.0, help="seconds per scan request"
+    )
+    parser.add_argument("--gexf", action="store_true", help="build the GEXF too")
+    parser.add_argument(
+        "--no-memory",
+        dest="memory",
+        action="store_false",
+        help="skip tracemalloc, which slows the scan down",
+    )
+    args = parser.parse_args()
+
+    ng = load_pipeline()
+    source = MockStorage(args.vertices, args.edges, args.parts, args.delay)
+    with tempfile.TemporaryDirectory() as directory:
+        model = ng.GraphModel() if args.gexf else None
+        if args.memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        for export in ng.bulk_export(
+            source,
+            "bench",
+            ["player"],
+            ["follow"],
+            directory,
+            model,
+            workers=args.workers or ng.SCAN_WORKERS,
+            batch_rows=args.batch_rows or ng.SCAN_BATCH_ROWS,
+        ):
+            pass
+        if model is not None:
+            with open(os.path.join(directory, "bench.gexf"), "wb") as out:
+                ng.dump_gexf(model, out)
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if args.memory else None
+        tracemalloc.stop()
+        written = sum(
+            os.path.getsize(os.path.join(directory, name))
+            for name in os.listdir(directory)
+        )
+    rows = export.num_rows
+    print(f"{'rows':>10}{'seconds':>10}{'rows/s':>12}{'MB out':>10}{'peak MB':>10}")
+    print(
+        f"{rows:>10}{seconds:>10.2f}{rows / seconds:>12.0f}{written / 2**20:>10.1f}"
+        + (f"{peak / 2**20:>10.1f}" if peak is not None else "")
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Measure what a cold start and a rerun of the app cost, against a budget.
+
+Each probe runs in a fresh interpreter, so imports are paid as in a new
+container:
+
+    import  import nebulagraph_gephi, which must not load the modules it
+            imports lazily (pandas, pyvis, the nebula3 network client)
+    cold    the first run of the app script, in a process that has only
+            imported streamlit, as the server has
+    rerun   the median of the following reruns, what every interaction of
+            a user costs before any query
+
+The script exits with 1 when a probe is over its budget or a lazy module was
+loaded, so it can gate a CI job.
+
+python benchmarks/bench_startup.py --reruns 20 --json startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# not imported from synthetic, as that loads nebula3 before the probes
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_SCRIPT = os.path.join(REPO_ROOT, "nebulagraph-gephi-exchange.py")
+
+# seconds, about three times what a laptop measures
+IMPORT_BUDGET_SECONDS = 0.5
+COLD_RUN_BUDGET_SECONDS = 0.75
+RERUN_BUDGET_SECONDS = 0.1
+LAZY_MODULES = ("pandas", "pyvis", "networkx", "nebula3.gclient.net", "streamlit")
+
+
+def probe_import() -> dict:
+    sys.path.insert(0, REPO_ROOT)
+    start = time.perf_counter()
+    import nebulagraph_gephi  # noqa: F401
+
+    seconds = time.perf_counter() - start
+    return {
+        "seconds": seconds,
+        "loaded": [name for name in LAZY_MODULES if name in sys.modules],
+    }
+
+
+def probe_app(reruns: int) -> dict:
+    # what `streamlit run` sets up before running the script
+    from unittest.mock import MagicMock
+
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import (
+        MemoryCacheStorageManager,
+    )
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner import ScriptRunnerEvent
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.local_script_runner import LocalScriptRunner
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = runtime
+    sys.path.insert(0, REPO_ROOT)
+    script_cache = ScriptCache()
+
+    def run_once(session_state=None) -> tuple:
+        runner = LocalScriptRunner(APP_SCRIPT, session_state)
+        # shared between runs, as by the sessions of a server
+        runner._script_cache = script_cache
+        marks = {}
+
+        def mark(sender, event, **kwargs):
+            if event not in marks:
+                marks[event] = time.perf_counter()
+
+        runner.on_event.connect(mark, weak=False)
+        tree = runner.run(timeout=60)
+        runner.join()
+        errors = [e.proto.message for e in tree.get("exception")]
+        if errors:
+            raise RuntimeError(f"the app failed: {errors}")
+        seconds = (
+            marks[ScriptRunnerEvent.SCRIPT_STOPPED_WITH_SUCCESS]
+            - marks[ScriptRunnerEvent.SCRIPT_STARTED]
+        )
+        return seconds, runner.session_state
+
+    cold, state = run_once()
+    seconds = []
+    for _ in range(reruns):
+        elapsed, state = run_once(state)
+        seconds.append(elapsed)
+    return {"cold_seconds": cold, "rerun_seconds": seconds}
+
+
+def in_fresh_interpreter(probe: str, reruns: int) -> dict:
+    out = subprocess.run(
+        [sys.executable, __file__, "--probe", probe, "--reruns", str(reruns)],
+        check=True,
+        stdout=subprocess.PIPE,
+        text=True,
+    ).stdout
+    # the app may print, the report is the last line
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--reruns", type=int, default=10)
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET_SECONDS)
+    parser.add_argument("--cold-budget", type=float, default=COLD_RUN_BUDGET_SECONDS)
+    parser.add_argument("--rerun-budget", type=float, default=RERUN_BUDGET_SECONDS)
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--probe", choices=("import", "app"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.probe == "import":
+        print(json.dumps(probe_import()))
+        return 0
+    if args.probe == "app":
+        print(json.dumps(probe_app(args.reruns)))
+        return 0
+
+    imported = in_fresh_interpreter("import", args.reruns)
+    app = in_fresh_interpreter("app", args.reruns)
+    rerun = statistics.median(app["rerun_seconds"])
+    rows = [
+        ("import", imported["seconds"], args.import_budget),
+        ("cold", app["cold_seconds"], args.cold_budget),
+        ("rerun", rerun, args.rerun_budget),
+    ]
+    failed = False
+    print(f"{'probe':<10}{'seconds':>10}{'budget':>10}")
+    for probe, seconds, budget in rows:
+        over = seconds > budget
+        failed |= over
+        print(f"{probe:<10}{seconds:>10.3f}{budget:>10.3f}{'  OVER' if over else ''}")
+    if imported["loaded"]:
+        failed = True
+        print(f"nebulagraph_gephi loaded {', '.join(imported['loaded'])} on import")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "python": sys.version.split()[0],
+                    "import": imported,
+                    "app": app,
+                    "rerun_median_seconds": rerun,
+                    "budgets": {probe: budget for probe, _, budget in rows},
+                },
+                f,
+                indent=2,
+            )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
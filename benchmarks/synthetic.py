@@ -0,0 +1,358 @@
+"""Synthetic nebula3 ResultSets and a mock graphd serving them, so the pipeline
+can be measured without NebulaGraph."""
+
+import importlib
+import os
+import random
+import sys
+import threading
+import time
+from typing import Dict, List
+
+from nebula3.common.ttypes import (
+    DataSet,
+    Edge,
+    ErrorCode,
+    NList,
+    Path,
+    Row,
+    Step,
+    Tag,
+    Value,
+    Vertex,
+)
+from nebula3.data.ResultSet import ResultSet
+from nebula3.fbthrift.protocol.TBinaryProtocol import TBinaryProtocolFactory
+from nebula3.fbthrift.util.Serializer import deserialize, serialize
+from nebula3.graph.ttypes import ExecutionResponse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_pipeline():
+    """Import nebulagraph_gephi, the pipeline module, from the repo root."""
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    return importlib.import_module("nebulagraph_gephi")
+
+
+def make_vertex(vid: int) -> Vertex:
+    return Vertex(
+        vid=Value(sVal=f"player{vid}".encode()),
+        tags=[
+            Tag(
+                name=b"player",
+                props={
+                    b"name": Value(sVal=f"Player {vid}".encode()),
+                    b"age": Value(iVal=20 + vid % 30),
+                },
+            )
+        ],
+    )
+
+
+def make_edge(src: int, dst: int, rank: int = 0) -> Edge:
+    return Edge(
+        src=Value(sVal=f"player{src}".encode()),
+        dst=Value(sVal=f"player{dst}".encode()),
+        type=1,
+        name=b"follow",
+        ranking=rank,
+        props={b"degree": Value(iVal=(src + dst) % 100)},
+    )
+
+
+def make_result(column_names: List[str], rows: List[List[Value]]) -> ResultSet:
+    resp = ExecutionResponse(
+        error_code=ErrorCode.SUCCEEDED,
+        latency_in_us=0,
+        data=DataSet(
+            column_names=[name.encode() for name in column_names],
+            rows=[Row(values=values) for values in rows],
+        ),
+        space_name=b"basketballplayer",
+    )
+    return ResultSet(resp, all_latency=0)
+
+
+def error_result(message: bytes) -> ResultSet:
+    resp = ExecutionResponse(
+        error_code=ErrorCode.E_EXECUTION_ERROR, latency_in_us=0, error_msg=message
+    )
+    return ResultSet(resp, all_latency=0)
+
+
+def path_result(num_edges: int, path_length: int = 3, seed: int = 0) -> ResultSet:
+    """`MATCH p=...-[*path_length]-... RETURN p` like result, one path per row.
+
+    Vertices are drawn from num_edges // 4 ids, so paths share vertices, and
+    every fourth step is reversed.
+    """
+    rng = random.Random(seed)
+    num_vertices = max(num_edges // 4, path_length + 1)
+    rows = []
+    for row_index in range(max(num_edges // path_length, 1)):
+        src = rng.randrange(num_vertices)
+        steps = []
+        for step_index in range(path_length):
+            dst = rng.randrange(num_vertices)
+            steps.append(
+                Step(
+                    dst=make_vertex(dst),
+                    type=-1 if (row_index + step_index) % 4 == 3 else 1,
+                    name=b"follow",
+                    ranking=0,
+                    props={b"degree": Value(iVal=(src + dst) % 100)},
+                )
+            )
+        rows.append([Value(pVal=Path(src=make_vertex(src), steps=steps))])
+    return make_result(["p"], rows)
+
+
+def subgraph_result(num_edges: int, edges_per_row: int = 1000, seed: int = 0):
+    """`GET SUBGRAPH ... YIELD VERTICES AS nodes, EDGES AS relationships` like
+    result: lists of vertices and edges, edges_per_row edges per row.
+    """
+    rng = random.Random(seed)
+    num_vertices = max(num_edges // 4, 2)
+    rows = []
+    for start in range(0, num_edges, edges_per_row):
+        count = min(edges_per_row, num_edges - start)
+        edges = [
+            (rng.randrange(num_vertices), rng.randrange(num_vertices))
+            for _ in range(count)
+        ]
+        vids = sorted({vid for edge in edges for vid in edge})
+        rows.append(
+            [
+                Value(lVal=NList(values=[Value(vVal=make_vertex(v)) for v in vids])),
+                Value(
+                    lVal=NList(
+                        values=[Value(eVal=make_edge(src, dst)) for src, dst in edges]
+                    )
+                ),
+            ]
+        )
+    return make_result(["nodes", "relationships"], rows)
+
+
+def edge_result(num_edges: int, seed: int = 0) -> ResultSet:
+    """`MATCH (v)-[e]->(u) RETURN v, e, u` like result: a Node, a
+    Relationship and a Node per row."""
+    rng = random.Random(seed)
+    num_vertices = max(num_edges // 4, 2)
+    rows = []
+    for _ in range(num_edges):
+        src, dst = rng.randrange(num_vertices), rng.randrange(num_vertices)
+        rows.append(
+            [
+                Value(vVal=make_vertex(src)),
+                Value(eVal=make_edge(src, dst)),
+                Value(vVal=make_vertex(dst)),
+            ]
+        )
+    return make_result(["v", "e", "u"], rows)
+
+
+def nested_result(num_edges: int, paths_per_row: int = 10, seed: int = 0):
+    """`... RETURN collect(p) AS paths, [[id, length]] AS stats` like result:
+    lists of paths, and lists of scalar lists, paths_per_row paths per row."""
+    paths = path_result(num_edges, seed=seed).rows()
+    rows = []
+    for start in range(0, len(paths), paths_per_row):
+        group = [row.values[0] for row in paths[start : start + paths_per_row]]
+        stats = [
+            Value(lVal=NList(values=[Value(iVal=start + i), Value(iVal=3)]))
+            for i in range(len(group))
+        ]
+        rows.append([Value(lVal=NList(values=group)), Value(lVal=NList(values=stats))])
+    return make_result(["paths", "stats"], rows)
+
+
+# result shapes by name, each made by a function of the edge count
+SHAPES = {
+    "path": path_result,
+    "subgraph": subgraph_result,
+    "edges": edge_result,
+    "nested": nested_result,
+}
+
+
+class MockGraphd:
+    """Stands in for nebula3's ConnectionPool, answering statements with
+    canned results.
+
+    Results are thrift encoded once, and every execute decodes its result
+    again, as a session does with a response off the wire. Other statements,
+    such as `USE`, get an empty result.
+    """
+
+    def __init__(self, results: Dict[str, ResultSet]):
+        self.protocol = TBinaryProtocolFactory()
+        self.encoded = {
+            statement: serialize(self.protocol, result._resp)
+            for statement, result in results.items()
+        }
+
+    def __call__(self) -> "MockGraphd":
+        # the session manager calls pool_factory() for every new pool
+        return self
+
+    def init(self, addresses, config) -> bool:
+        return True
+
+    def get_session(self, user: str, password: str) -> "MockSession":
+        return MockSession(self)
+
+    def close(self) -> None:
+        pass
+
+
+class MockSession:
+    def __init__(self, graphd: MockGraphd):
+        self.graphd = graphd
+
+    def execute(self, statement: str) -> ResultSet:
+        encoded = self.graphd.encoded.get(statement.strip())
+        if encoded is None:
+            return make_result([], [])
+        resp = ExecutionResponse()
+        deserialize(self.graphd.protocol, encoded, resp)
+        return ResultSet(resp, all_latency=0)
+
+    def release(self) -> None:
+        pass
+
+
+class MockStorage:
+    """Stands in for StorageScanSource, scanning a synthetic space.
+
+    The space has num_vertices `player` vertices and num_edges `follow`
+    edges spread over parts partitions, by source vertex for edges as
+    storaged keeps them. Batches are built as they are scanned, after
+    delay seconds, the round trip of a scan request.
+    """
+
+    def __init__(
+        self, num_vertices: int, num_edges: int, parts: int = 10, delay: float = 0.0
+    ):
+        self.num_vertices = num_vertices
+        self.num_edges = num_edges
+        self.num_parts = parts
+        self.delay = delay
+
+    def parts(self, space: str) -> List[int]:
+        return list(range(1, self.num_parts + 1))
+
+    def _vertex_row(self, vid: int) -> Row:
+        return Row(
+            values=[
+                Value(sVal=f"player{vid}".encode()),
+                Value(sVal=f"Player {vid}".encode()),
+                Value(iVal=20 + vid % 30),
+            ]
+        )
+
+    def _edge_row(self, edge: int) -> Row:
+        # edges of a vertex are its edge, edge + num_vertices, ...
+        src = edge % self.num_vertices
+        dst = random.Random(edge).randrange(self.num_vertices)
+        return Row(
+            values=[
+                Value(sVal=f"player{src}".encode()),
+                Value(iVal=1),
+                Value(iVal=edge // self.num_vertices),
+                Value(sVal=f"player{dst}".encode()),
+                Value(iVal=(src + dst) % 100),
+            ]
+        )
+
+    def scan(self, space: str, kind: str, name: str, part: int, batch_rows: int):
+        if kind == "vertex":
+            columns = ["_vid", "name", "age"]
+            ids = range(part - 1, self.num_vertices, self.num_parts)
+            make_row = self._vertex_row
+        else:
+            columns = ["_src", "_type", "_rank", "_dst", "degree"]
+            ids = (
+                edge
+                for src in range(part - 1, self.num_vertices, self.num_parts)
+                for edge in range(src, self.num_edges, self.num_vertices)
+            )
+            make_row = self._edge_row
+        column_names = [f"{name}.{column}".encode() for column in columns]
+        batch = []
+        for i in ids:
+            batch.append(make_row(i))
+            if len(batch) == batch_rows:
+                time.sleep(self.delay)
+                yield DataSet(column_names=column_names, rows=batch)
+                batch = []
+        if batch:
+            time.sleep(self.delay)
+            yield DataSet(column_names=column_names, rows=batch)
+
+    def close(self) -> None:
+        pass
+
+
+class MockImportGraphd(MockGraphd):
+    """A MockGraphd taking the INSERT statements of bulk_import.
+
+    It describes the `player` tag and `follow` edge type of MockStorage,
+    with the analytics properties of dump_gexf on player, in a space of
+    FIXED_STRING vids. INSERT statements take delay seconds, every
+    fail_every-th one fails, and the rows of the others are counted in
+    inserted, per tag or edge type.
+    """
+
+    def __init__(self, delay: float = 0.0, fail_every: int = 0):
+        string, integer, double = (
+            Value(sVal=t) for t in (b"string", b"int64", b"double")
+        )
+        super().__init__(
+            {
+                "DESCRIBE SPACE `bench`": make_result(
+                    ["Name", "Vid Type"],
+                    [[Value(sVal=b"bench"), Value(sVal=b"FIXED_STRING(32)")]],
+                ),
+                "DESCRIBE TAG `player`": make_result(
+                    ["Field", "Type"],
+                    [
+                        [Value(sVal=b"name"), string],
+                        [Value(sVal=b"age"), integer],
+                        [Value(sVal=b"pagerank"), double],
+                        [Value(sVal=b"community"), integer],
+                    ],
+                ),
+                "DESCRIBE EDGE `follow`": make_result(
+                    ["Field", "Type"], [[Value(sVal=b"degree"), integer]]
+                ),
+            }
+        )
+        self.delay = delay
+        self.fail_every = fail_every
+        self.statements = 0
+        self.inserted: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get_session(self, user: str, password: str) -> "MockSession":
+        return MockImportSession(self)
+
+
+class MockImportSession(MockSession):
+    def execute(self, statement: str) -> ResultSet:
+        graphd = self.graphd
+        if statement.startswith("DESCRIBE") and statement not in graphd.encoded:
+            return error_result(b"TagNotFound: Tag not existed!")
+        if not statement.startswith("INSERT"):
+            return super().execute(statement)
+        time.sleep(graphd.delay)
+        with graphd._lock:
+            graphd.statements += 1
+            if graphd.fail_every and graphd.statements % graphd.fail_every == 0:
+                return error_result(b"Storage Error: RPC failure, probably timeout.")
+            name = statement.split("`", 2)[1]
+            rows = statement.count(":(")
+            graphd.inserted[name] = graphd.inserted.get(name, 0) + rows
+        return make_result([], [])
@@ -1,19 +1,81 @@
-import math
+import copy
+import os
+import shutil
 import sys
-from typing import List, Dict
+import tempfile
+import time
+import zipfile
+from contextlib import closing
+from typing import IO, Callable, List, Union
 
-import networkx as nx
+import numpy as np
 import pandas as pd
 import streamlit as st
 import streamlit.components.v1 as components
-from nebula3.Config import Config
-from nebula3.data.DataObject import Node, PathWrapper, Relationship, GeographyWrapper
 from nebula3.data.ResultSet import ResultSet
-from nebula3.gclient.net import ConnectionPool
-from pyvis.network import Network
 from streamlit import session_state as _state
 from streamlit_ace import st_ace
 
+from nebulagraph_gephi import (
+    AGGREGATE_ABOVE,
+    ANALYTICS_TIME_BUDGET_SECONDS,
+    COLOR_BY,
+    DEFAULT_MAX_EDGES,
+    DEFAULT_MAX_VERTICES,
+    DEFAULT_PAGE_SIZE,
+    EXPAND_STEPS,
+    GraphModel,
+    HTML_EXPORT_MODES,
+    IMPORT_BATCH_ROWS,
+    IMPORT_RETRIES,
+    IMPORT_WORKERS,
+    LARGE_GRAPH_NODES,
+    LAYOUT_PREVIEW_ITERATIONS,
+    LAYOUT_PREVIEW_TIME_BUDGET_SECONDS,
+    MAX_PARALLEL_STATEMENTS,
+    PagedQuery,
+    Profile,
+    QUERY_POLL_SECONDS,
+    QUERY_TIMEOUT_SECONDS,
+    QueryBatch,
+    RESULT_CACHE_TTL_SECONDS,
+    SCAN_WORKERS,
+    ResultCache,
+    SIZE_METRICS,
+    StatementWatch,
+    SessionArtifacts,
+    StorageScanSource,
+    analyze,
+    batch_version,
+    build_graphs,
+    bulk_export,
+    bulk_import,
+    dump_gexf,
+    enable_stage_logs,
+    expand_graph,
+    extend_network,
+    fetch_pages,
+    get_memory_manager,
+    get_result_cache,
+    get_session_manager,
+    graph_records,
+    graph_tables,
+    group_vertices,
+    html_export,
+    layout_model,
+    result_cache_key,
+    result_frame,
+    result_to_df,
+    run_statements,
+    space_schema,
+    split_statements,
+    table_bytes,
+    to_group_network,
+    to_network,
+    truncate,
+    write_gexf,
+)
+
 sys.stdout.reconfigure(encoding="utf-8")
 sys.stdin.reconfigure(encoding="utf-8")
 
@@ -55,332 +117,54 @@ def load_widget_state() -> None:
         )
 
 
-# end for session_state
-
-# for nebulagraph
-from nebula3.data.DataObject import Node, PathWrapper, Relationship, GeographyWrapper
-from nebula3.gclient.net import ConnectionPool
-from nebula3.Config import Config
-from nebula3.data.ResultSet import ResultSet
-
-
-def result_to_df(result) -> Dict[str, list]:
-    if result is None:
-        return None
-
-    columns = result.keys()
-    d: Dict[str, list] = {}
-    for col_num in range(result.col_size()):
-        col_name = columns[col_num]
-        col_list = result.column_values(col_name)
-        d[col_name] = [x.cast() for x in col_list]
-    return pd.DataFrame(d)
-
-
-# COLORS = ["#E2DBBE", "#D5D6AA", "#9DBBAE", "#769FB6", "#188FA7"]
-# solarized dark
-COLORS = [
-    "#93A1A1",
-    "#B58900",
-    "#CB4B16",
-    "#DC322F",
-    "#D33682",
-    "#6C71C4",
-    "#268BD2",
-    "#2AA198",
-    "#859900",
-]
-
-
-def truncate(string: str, length: int = 10) -> str:
-    if len(string) > length:
-        return string[:length] + ".."
-    else:
-        return string
-
-
-def get_color(input_str: str) -> str:
-    hash_val = 0
-    for char in input_str:
-        hash_val = (hash_val * 31 + ord(char)) & 0xFFFFFFFF
-    return COLORS[hash_val % len(COLORS)]
-
-
-def render_pd_item(g, g_nx, item):
-    # g is pyvis graph
-    # g_nx is networkx graph
-
-    if isinstance(item, Node):
-        node_id = str(item.get_id().cast())
-        tags = item.tags()  # list of strings
-        props_raw = dict()
-        for tag in tags:
-            props_raw.update(item.properties(tag))
-        props = {
-            k: str(v.cast()) if hasattr(v, "cast") else str(v)
-            for k, v in props_raw.items()
-        }
-
-        if "name" in props:
-            label = props["name"]
-        else:
-            label = f"tag: {tags}, id: {node_id}"
-            for k in props:
-                if "name" in str(k).lower():
-                    label = props[k]
-                    break
-        if "id" not in props:
-            props["id"] = node_id
-
-        g.add_node(node_id, label=label, title=str(props), color=get_color(node_id))
-
-        # networkx
-        if len(tags) > 1:
-            g_nx.add_node(node_id, type=tags[0], **props)
-        else:
-            g_nx.add_node(node_id, **props)
-    elif isinstance(item, Relationship):
-        src_id = str(item.start_vertex_id().cast())
-        dst_id = str(item.end_vertex_id().cast())
-        edge_name = item.edge_name()
-        props_raw = item.properties()
-        props = {
-            k: str(v.cast()) if hasattr(v, "cast") else str(v)
-            for k, v in props_raw.items()
-        }
-        # ensure start and end vertex exist in graph
-        if not src_id in g.node_ids:
-            g.add_node(
-                src_id,
-                label=str(src_id),
-                title=str(src_id),
-                color=get_color(src_id),
-            )
-        if not dst_id in g.node_ids:
-            g.add_node(
-                dst_id,
-                label=str(dst_id),
-                title=str(dst_id),
-                color=get_color(dst_id),
-            )
-        props_str_list: List[str] = []
-        for k in props:
-            if len(props_str_list) >= 1:
-                break
-            props_str_list.append(f"{truncate(k, 7)}: {truncate(str(props[k]), 8)}")
-        props_str = "\n".join(props_str_list)
-
-        label = f"{props_str}\n{edge_name}" if props else edge_name
-        g.add_edge(src_id, dst_id, label=label, title=str(props))
-        # networkx
-        props["edge_type"] = edge_name
-        g_nx.add_edge(src_id, dst_id, **props)
-    elif isinstance(item, PathWrapper):
-        for node in item.nodes():
-            render_pd_item(g, g_nx, node)
-        for edge in item.relationships():
-            render_pd_item(g, g_nx, edge)
-    elif isinstance(item, list):
-        for it in item:
-            render_pd_item(g, g_nx, it)
-
-
-def create_graph(result_df, g: Network = None, g_nx: nx.MultiDiGraph = None):
-    if g is None:
-        g = Network(
-            notebook=True,
-            directed=True,
-            cdn_resources="in_line",
-            height="600px",
-            width="100%",
-            bgcolor="#002B36",
-            font_color="#93A1A1",
-            neighborhood_highlight=True,
-            # select_menu=True,
-            filter_menu=True,
-        )
-    if g_nx is None:
-        g_nx = nx.MultiDiGraph()
-    for _, row in result_df.iterrows():
-        for item in row:
-            render_pd_item(g, g_nx, item)
-    # configure pyvis Network node size based on node degree
-    for node_id in g.get_nodes():
-        if node_id in g_nx.nodes:
-            node_degree = g_nx.degree(node_id)
-
-            g.get_node(node_id)["size"] = math.log(node_degree + 2) * 10
-
-    g.repulsion(
-        node_distance=90,
-        central_gravity=0.2,
-        spring_length=200,
-        spring_strength=0.05,
-        damping=0.09,
-    )
-
-    # g.hrepulsion(
-    #     node_distance=100,
-    #     central_gravity=0.2,
-    #     spring_length=200,
-    #     spring_strength=0.05,
-    #     damping=0.09,
-    # )
-    # g.force_atlas_2based(
-    # )
-    return g, g_nx
-
-
-def query_nebulagraph(
-    query: str,
-    space_name: str,
-    address: str,
-    port: int,
-    user: str = "root",
-    password: str = "nebula",
-) -> List[ResultSet]:
-    # define a config
-    config: Config = Config()
-    config.max_connection_pool_size: int = 10
-    # init connection pool
-    connection_pool: ConnectionPool = ConnectionPool()
-    results: List[ResultSet] = []
-    queries_raw: List[str] = query.strip().split(";")
-    queries: List[str] = [q.strip() for q in queries_raw if q.strip()]
-    st.session_state.queries = queries
-
-    try:
-        connection_pool.init([(address, port)], config)
-        for query in queries:
-            with connection_pool.session_context(
-                user,
-                password,
-            ) as session:
-                if space_name:
-                    session.execute("USE {}".format(space_name))
-                result: ResultSet = session.execute(query)
-            results.append(result)
-        connection_pool.close()
-    except Exception as e:
-        st.warning(e, icon="⚠️")
-        return None
-    return results
-
-
-# end for nebulagraph
-
-
-# get gephi graph from networkx graph
-def get_gephi_graph(g) -> None:
-    nx.write_gexf(g, "nebulagraph_export.gexf")
+# session state of a browser session, set on its first run only
+SESSION_DEFAULTS = {
+    "space_name_list": [],
+    "rendered_graph": None,
+    # results, graph and exports, see artifacts()
+    "artifacts": None,
+    "num_results": 0,
+    "result_errors": [],
+    "excuted_clicked": False,
+    "result_version": "",
+    "queries": [],
+    "query_timings": [],
+    "duplicates": [],
+    "cached_statements": [],
+    "paging": None,
+    "batch": None,
+    "stopped_statements": [],
+    "bulk_archive": None,
+    "import_report": None,
+    "profile": None,
+    "connect_clicked": False,
+}
+_SESSION_READY_KEY = f"{__name__}_READY"
+
+
+def init_session_state() -> None:
+    """Set and persist the SESSION_DEFAULTS missing from the session."""
+    if _SESSION_READY_KEY in _state:
+        return
+    for key, value in SESSION_DEFAULTS.items():
+        if key not in _state:
+            _state[key] = copy.copy(value)
+        persist(key)
+    if _state.artifacts is None:
+        _state.artifacts = get_memory_manager().session()
+    _state[_SESSION_READY_KEY] = True
 
 
-# streamlit app
+# end for session_state
 
-st.set_page_config(
-    page_title="NebulaGraph Gephi Exchange",
-    page_icon="🪄",
-    layout="wide",
-    initial_sidebar_state="auto",
-    menu_items=None,
-)
 
-load_widget_state()
+@st.cache_resource
+def float_window_markdown(no_space: bool) -> str:
+    """The overlay of the query tab before connecting, or without spaces.
 
-with st.sidebar:
-    st.markdown(
-        """
-<div style="display:flex; align-items:center;">
-        <a href="https://github.com/wey-gu/NebulaGraph-Gephi">
-        <img src="https://raw.githubusercontent.com/nebula-contrib/nebulagraph-docker-ext/main/nebulagraph.svg"
-            style="margin-right:10px; height:50px; width:auto;">
-        </a>
-        <h4>NebulaGraph Gephi</h4>
-</div>
-        """,
-        unsafe_allow_html=True,
-    )
-    st.sidebar.markdown("---")
-
-    graphd_host = st.sidebar.text_input(
-        "graphd host", value="graphd", key="graphd_host", label_visibility="collapsed"
-    )
-    graphd_port = st.sidebar.number_input(
-        "graphd port", value=9669, key="graphd_port", label_visibility="collapsed"
-    )
-    user = st.sidebar.text_input(
-        "user", value="root", key="user", label_visibility="collapsed"
-    )
-    password = st.sidebar.text_input(
-        "passwore",
-        value="nebula",
-        type="password",
-        key="password",
-        label_visibility="collapsed",
-    )
-    if "space_name_list" not in st.session_state:
-        space_name_list = persist("space_name_list")
-        st.session_state.space_name_list = []
-    if "rendered_graph" not in st.session_state:
-        rendered_graph = persist("rendered_graph")
-        st.session_state.rendered_graph = None
-    if "g" not in st.session_state:
-        g = persist("g")
-        st.session_state.g = None
-    if "results" not in st.session_state:
-        results = persist("results")
-        st.session_state.results = None
-    if "result_dfs" not in st.session_state:
-        result_dfs = persist("result_dfs")
-        st.session_state.result_df = None
-    if "excuted_clicked" not in st.session_state:
-        excuted_clicked = persist("excuted_clicked")
-        st.session_state.excuted_clicked = False
-    if "raw_pyvis_html" not in st.session_state:
-        raw_pyvis_html = persist("raw_pyvis_html")
-        st.session_state.raw_pyvis_html = ""
-    if "queries" not in st.session_state:
-        queries = persist("queries")
-        st.session_state.queries = []
-    if "connect_clicked" not in st.session_state:
-        connect_clicked = persist("connect_clicked")
-        st.session_state.connect_clicked = False
-
-    st.sidebar.markdown("---")
-
-    if st.sidebar.button("🔗　Connect", type="secondary"):
-        results = query_nebulagraph(
-            "SHOW SPACES;", None, graphd_host, graphd_port, user, password
-        )
-        if results is None or len(results) == 0:
-            st.warning("connect failed", icon="⚠️")
-            st.stop()
-        result: ResultSet = results[0]
-        spaces_df = result_to_df(result)
-        st.session_state.space_name_list = spaces_df["Name"].tolist()
-        # st.sidebar.dataframe(st.session_state.space_name_list)
-        st.session_state.connect_clicked = True
-        persist("space_name")
-        # clear all results
-        st.session_state.results = None
-        st.session_state.result_dfs = None
-        st.session_state.g = None
-        st.session_state.excuted_clicked = False
-
-# main page
-
-# two tabs
-(
-    tab_query,
-    tab_gephi,
-) = st.tabs(
-    [
-        "Query NebulaGraph",
-        "Gephi",
-    ]
-)
-
-float_window_css = """
+    Built once per process instead of on every rerun.
+    """
+    float_window_css = """
 <style>
     .floating-window {
         position: absolute;
@@ -414,20 +198,17 @@ float_window_css = """
 </style>
 
 """
-nebula_logo_svg = """<img
+    nebula_logo_svg = """<img
      src="https://raw.githubusercontent.com/nebula-contrib/nebulagraph-docker-ext/main/nebulagraph.svg"
      alt=" "
      style="height: 16px; width: auto;">"""
-float_window_css_no_space = float_window_css.replace(
-    "backdrop-filter: blur(5px);", "").replace(
-        "min-height: 60px;",
-        "min-height: 124px;"
-    ).replace(
-        "min-width: 300px;",
-        "min-width: 440px;"
+    float_window_css_no_space = (
+        float_window_css.replace("backdrop-filter: blur(5px);", "")
+        .replace("min-height: 60px;", "min-height: 124px;")
+        .replace("min-width: 300px;", "min-width: 440px;")
     )
 
-float_window_html = f"""
+    float_window_html = f"""
 <div class="floating-window">
     <div class="text-container">
         <p style=
@@ -442,44 +223,934 @@ float_window_html = f"""
 </div>
 """
 
-float_window_html_no_space = float_window_html.replace(
-    "Graph first.",
-    f"Graph done !<br/>"
-    f"🔎　 Opps... no graph spaces found. <br/>"
-    f"<span style='color: #88846F;'>💡　 Try creating one from {nebula_logo_svg} "
-    f"Studio's starter dataset.</span>").replace(
-        "🔗", "✅")
+    float_window_html_no_space = float_window_html.replace(
+        "Graph first.",
+        f"Graph done !<br/>"
+        f"🔎　 Opps... no graph spaces found. <br/>"
+        f"<span style='color: #88846F;'>💡　 Try creating one from {nebula_logo_svg} "
+        f"Studio's starter dataset.</span>",
+    ).replace("🔗", "✅")
+
+    if no_space:
+        return float_window_css_no_space + float_window_html_no_space
+    return float_window_css + float_window_html
+
+
+def artifacts() -> SessionArtifacts:
+    """Results, graph, frames and exports of the session, whose memory is
+    capped: results and the graph are spilled to disk past the caps, frames
+    and exports dropped and built again when shown."""
+    return st.session_state.artifacts
+
+
+def current_graph() -> GraphModel:
+    """The graph of the current results, None before any."""
+    return artifacts().get(("graph",))
+
+
+def current_results() -> List[ResultSet]:
+    """The successful results of the batch, shown and exported."""
+    store = artifacts()
+    return [store.get(("result", i)) for i in range(st.session_state.num_results)]
+
+
+def get_result_df(index: int) -> pd.DataFrame:
+    """Display and CSV frame of the index-th successful result, built once when
+    first shown and kept with the results, see result_frame."""
+    frame = artifacts().get(("frame", index))
+    if frame is None:
+        result = artifacts().get(("result", index))
+        with profile_stage("cast", index, count=result.row_size()):
+            frame = result_frame(result)
+        artifacts().put(("frame", index), frame)
+    return frame
+
+
+def profile_stage(stage: str, statement: int = None, count: int = None):
+    """Stage of the current batch's profile, see Profile.stage."""
+    profile = st.session_state.profile or Profile()
+    return profile.stage(stage, statement, count)
+
+
+def show_profile(index: int) -> None:
+    """Profile panel of the index-th query, with the stages of the whole
+    batch under the first one."""
+    profile = st.session_state.profile
+    if profile is None:
+        return
+    stages = profile.statement_stages(index)
+    if index == 0:
+        stages += profile.statement_stages(None)
+    if not stages:
+        return
+    with st.expander("Profile"):
+        frame = pd.DataFrame(stages)
+        frame = frame.drop(columns=["statement", "query"], errors="ignore")
+        frame["rss_delta"] = pd.to_numeric(frame["rss_delta"], errors="coerce") / 2**20
+        st.dataframe(
+            frame.rename(columns={"rss_delta": "memory MB"}),
+            use_container_width=True,
+            hide_index=True,
+        )
 
 
-with tab_query:
-    if st.session_state.connect_clicked:
-        if len(st.session_state.space_name_list) == 0:
-        # floating window before login
-            st.markdown(
-                float_window_css_no_space + float_window_html_no_space,
-                unsafe_allow_html=True,
+def get_export(
+    kind: str, build: Callable[[], Union[str, bytes, IO[bytes]]] = None
+) -> Union[str, bytes, IO[bytes]]:
+    """Export artifact of the current results, built by build on first request.
+
+    Artifacts are cached per result version in artifacts(), which every
+    Execute resets, and built again if they were dropped to free memory.
+    """
+    key = ("export", st.session_state.result_version, kind)
+    export = artifacts().get(key)
+    if export is None:
+        with profile_stage("export") as fields:
+            export = build()
+            fields["kind"] = kind
+            if isinstance(export, (str, bytes)):
+                fields["bytes"] = len(export)
+        artifacts().put(key, export)
+    return export
+
+
+def has_export(kind: str) -> bool:
+    return ("export", st.session_state.result_version, kind) in artifacts()
+
+
+def drop_export(kind: str) -> None:
+    artifacts().pop(("export", st.session_state.result_version, kind))
+
+
+def graph_gexf() -> IO[bytes]:
+    """GEXF export of the current graph, spooled to disk past
+    GEXF_SPOOL_MAX_SIZE, see write_gexf. Read only while its download is
+    shown, see offer_download."""
+    return write_gexf(current_graph())
+
+
+def offer_download(
+    kind: str,
+    label: str,
+    build: Callable[[], Union[str, bytes, IO[bytes]]],
+    file_name: str,
+    mime: str,
+    type: str = "secondary",
+    slot=st,
+) -> None:
+    """Button building the kind export, then its download button.
+
+    Both go to slot, the page by default; in an st.empty, the download
+    button takes the place of the first one. The export is held in session
+    state only until it is downloaded, and exports built as files are read
+    only while their download is shown.
+    """
+    if has_export(kind) or slot.button(
+        label, key=f"prepare_{kind}", type=type, use_container_width=True
+    ):
+        data = get_export(kind, build)
+        if not isinstance(data, (str, bytes)):
+            data.seek(0)
+            data = data.read()
+        if slot.download_button(
+            label=f"⬇　{label}",
+            data=data,
+            type=type,
+            file_name=file_name,
+            mime=mime,
+            use_container_width=True,
+        ):
+            drop_export(kind)
+
+
+def query_nebulagraph(
+    query: str,
+    space_name: str,
+    address: str,
+    port: int,
+    user: str = "root",
+    password: str = "nebula",
+    timeout: float = QUERY_TIMEOUT_SECONDS,
+    parallel: bool = False,
+    max_workers: int = 4,
+    cache: ResultCache = None,
+    bypass_cache: bool = False,
+    profile: Profile = None,
+) -> QueryBatch:
+    """Start the `;` separated statements of query in the background.
+
+    The QueryBatch goes to st.session_state.batch, for wait_for_batch to
+    poll; a former batch still running is cancelled.
+    """
+    queries = split_statements(query)
+    st.session_state.queries = queries
+    if st.session_state.batch is not None:
+        st.session_state.batch.cancel()
+    st.session_state.batch = QueryBatch(
+        queries,
+        space_name,
+        address,
+        port,
+        user,
+        password,
+        timeout,
+        parallel=parallel,
+        max_workers=max_workers,
+        cache=cache,
+        bypass_cache=bypass_cache,
+        profile=profile,
+    ).start()
+    return st.session_state.batch
+
+
+def batch_status(batch: QueryBatch) -> str:
+    lines = []
+    kill_errors = batch.kill_errors
+    for index, state in enumerate(batch.states):
+        if state == "running":
+            state = f"running, {batch.elapsed(index):.0f}s"
+        if index in kill_errors:
+            state += f", not killed: {kill_errors[index]}"
+        query = truncate(" ".join(batch.queries[index].split()), 60)
+        lines.append(f"{index + 1}. `{query}` {state}")
+    return "\n".join(lines)
+
+
+def wait_for_batch(status, cancel) -> List[ResultSet]:
+    """Poll st.session_state.batch, showing its statements until it is done.
+
+    Statements run on a background thread, and the script is rerun every
+    QUERY_POLL_SECONDS while they do, so widgets are handled in between and
+    the Cancel button kills them. Returns the results of the statements
+    that finished, whose statements, wall times and cache marks go to
+    st.session_state; timed out and cancelled statements go to
+    st.session_state.stopped_statements, with the error of their kill if it
+    failed. None if the batch failed.
+    """
+    batch: QueryBatch = st.session_state.batch
+    if cancel.button("Cancel", key="cancel_batch", use_container_width=True):
+        batch.cancel()
+    if not batch.done:
+        status.markdown(batch_status(batch))
+        time.sleep(QUERY_POLL_SECONDS)
+        st.experimental_rerun()
+    status.empty()
+    cancel.empty()
+    st.session_state.batch = None
+    if batch.error is not None:
+        st.warning(batch.error, icon="⚠️")
+        return None
+    finished = [i for i, state in enumerate(batch.states) if state == "done"]
+    st.session_state.queries = [batch.queries[i] for i in finished]
+    st.session_state.query_timings = [batch.executed[i][1] for i in finished]
+    st.session_state.cached_statements = [batch.executed[i][2] for i in finished]
+    kill_errors = batch.kill_errors
+    st.session_state.stopped_statements = [
+        (query, state, kill_errors.get(index))
+        for index, (query, state) in enumerate(zip(batch.queries, batch.states))
+        if state != "done"
+    ]
+    return [batch.executed[i][0] for i in finished]
+
+
+def scan_progress(export) -> pd.DataFrame:
+    """Rows scanned and scans done per partition, of a BulkExport."""
+    parts = {}
+    for (kind, _, part), rows in export.rows.items():
+        counts = parts.setdefault(part, {"partition": part, "vertex": 0, "edge": 0})
+        counts[kind] += rows
+        counts["done"] = counts.get("done", 0) + ((kind, _, part) in export.done)
+    frame = pd.DataFrame(sorted(parts.values(), key=lambda counts: counts["partition"]))
+    return frame.rename(columns={"vertex": "vertex rows", "edge": "edge rows"})
+
+
+def export_space(tags: str, edge_types: str, with_gexf: bool, progress) -> None:
+    """Scan the current space on storaged into a zip of CSV files per tag and
+    edge type, and a GEXF file with_gexf, see bulk_export.
+
+    The archive is written to a temporary directory, its path kept in
+    st.session_state.bulk_archive; tags and edge_types are comma
+    separated, all of the space if empty.
+    """
+    state = st.session_state
+    meta_addrs = []
+    for meta in state.meta_address.split(","):
+        host, _, port = meta.strip().rpartition(":")
+        meta_addrs.append((host, int(port)))
+    tags = [tag.strip() for tag in tags.split(",") if tag.strip()]
+    edge_types = [name.strip() for name in edge_types.split(",") if name.strip()]
+    if state.bulk_archive is not None:
+        shutil.rmtree(os.path.dirname(state.bulk_archive), ignore_errors=True)
+        state.bulk_archive = None
+    directory = tempfile.mkdtemp(prefix="nebulagraph-scan-")
+    model = GraphModel() if with_gexf else None
+    try:
+        if not tags and not edge_types:
+            tags, edge_types = space_schema(
+                state.space_name,
+                state.graphd_host,
+                state.graphd_port,
+                state.user,
+                state.password,
             )
-    else:
+        source = StorageScanSource(meta_addrs, state.user, state.password)
+        try:
+            shown = 0.0
+            for export in bulk_export(
+                source,
+                state.space_name,
+                tags,
+                edge_types,
+                directory,
+                model,
+                workers=state.scan_workers,
+            ):
+                if time.monotonic() - shown > QUERY_POLL_SECONDS:
+                    progress.dataframe(scan_progress(export), hide_index=True)
+                    shown = time.monotonic()
+        finally:
+            source.close()
+        if model is not None:
+            if model.num_nodes > state.layout_above:
+                layout_model(model)
+            with open(os.path.join(directory, "nebulagraph_export.gexf"), "wb") as out:
+                dump_gexf(model, out)
+    except Exception as e:
+        shutil.rmtree(directory, ignore_errors=True)
+        st.warning(e, icon="⚠️")
+        return
+    progress.empty()
+    archive = os.path.join(directory, f"{state.space_name}.zip")
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zipped:
+        for name in sorted(os.listdir(directory)):
+            if name != os.path.basename(archive):
+                zipped.write(os.path.join(directory, name), name)
+                os.remove(os.path.join(directory, name))
+    state.bulk_archive = archive
+
+
+def import_progress(imported) -> pd.DataFrame:
+    """Rows written and failed per tag and edge type, of a BulkImport."""
+    rows = []
+    for (kind, name), written in sorted(imported.rows.items()):
+        rows.append(
+            {
+                "kind": kind,
+                "name": name,
+                "written": written,
+                "failed": imported.failed.get((kind, name), 0),
+                "not in schema": ", ".join(
+                    sorted(imported.ignored.get((kind, name), ()))
+                ),
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def import_graph(files: list, tags: str, edge_types: str, progress) -> None:
+    """Write uploaded GEXF, CSV and zip files to the current space, see
+    bulk_import.
+
+    tags and edge_types are comma separated, what GEXF vertices and edges
+    are written as. The report is kept in st.session_state.import_report.
+    """
+    state = st.session_state
+    tags = [tag.strip() for tag in tags.split(",") if tag.strip()]
+    edge_types = [name.strip() for name in edge_types.split(",") if name.strip()]
+
+    def records():
+        for uploaded in files:
+            uploaded.seek(0)
+            yield from graph_records(uploaded.name, uploaded, tags, edge_types)
+
+    state.import_report = None
+    imported = None
+    try:
+        shown = 0.0
+        for imported in bulk_import(
+            records(),
+            state.space_name,
+            state.graphd_host,
+            state.graphd_port,
+            state.user,
+            state.password,
+            batch_rows=state.import_batch_rows,
+            workers=state.import_workers,
+            retries=state.import_retries,
+        ):
+            if time.monotonic() - shown > QUERY_POLL_SECONDS:
+                progress.dataframe(import_progress(imported), hide_index=True)
+                shown = time.monotonic()
+    except Exception as e:
+        st.warning(e, icon="⚠️")
+        return
+    progress.empty()
+    state.import_report = (
+        import_progress(imported),
+        imported.summary(),
+        imported.errors,
+    )
+
+
+# streamlit app
+def store_batch(
+    results: List[ResultSet],
+    graph_results: List[ResultSet],
+    model: GraphModel,
+    version: str,
+) -> None:
+    """Make a converted batch the current results, dropping former exports."""
+    state = st.session_state
+    store = artifacts()
+    state.result_errors = [r.error_msg() for r in results if r.error_code() != 0]
+    # DataFrames are built on first display, see get_result_df
+    # frames of results kept from the former batch, e.g. of pages fetched,
+    # unless pages were added to the result in place since, see PagedQuery
+    for index in range(state.num_results):
+        kept = index < len(graph_results)
+        kept = kept and store.peek(("result", index)) is graph_results[index]
+        frame = store.peek(("frame", index)) if kept else None
+        if frame is None or len(frame) != graph_results[index].row_size():
+            store.pop(("frame", index))
+        store.pop(("result", index))
+    store.clear("graph")
+    store.clear("export")
+    for index, result in enumerate(graph_results):
+        store.put(("result", index), result, spill=True)
+    state.num_results = len(graph_results)
+    store_graph(model, version)
+
+
+def store_graph(model: GraphModel, version: str) -> None:
+    """Make model the current graph, dropping the exports of the former one.
+    Its own are built when requested, see get_export."""
+    state = st.session_state
+    artifacts().clear("export")
+    artifacts().put(("graph",), model, spill=True)
+    state.duplicates = model.duplicates
+    state.result_version = version
+    state.excuted_clicked = True
+
+
+def fetch_next_pages(progress, preview) -> None:
+    """Fetch pages of st.session_state.paging, showing the graph in preview.
+
+    Every call adds up to the vertex and edge caps to the current graph,
+    which is redrawn after each page, then stores the merged results as the
+    batch. Between calls the results of paging are only in the artifacts,
+    where they are accounted and spilled as the others, and are loaded
+    back for pages to be added to them.
+    """
+    state = st.session_state
+    paging: List[PagedQuery] = state.paging
+    model: GraphModel = current_graph()
+    store = artifacts()
+    index = 0
+    for paged in paging:
+        # ("result", i) are the succeeded results, in the order of paging
+        if paged.pages and (paged.result is None or paged.result.is_succeeded()):
+            if paged.result is None:
+                paged.result = store.get(("result", index))
+            index += 1
+    watch = StatementWatch(
+        state.graphd_host,
+        state.graphd_port,
+        state.user,
+        state.password,
+        state.query_timeout,
+    )
+    try:
+        with closing(
+            fetch_pages(
+                paging,
+                model,
+                state.space_name,
+                state.graphd_host,
+                state.graphd_port,
+                state.user,
+                state.password,
+                page_size=state.page_size,
+                max_vertices=model.num_nodes + state.max_vertices,
+                max_edges=model.num_edges + state.max_edges,
+                profile=state.profile,
+                watch=watch,
+            )
+        ) as pages:
+            for paged in pages:
+                if paged.error is not None or not paged.result.is_succeeded():
+                    break
+                progress.caption(
+                    f"Query {paged.index + 1}: {paged.pages} pages,"
+                    f" {paged.result.row_size()} rows"
+                    f" · {model.num_nodes} vertices,"
+                    f" {model.num_edges} edges so far"
+                )
+                if model.num_nodes and model.num_edges:
+                    if model.num_nodes > state.layout_above:
+                        layout_model(
+                            model,
+                            iterations=LAYOUT_PREVIEW_ITERATIONS,
+                            time_budget=LAYOUT_PREVIEW_TIME_BUDGET_SECONDS,
+                        )
+                    with preview:
+                        components.html(
+                            to_network(model).generate_html(),
+                            height=720,
+                            scrolling=False,
+                        )
+    except Exception as e:
+        st.warning(e, icon="⚠️")
+        st.stop()
+    progress.empty()
+    preview.empty()
+    for index, kill_error in watch.kill_errors.items():
+        st.warning(
+            f"Query {index + 1} timed out but couldn't be killed ({kill_error}),"
+            " it runs on NebulaGraph until it ends.",
+            icon="⏱️",
+        )
+
+    results = [paged.result for paged in paging if paged.result is not None]
+    state.query_timings = [paged.seconds for paged in paging]
+    state.cached_statements = [False] * len(paging)
+    if model.num_nodes > state.layout_above:
+        with profile_stage("layout", count=model.num_nodes):
+            layout_model(model)
+    if state.analytics:
+        analyze(model, profile=state.profile)
+    # a new version per fetch, so exports are redone for the added pages
+    pages = sum(paged.pages for paged in paging)
+    store_batch(
+        results,
+        [result for result in results if result.is_succeeded()],
+        model,
+        f"{batch_version(state.space_name, state.queries)}-{pages}",
+    )
+    for paged in paging:
+        if paged.result is not None and paged.result.is_succeeded():
+            paged.result = None
+
+
+def expand_vertices(vids: List[str]) -> None:
+    """Add the neighbors of vids to the current graph with one query.
+
+    The drawn networks of the former graph are extended with the new
+    elements instead of being rebuilt, the GEXF export is written when
+    requested, and the expansion is listed as one more statement of the
+    batch.
+    """
+    state = st.session_state
+    model: GraphModel = current_graph()
+    if not model.expanded:
+        # the graph of the batch may be shared through the result cache
+        model = model.copy()
+    nodes_from, edges_from = model.num_nodes, model.num_edges
+    try:
+        expanded = expand_graph(
+            model,
+            vids,
+            state.space_name,
+            state.graphd_host,
+            state.graphd_port,
+            state.user,
+            state.password,
+            profile=state.profile,
+        )
+    except Exception as e:
+        st.warning(e, icon="⚠️")
+        return
+    if expanded is None:
+        st.info("These vertices are expanded already.", icon="💡")
+        return
+    statement, result, seconds = expanded
+    if not result.is_succeeded():
+        st.warning(result.error_msg(), icon="⚠️")
+        return
+    if model.num_nodes > state.layout_above:
+        with profile_stage("layout", count=model.num_nodes):
+            layout_model(
+                model,
+                iterations=LAYOUT_PREVIEW_ITERATIONS,
+                time_budget=LAYOUT_PREVIEW_TIME_BUDGET_SECONDS,
+            )
+    if state.analytics:
+        analyze(model, profile=state.profile)
+    # networks dropped to free memory are built again instead
+    networks = {
+        kind: artifacts().peek(("export", version, kind))
+        for _, version, kind in artifacts().keys("export")
+        if version == state.result_version and kind.startswith("network:")
+    }
+    state.queries = state.queries + [statement]
+    state.query_timings = state.query_timings + [seconds]
+    state.cached_statements = state.cached_statements + [False]
+    artifacts().put(("result", state.num_results), result, spill=True)
+    state.num_results += 1
+    store_graph(model, f"{state.result_version}+{len(state.queries)}")
+    for kind, network in networks.items():
+        if network is None:
+            continue
+        _, size_by, color_by = kind.split(":", 2)
+        get_export(
+            kind,
+            lambda: extend_network(
+                network, model, nodes_from, edges_from, size_by, color_by
+            ),
+        )
+
+
+def main() -> None:
+    st.set_page_config(
+        page_title="NebulaGraph Gephi Exchange",
+        page_icon="🪄",
+        layout="wide",
+        initial_sidebar_state="auto",
+        menu_items=None,
+    )
+
+    load_widget_state()
+    # JSON lines of every stage on stderr, to find slow queries of all users
+    enable_stage_logs()
+
+    with st.sidebar:
         st.markdown(
-            float_window_css + float_window_html,
+            """
+<div style="display:flex; align-items:center;">
+        <a href="https://github.com/wey-gu/NebulaGraph-Gephi">
+        <img src="https://raw.githubusercontent.com/nebula-contrib/nebulagraph-docker-ext/main/nebulagraph.svg"
+            style="margin-right:10px; height:50px; width:auto;">
+        </a>
+        <h4>NebulaGraph Gephi</h4>
+</div>
+        """,
             unsafe_allow_html=True,
         )
+        st.sidebar.markdown("---")
+
+        graphd_host = st.sidebar.text_input(
+            "graphd host",
+            value="graphd",
+            key="graphd_host",
+            label_visibility="collapsed",
+        )
+        graphd_port = st.sidebar.number_input(
+            "graphd port", value=9669, key="graphd_port", label_visibility="collapsed"
+        )
+        user = st.sidebar.text_input(
+            "user", value="root", key="user", label_visibility="collapsed"
+        )
+        password = st.sidebar.text_input(
+            "passwore",
+            value="nebula",
+            type="password",
+            key="password",
+            label_visibility="collapsed",
+        )
+        init_session_state()
+
+        parallel_statements = st.sidebar.checkbox(
+            "Run statements in parallel",
+            value=False,
+            key="parallel_statements",
+            help="Send the `;` separated statements concurrently, "
+            "only for statements independent of each other.",
+        )
+        parallel_limit = st.sidebar.number_input(
+            "Concurrency",
+            min_value=1,
+            max_value=MAX_PARALLEL_STATEMENTS,
+            value=4,
+            key="parallel_limit",
+            disabled=not parallel_statements,
+        )
+        st.sidebar.number_input(
+            "Statement timeout (s)",
+            min_value=1,
+            value=QUERY_TIMEOUT_SECONDS,
+            key="query_timeout",
+            help="Statements, or pages when fetching in pages, running for"
+            " longer are killed on graphd. Statements done by then are shown.",
+        )
+        use_result_cache = st.sidebar.checkbox(
+            "Cache results",
+            value=False,
+            key="use_result_cache",
+            help="Reuse results and graphs of read queries run in the last "
+            f"{RESULT_CACHE_TTL_SECONDS // 60} minutes, by anyone.",
+        )
+        layout_above = st.sidebar.number_input(
+            "Precomputed layout above",
+            min_value=0,
+            value=LARGE_GRAPH_NODES,
+            key="layout_above",
+            help="Graphs with more vertices are laid out on the server and"
+            " drawn without physics, so the browser stays responsive.",
+        )
+        aggregate_above = st.sidebar.number_input(
+            "Group vertices above",
+            min_value=0,
+            value=AGGREGATE_ABOVE,
+            key="aggregate_above",
+            help="Bigger graphs are drawn as groups of vertices, by tag or"
+            " by a property, which can be expanded one by one.",
+        )
+        st.sidebar.checkbox(
+            "Graph analytics",
+            value=True,
+            key="analytics",
+            help="Compute PageRank, eigenvector centrality and communities, to"
+            " size and color vertices by and to export as GEXF attributes."
+            f" Each gets {ANALYTICS_TIME_BUDGET_SECONDS:g} seconds at most.",
+        )
+        html_export_mode = st.sidebar.selectbox(
+            "HTML export",
+            HTML_EXPORT_MODES,
+            key="html_export",
+            help="Compact files carry the graph as minified columns and draw it"
+            " without the filter menu. Gzipped ones are for web servers that"
+            " serve .html.gz files.",
+        )
+        paged_fetch = st.sidebar.checkbox(
+            "Fetch in pages",
+            value=False,
+            key="paged_fetch",
+            help="Page MATCH and GO statements with SKIP/LIMIT and show the graph"
+            " as pages arrive, until the vertex or edge cap is reached.",
+        )
+        page_size = st.sidebar.number_input(
+            "Rows per page",
+            min_value=1,
+            value=DEFAULT_PAGE_SIZE,
+            key="page_size",
+            disabled=not paged_fetch,
+        )
+        max_vertices = st.sidebar.number_input(
+            "Vertex cap",
+            min_value=1,
+            value=DEFAULT_MAX_VERTICES,
+            key="max_vertices",
+            disabled=not paged_fetch,
+        )
+        max_edges = st.sidebar.number_input(
+            "Edge cap",
+            min_value=1,
+            value=DEFAULT_MAX_EDGES,
+            key="max_edges",
+            disabled=not paged_fetch,
+        )
+
+        st.sidebar.markdown("---")
+
+        if st.sidebar.button("🔗　Connect", type="secondary"):
+            try:
+                executed = run_statements(
+                    ["SHOW SPACES"], None, graphd_host, graphd_port, user, password
+                )
+            except Exception as e:
+                st.warning(e, icon="⚠️")
+                executed = []
+            if len(executed) == 0:
+                st.warning("connect failed", icon="⚠️")
+                st.stop()
+            result: ResultSet = executed[0][0]
+            spaces_df = result_to_df(result)
+            st.session_state.space_name_list = spaces_df["Name"].tolist()
+            # st.sidebar.dataframe(st.session_state.space_name_list)
+            st.session_state.connect_clicked = True
+            persist("space_name")
+            # clear all results
+            artifacts().clear()
+            st.session_state.num_results = 0
+            st.session_state.result_errors = []
+            st.session_state.paging = None
+            st.session_state.excuted_clicked = False
+
+        if st.session_state.connect_clicked:
+            pool_stats = get_session_manager().stats()
+            st.sidebar.caption(
+                f"pool hits/misses: {pool_stats['pool_hits']}/{pool_stats['pool_misses']}"
+                f" · sessions reused/new: {pool_stats['session_hits']}"
+                f"/{pool_stats['session_misses']}"
+                f" · idle: {pool_stats['idle_sessions']}"
+            )
+        if st.session_state.use_result_cache:
+            cache_stats = get_result_cache().stats()
+            st.sidebar.caption(
+                f"result cache hits/misses: {cache_stats['hits']}/{cache_stats['misses']}"
+                f" · {cache_stats['entries']} entries"
+                f" · {cache_stats['bytes'] / 1024 / 1024:.1f} MB"
+            )
+        memory_stats = get_memory_manager().stats()
+        if memory_stats["bytes"] or memory_stats["spilled_bytes"]:
+            st.sidebar.caption(
+                f"memory of this session: {artifacts().size / 1024 / 1024:.1f} MB"
+                f" · all {memory_stats['sessions']} sessions:"
+                f" {memory_stats['bytes'] / 1024 / 1024:.1f} MB"
+                f" · spilled: {memory_stats['spilled_bytes'] / 1024 / 1024:.1f} MB"
+            )
 
-    st.info(
-        "Query NebulaGraph then Download and put the `GEXF` file to"
-        " [Gephi](https://gephi.org/gephi-lite/) "
-        "for more analysis and visualization. ",
-        icon="🧙‍♂️",
+    # main page
+
+    # two tabs
+    (
+        tab_query,
+        tab_gephi,
+    ) = st.tabs(
+        [
+            "Query NebulaGraph",
+            "Gephi",
+        ]
     )
 
-    with st.expander("▷ Console", expanded=True):
-        # to column, query field and query button
-        input_field, buttons = st.columns([8, 1.3])
-        with input_field:
-            query = st_ace(
-                value=INIT_QUERY,
-                height=170,
-                annotations="""# Query SUBGRAPH, PATH, \
+    with tab_query:
+        if st.session_state.connect_clicked:
+            if len(st.session_state.space_name_list) == 0:
+            # floating window before login
+                st.markdown(
+                    float_window_markdown(no_space=True),
+                    unsafe_allow_html=True,
+                )
+        else:
+            st.markdown(
+                float_window_markdown(no_space=False),
+                unsafe_allow_html=True,
+            )
+
+        st.info(
+            "Query NebulaGraph then Download and put the `GEXF` file to"
+            " [Gephi](https://gephi.org/gephi-lite/) "
+            "for more analysis and visualization. ",
+            icon="🧙‍♂️",
+        )
+
+        with st.expander("▷ Export a whole space"):
+            st.caption(
+                "Scans every partition of the space on storaged, without"
+                " queries: a CSV file per tag and edge type, streamed, and a"
+                " GEXF file of the whole space, built in memory."
+            )
+            meta_col, tags_col, edges_col, workers_col = st.columns([2, 2, 2, 1])
+            with meta_col:
+                st.text_input(
+                    "metad",
+                    value="metad0:9559",
+                    key="meta_address",
+                    help="Comma separated host:port of metad. storaged must be"
+                    " reachable at the addresses metad knows them by.",
+                )
+            with tags_col:
+                scan_tags = st.text_input(
+                    "Tags", key="scan_tags", placeholder="all, or player, team"
+                )
+            with edges_col:
+                scan_edge_types = st.text_input(
+                    "Edge types", key="scan_edge_types", placeholder="all"
+                )
+            with workers_col:
+                st.number_input(
+                    "Workers",
+                    min_value=1,
+                    value=SCAN_WORKERS,
+                    key="scan_workers",
+                    help="Partitions scanned at once.",
+                )
+            scan_gexf = st.checkbox("With GEXF", value=True, key="scan_gexf")
+            if st.button(
+                "Scan space",
+                key="scan_space",
+                disabled=not st.session_state.get("space_name"),
+            ):
+                export_space(scan_tags, scan_edge_types, scan_gexf, st.empty())
+            if st.session_state.bulk_archive is not None and os.path.exists(
+                st.session_state.bulk_archive
+            ):
+                with open(st.session_state.bulk_archive, "rb") as archive:
+                    st.download_button(
+                        f"⬇　{os.path.basename(st.session_state.bulk_archive)}",
+                        data=archive,
+                        file_name=os.path.basename(st.session_state.bulk_archive),
+                        mime="application/zip",
+                    )
+
+        with st.expander("▷ Import a graph"):
+            st.caption(
+                "Writes vertices and edges back with multi-row INSERT"
+                " statements: GEXF files, e.g. with the attributes Gephi-Lite"
+                " computed, or the CSV files and zips of a space export."
+                " Properties the tag or edge type doesn't have are left out."
+            )
+            import_files = st.file_uploader(
+                "GEXF, CSV or zip files",
+                type=["gexf", "csv", "zip"],
+                accept_multiple_files=True,
+                key="import_files",
+            )
+            tags_col, edges_col, rows_col, workers_col, retries_col = st.columns(
+                [2, 2, 1, 1, 1]
+            )
+            with tags_col:
+                import_tags = st.text_input(
+                    "Tags",
+                    key="import_tags",
+                    placeholder="of GEXF vertices, e.g. player",
+                    help="GEXF has no tags, its vertices are written to each of"
+                    " these. CSV files are named after theirs.",
+                )
+            with edges_col:
+                import_edge_types = st.text_input(
+                    "Edge types",
+                    key="import_edge_types",
+                    placeholder="of GEXF edges, e.g. follow",
+                    help="GEXF edges of these types, by their edge_type"
+                    " attribute, are written. Edges without it go to the only"
+                    " edge type given.",
+                )
+            with rows_col:
+                st.number_input(
+                    "Rows per statement",
+                    min_value=1,
+                    value=IMPORT_BATCH_ROWS,
+                    key="import_batch_rows",
+                )
+            with workers_col:
+                st.number_input(
+                    "Sessions",
+                    min_value=1,
+                    max_value=MAX_PARALLEL_STATEMENTS,
+                    value=IMPORT_WORKERS,
+                    key="import_workers",
+                    help="INSERT statements sent at once.",
+                )
+            with retries_col:
+                st.number_input(
+                    "Retries",
+                    min_value=0,
+                    value=IMPORT_RETRIES,
+                    key="import_retries",
+                    help="Tries of a failed statement before its rows count as"
+                    " failed.",
+                )
+            if st.button(
+                "Import",
+                key="import_graph",
+                disabled=not (st.session_state.get("space_name") and import_files),
+            ):
+                import_graph(import_files, import_tags, import_edge_types, st.empty())
+            if st.session_state.import_report is not None:
+                frame, summary, errors = st.session_state.import_report
+                st.dataframe(frame, hide_index=True)
+                st.caption(summary)
+                for error in errors:
+                    st.warning(error, icon="⚠️")
+
+        with st.expander("▷ Console", expanded=True):
+            # to column, query field and query button
+            input_field, buttons = st.columns([8, 1.3])
+            with input_field:
+                query = st_ace(
+                    value=INIT_QUERY,
+                    height=170,
+                    annotations="""# Query SUBGRAPH, PATH, \
 NODES AND EDGES to enable visualization.
             MATCH p=(v)-[]->()
             WHERE id(v) == "player100"
@@ -490,183 +1161,390 @@ NODES AND EDGES to enable visualization.
             # or
             FIND PATH FROM "player102" TO "team204" OVER * YIELD path AS p;
             """,
-                language="pgsql",
-                theme="solarized_dark",
-                auto_update=True,
-            )
+                    language="pgsql",
+                    theme="solarized_dark",
+                    auto_update=True,
+                )
 
-        with buttons:
-            try:
-                space_name = st.selectbox(
-                    "Graph Space",
-                    st.session_state.space_name_list,
-                    key="space_name",
+            with buttons:
+                try:
+                    space_name = st.selectbox(
+                        "Graph Space",
+                        st.session_state.space_name_list,
+                        key="space_name",
+                    )
+                except Exception as e:
+                    st.warning("Failed to get spaces, reload and reconnect, please.",
+                               icon="😵‍💫")
+                    st.stop()
+
+                bypass_cache = st.checkbox(
+                    "Bypass cache",
+                    key="bypass_cache",
+                    disabled=not st.session_state.use_result_cache,
                 )
-            except Exception as e:
-                st.warning("Failed to get spaces, reload and reconnect, please.",
-                           icon="😵‍💫")
-                st.stop()
+                execute_clicked = st.button(
+                    "Execute",
+                    use_container_width=True,
+                    type="secondary",
+                    disabled=not bool(st.session_state.space_name),
+                )
+                # filled once the batch is executed below
+                gexf_slot = st.empty()
+                cancel_slot = st.empty()
 
-            if st.button(
-                "Execute",
-                use_container_width=True,
-                type="secondary",
-                disabled=not bool(st.session_state.space_name),
-            ):
-                results = query_nebulagraph(
+            if execute_clicked and st.session_state.paged_fetch:
+                queries = split_statements(query)
+                if not queries:
+                    st.warning("query failed", icon="⚠️")
+                    st.stop()
+                if st.session_state.batch is not None:
+                    st.session_state.batch.cancel()
+                    st.session_state.batch = None
+                st.session_state.queries = queries
+                st.session_state.stopped_statements = []
+                st.session_state.profile = Profile(
+                    batch_version(st.session_state.space_name, queries)
+                )
+                st.session_state.paging = [
+                    PagedQuery(i, q) for i, q in enumerate(queries)
+                ]
+                artifacts().clear()
+                artifacts().put(("graph",), GraphModel(), spill=True)
+                st.session_state.num_results = 0
+                fetch_next_pages(st.empty(), st.empty())
+
+            elif execute_clicked:
+                result_cache = (
+                    get_result_cache() if st.session_state.use_result_cache else None
+                )
+                profile = Profile(
+                    batch_version(st.session_state.space_name, split_statements(query))
+                )
+                st.session_state.profile = profile
+                query_nebulagraph(
                     query,
                     st.session_state.space_name,
                     st.session_state.graphd_host,
                     st.session_state.graphd_port,
                     st.session_state.user,
                     st.session_state.password,
+                    timeout=st.session_state.query_timeout,
+                    parallel=st.session_state.parallel_statements,
+                    max_workers=st.session_state.parallel_limit,
+                    cache=result_cache,
+                    bypass_cache=bypass_cache,
+                    profile=profile,
                 )
 
-                if results is None or len(results) == 0:
-                    st.warning("query failed", icon="⚠️")
+            if st.session_state.batch is not None:
+                results = wait_for_batch(st.empty(), cancel_slot)
+                if not results:
+                    if results is not None and st.session_state.stopped_statements:
+                        st.warning("All statements were stopped.", icon="⚠️")
+                    else:
+                        st.warning("query failed", icon="⚠️")
                     st.stop()
-                st.session_state.results = results
-
-                result_dfs = []
-                st.session_state.g = None
-                g, g_nx = None, None
-
-                for result in results:
-                    if result is not None and result.error_code() == 0:
-                        result_df = result_to_df(result)
-                        result_dfs.append(result_df)
-                        # create pyvis graph
-                        g, g_nx = create_graph(result_df, g, g_nx)
-
-                st.session_state.g = g
-                get_gephi_graph(g_nx)
-                with open("nebulagraph_export.gexf", "rb") as f:
-                    st.download_button(
-                        label="GEXF File",
-                        use_container_width=True,
-                        data=f.read(),
-                        type="primary",
-                        file_name="nebulagraph_export.gexf",
-                        mime="application/xml",
+
+                result_cache = (
+                    get_result_cache() if st.session_state.use_result_cache else None
+                )
+                profile = st.session_state.profile
+                st.session_state.paging = None
+                artifacts().clear("graph")
+                graph_results = [
+                    result
+                    for result in results
+                    if result is not None and result.error_code() == 0
+                ]
+                model = build_graphs(
+                    graph_results,
+                    result_cache,
+                    (
+                        "graphs",
+                        tuple(
+                            result_cache_key(
+                                st.session_state.graphd_host,
+                                st.session_state.graphd_port,
+                                st.session_state.user,
+                                st.session_state.space_name,
+                                q,
+                            )
+                            for q in st.session_state.queries
+                        ),
+                        st.session_state.layout_above,
+                        st.session_state.analytics,
+                    ),
+                    st.session_state.layout_above,
+                    profile,
+                    analytics=st.session_state.analytics,
+                )
+                store_batch(
+                    results,
+                    graph_results,
+                    model,
+                    batch_version(
+                        st.session_state.space_name, st.session_state.queries
+                    ),
+                )
+
+            if ("graph",) in artifacts():
+                offer_download(
+                    "gexf",
+                    "GEXF File",
+                    graph_gexf,
+                    "nebulagraph_export.gexf",
+                    "application/xml",
+                    type="primary",
+                    slot=gexf_slot,
+                )
+
+            for stopped_query, state, kill_error in st.session_state.stopped_statements:
+                stopped = "timed out" if state == "timed out" else "was cancelled"
+                if kill_error is None:
+                    stopped += " and was killed" if state == "timed out" else ""
+                else:
+                    stopped += (
+                        f" but couldn't be killed ({kill_error}),"
+                        " it runs on NebulaGraph until it ends"
+                    )
+                st.warning(
+                    f"`{truncate(' '.join(stopped_query.split()), 80)}` {stopped},"
+                    " the results of the statements done are shown.",
+                    icon="⏱️",
+                )
+            for paged in st.session_state.paging or []:
+                if paged.error is not None:
+                    st.warning(
+                        f"Query {paged.index + 1} failed after {paged.pages - 1}"
+                        f" pages, which are shown: {paged.error}",
+                        icon="⚠️",
                     )
-                st.session_state.result_dfs = result_dfs
-                st.session_state.excuted_clicked = True
-
-        if st.session_state.results is not None:
-            for result in st.session_state.results:
-                if result.error_code() != 0:
-                    st.markdown("---")
-                    st.warning(result.error_msg(), icon="⚠️")
-                    st.stop()
 
-        if st.session_state.excuted_clicked:
-            st.warning(
-                "Hint: Ensure to download files from a browser. "
-                "If you're using the `Docker Extension` embed window, "
-                "just click [http://127.0.0.1:17005](http://127.0.0.1:17005)"
-                " and visit from browser instead 😄.",
-                icon="💡",
-            )
+            for error in st.session_state.result_errors:
+                st.markdown("---")
+                st.warning(error, icon="⚠️")
+                st.stop()
+
+            if st.session_state.excuted_clicked:
+                st.warning(
+                    "Hint: Ensure to download files from a browser. "
+                    "If you're using the `Docker Extension` embed window, "
+                    "just click [http://127.0.0.1:17005](http://127.0.0.1:17005)"
+                    " and visit from browser instead 😄.",
+                    icon="💡",
+                )
+
+        if ("graph",) in artifacts():
+            paging = st.session_state.paging
+            if paging and not all(paged.done for paged in paging):
+                if st.button(
+                    f"Fetch more, up to {st.session_state.max_vertices} vertices"
+                    f" / {st.session_state.max_edges} edges",
+                    key="fetch_more",
+                ):
+                    fetch_next_pages(st.empty(), st.empty())
+
+            ids_col, expand_button_col = st.columns([4, 1])
+            with ids_col:
+                expand_ids = st.text_input(
+                    "Expand vertices",
+                    key="expand_ids",
+                    placeholder="player100, player101",
+                    label_visibility="collapsed",
+                    help=f"Comma separated vertex ids whose neighbors, up to"
+                    f" {EXPAND_STEPS} hop away, are added to the graph without"
+                    " running the statements again.",
+                )
+            with expand_button_col:
+                if st.button(
+                    "Expand",
+                    key="expand_vertices",
+                    use_container_width=True,
+                    disabled=not expand_ids.strip(),
+                ):
+                    expand_vertices(
+                        [vid.strip() for vid in expand_ids.split(",") if vid.strip()]
+                    )
 
-    if st.session_state.g is not None:
-        g = st.session_state.g
-        g_is_renderable = g.get_nodes() and g.get_edges()
-
-        if g_is_renderable:
-            # render with random file name
-            graph_html = g.generate_html()
-            graph_html.replace("height: 600px", "height: 720px")
-            components.html(graph_html, height=720, scrolling=False)
-
-        for index in range(len(st.session_state.result_dfs)):
-            # check all value to see whether there is any nested raw data, in case yes
-            # then we'll cast all values to string
-            raw_data = False
-            result_df = st.session_state.result_dfs[index]
-            df_is_empty = result_df.empty
-            for _, row in result_df.iterrows():
-                for item in row:
-                    if type(item) in [
-                        PathWrapper,
-                        GeographyWrapper,
-                        Node,
-                        Relationship,
-                        list,
-                    ]:
-                        raw_data = True
-                        break
-
-            if not raw_data:
-                csv_df = result_df
-
-            else:
-                # format result_df to string values
-                csv_df = result_df.applymap(lambda x: str(x))
-
-            # download buttons
-            # two col in one row
-            col0, col1, col2 = st.columns(
-                [2, 8, 2],
-                gap="small",
+            g = current_graph()
+            g_is_renderable = g.num_nodes and g.num_edges
+            size_by, color_by = "degree", "id"
+            # the drawn view, exports are cached per view
+            view = f"{size_by}:{color_by}"
+            build_view = lambda: get_export(
+                f"network:{size_by}:{color_by}",
+                lambda: to_network(g, size_by, color_by),
             )
-            with col1:
-                pass
-            with col0:
-                if g_is_renderable:
-                    g.filter_menu = False
-                    st.session_state.raw_pyvis_html = g.generate_html().replace(
-                        "height: 600px", "height: 1080px"
+            if g_is_renderable:
+                aggregated = g.num_nodes > st.session_state.aggregate_above
+                size_col, color_col, group_col, expand_col = st.columns([1, 1, 1, 3])
+                with size_col:
+                    size_by = st.selectbox(
+                        "Vertex size",
+                        list(SIZE_METRICS) + g.node_property_names(),
+                        key="size_by",
+                        help="Vertices are sized by the log of this value,"
+                        " PageRank and eigenvector centrality relative to"
+                        " their mean.",
                     )
-                    if st.session_state.raw_pyvis_html != "" and index == 0:
-                        st.download_button(
-                            label="⬇　 HTML File",
-                            data=st.session_state.raw_pyvis_html,
-                            type="secondary",
-                            file_name="nebulagraph_export.html",
-                            mime="text/html",
-                            use_container_width=True,
+                with color_col:
+                    color_by = st.selectbox(
+                        "Vertex color",
+                        COLOR_BY,
+                        key="color_by",
+                        help="Communities are found by label propagation.",
+                    )
+                view = f"{size_by}:{color_by}"
+                if aggregated:
+                    with group_col:
+                        group_by = st.selectbox(
+                            "Group vertices by",
+                            ["tag", "community"] + g.node_property_names(),
+                            key="group_by",
+                            help=f"The graph has more than"
+                            f" {st.session_state.aggregate_above} vertices, so"
+                            " groups are drawn instead. The GEXF file has all.",
                         )
-            with col2:
-                if not df_is_empty:
-                    # button to download csv
-                    st.download_button(
-                        label=f"⬇　.CSV File {index + 1}",
-                        data=csv_df.to_csv(index=False),
-                        type="secondary",
-                        file_name="nebulagraph_export.csv",
-                        mime="text/csv",
-                        use_container_width=True,
+                    groups, names = get_export(
+                        f"groups:{group_by}", lambda: group_vertices(g, group_by)
+                    )
+                    counts = np.bincount(groups, minlength=len(names))
+                    with expand_col:
+                        expanded = st.multiselect(
+                            "Expand groups",
+                            [
+                                group
+                                for group in range(len(names))
+                                if 0 < counts[group] <= st.session_state.aggregate_above
+                            ],
+                            format_func=lambda group: (
+                                f"{names[group]} ({counts[group]})"
+                            ),
+                            key=f"expand_{group_by}",
+                        )
+                    view = f"{size_by}:{color_by}:{group_by}:{sorted(expanded)}"
+                    build_view = lambda: to_group_network(
+                        g, groups, names, set(expanded), size_by, color_by
                     )
-            # download buttons end
 
-            # df table
-            st.markdown("---")
-            if len(st.session_state.queries) >= index + 1:
-                st.markdown(
-                    f"""
+            if g_is_renderable:
+                # render with random file name
+                graph_html = get_export(
+                    f"embed_html:{view}", lambda: build_view().generate_html()
+                )
+                components.html(graph_html, height=720, scrolling=False)
+
+            for index in range(st.session_state.num_results):
+                # typed once per result, nested columns cast to str
+                csv_df = get_result_df(index)
+                df_is_empty = csv_df.empty
+
+                # download buttons
+                # two col in one row
+                col0, col1, col2 = st.columns(
+                    [2, 8, 2],
+                    gap="small",
+                )
+                with col1:
+                    pass
+                # exports are generated on the first click, then cached
+                with col0:
+                    if g_is_renderable and index == 0:
+                        html_mode = st.session_state.html_export
+                        gzipped = html_mode.endswith("gzipped")
+                        offer_download(
+                            f"html:{html_mode}:{view}",
+                            "HTML File",
+                            lambda: html_export(build_view(), html_mode),
+                            "nebulagraph_export.html" + (".gz" if gzipped else ""),
+                            "application/gzip" if gzipped else "text/html",
+                        )
+                    if g.num_nodes and index == 0:
+                        # vertex and edge lists of the merged graph
+                        for kind, frame in (
+                            ("nodes", g.node_frame),
+                            ("edges", g.edge_frame),
+                        ):
+                            offer_download(
+                                kind,
+                                f"{kind.title()} .CSV",
+                                lambda: frame().to_csv(index=False),
+                                f"nebulagraph_{kind}.csv",
+                                "text/csv",
+                            )
+                        # typed, from the results rather than the graph
+                        for table, kind in enumerate(("nodes", "edges")):
+                            offer_download(
+                                f"{kind}_parquet",
+                                f"{kind.title()} .parquet",
+                                lambda: table_bytes(
+                                    get_export(
+                                        "tables",
+                                        lambda: graph_tables(current_results()),
+                                    )[table]
+                                ),
+                                f"nebulagraph_{kind}.parquet",
+                                "application/vnd.apache.parquet",
+                            )
+                with col2:
+                    if not df_is_empty:
+                        offer_download(
+                            f"csv_{index}",
+                            f".CSV File {index + 1}",
+                            lambda: csv_df.to_csv(index=False),
+                            "nebulagraph_export.csv",
+                            "text/csv",
+                        )
+                # download buttons end
+
+                # df table
+                st.markdown("---")
+                if len(st.session_state.queries) >= index + 1:
+                    timing = ""
+                    if len(st.session_state.query_timings) >= index + 1:
+                        timing = f" ({st.session_state.query_timings[index]:.3f}s)"
+                    if (
+                        len(st.session_state.cached_statements) >= index + 1
+                        and st.session_state.cached_statements[index]
+                    ):
+                        timing += ", cached"
+                    if len(st.session_state.duplicates) >= index + 1:
+                        skipped = st.session_state.duplicates[index]
+                        timing += (
+                            f", skipped duplicates: {skipped['nodes']} vertices,"
+                            f" {skipped['edges']} edges"
+                        )
+                    st.markdown(
+                        f"""
 ```cypher
--- Query {index + 1}
+-- Query {index + 1}{timing}
 {st.session_state.queries[index]}
 ```
     """
-                )
-            try:
-                st.dataframe(
-                    csv_df,
-                    use_container_width=True,
-                    hide_index=True,
-                )
-            except Exception as e:
-                st.warning(e, icon="⚠️")
-            # df table end
+                    )
+                try:
+                    st.dataframe(
+                        csv_df,
+                        use_container_width=True,
+                        hide_index=True,
+                    )
+                except Exception as e:
+                    st.warning(e, icon="⚠️")
+                show_profile(index)
+                # df table end
 
 
-with tab_gephi:
-    # iframe of https://gephi.org/gephi-lite/
-    # when click this tab, hide the sidebar
+    with tab_gephi:
+        # iframe of https://gephi.org/gephi-lite/
+        # when click this tab, hide the sidebar
 
-    components.iframe(
-        src="https://gephi.org/gephi-lite/",
-        height=800,
-        scrolling=True,
-    )
+        components.iframe(
+            src="https://gephi.org/gephi-lite/",
+            height=800,
+            scrolling=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
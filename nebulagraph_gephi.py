@@ -0,0 +1,4402 @@
+"""NebulaGraph query results to GEXF, CSV and HTML files, without a browser.
+
+The pipeline behind the Streamlit app in nebulagraph-gephi-exchange.py, with
+a command line for batch exports:
+
+    python -m nebulagraph_gephi queries.ngql --address graphd \\
+        --space basketballplayer --gexf graph.gexf --csv results/
+
+pandas and pyvis are imported by the functions that need them, so runs that
+don't export tables or HTML never load them.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import datetime
+import gzip
+import hashlib
+import io
+import json
+import logging
+import math
+import os
+import pickle
+import queue
+import re
+import sys
+import tempfile
+import threading
+import time
+import weakref
+import zipfile
+from array import array
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import ExitStack, closing, contextmanager, nullcontext
+from functools import lru_cache
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Dict, Optional, Set, Tuple, Union
+from xml.sax.saxutils import escape
+
+import numpy as np
+from nebula3.common.ttypes import DataSet, Value, Vertex
+from nebula3.data.DataObject import Node, PathWrapper, Relationship, ValueWrapper
+from nebula3.data.ResultSet import ResultSet
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+    from nebula3.gclient.net import ConnectionPool
+    from pyvis.network import Network
+
+
+logger = logging.getLogger("nebulagraph_gephi")
+# profiling: the stages of a batch, shown by the app and logged as JSON lines
+stage_logger = logging.getLogger("nebulagraph_gephi.stages")
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _rss_bytes() -> Optional[int]:
+    """Resident memory of the process, None without /proc."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Profile:
+    """Wall time, counts and memory of the stages of a query batch.
+
+    Every stage is a dict of its stage name, statement (its index, None for
+    stages of the whole batch), seconds, count (rows or graph elements),
+    rss_delta (growth of resident memory in bytes) and stage specific
+    fields. Stages are logged to stage_logger as they end; statements
+    running in parallel may record into the same profile.
+    """
+
+    def __init__(self, batch: str = None):
+        self.batch = batch
+        self.stages: List[dict] = []
+        self._lock = threading.Lock()
+
+    def add(
+        self,
+        stage: str,
+        seconds: float,
+        statement: int = None,
+        count: int = None,
+        rss_delta: int = None,
+        **fields,
+    ) -> None:
+        record = {
+            "stage": stage,
+            "statement": statement,
+            "seconds": seconds,
+            "count": count,
+            "rss_delta": rss_delta,
+            **fields,
+        }
+        with self._lock:
+            self.stages.append(record)
+        if stage_logger.isEnabledFor(logging.INFO):
+            line = {"time": time.time(), "batch": self.batch, **record}
+            stage_logger.info(json.dumps(line, default=str))
+
+    @contextmanager
+    def stage(self, stage: str, statement: int = None, count: int = None):
+        """Record the with block as stage; fields set on the yielded dict,
+        such as count, go into the record."""
+        fields = {"count": count}
+        rss = _rss_bytes()
+        start = time.perf_counter()
+        try:
+            yield fields
+        finally:
+            seconds = time.perf_counter() - start
+            after = _rss_bytes()
+            delta = None if rss is None or after is None else after - rss
+            self.add(stage, seconds, statement, rss_delta=delta, **fields)
+
+    def statement_stages(self, statement: Optional[int]) -> List[dict]:
+        with self._lock:
+            return [r for r in self.stages if r["statement"] == statement]
+
+
+def enable_stage_logs(stream=None) -> None:
+    """Log stages as JSON lines to stream, stderr by default, once per process."""
+    if not stage_logger.handlers:
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        stage_logger.addHandler(handler)
+        stage_logger.setLevel(logging.INFO)
+        stage_logger.propagate = False
+
+
+# for nebulagraph
+def result_to_df(result) -> Dict[str, list]:
+    if result is None:
+        return None
+
+    import pandas as pd
+
+    columns = result.keys()
+    d: Dict[str, list] = {}
+    for col_num in range(result.col_size()):
+        col_name = columns[col_num]
+        col_list = result.column_values(col_name)
+        d[col_name] = [x.cast() for x in col_list]
+    return pd.DataFrame(d)
+
+
+# values shown and exported as their str, pandas and Arrow can't hold them
+NESTED_VALUE_TYPES = frozenset(
+    (
+        Value.VVAL,
+        Value.EVAL,
+        Value.PVAL,
+        Value.LVAL,
+        Value.MVAL,
+        Value.UVAL,
+        Value.GGVAL,
+    )
+)
+
+
+def result_frame(result) -> pd.DataFrame:
+    """result_to_df for display and CSV, built once per result.
+
+    A column holding any vertex, edge, path, collection or geography is cast
+    to str. Column types are read from the thrift values, so nothing scans
+    the cells of the frame afterwards.
+    """
+    if result is None:
+        return None
+
+    import pandas as pd
+
+    d: Dict[str, list] = {}
+    for col_name in result.keys():
+        col_list = result.column_values(col_name)
+        if any(x.get_value().getType() in NESTED_VALUE_TYPES for x in col_list):
+            d[col_name] = [str(x.cast()) for x in col_list]
+        else:
+            d[col_name] = [x.cast() for x in col_list]
+    return pd.DataFrame(d)
+
+
+def batch_version(space_name: str, queries: List[str]) -> str:
+    """Hash of a query batch, the version exports are cached under."""
+    batch = "\n".join([space_name or ""] + queries)
+    return hashlib.sha256(batch.encode("utf-8")).hexdigest()[:16]
+
+
+def generate_download_html(g: Network) -> str:
+    # the downloaded page goes without the filter menu, and taller
+    g.filter_menu = False
+    try:
+        return g.generate_html().replace("height: 600px", "height: 1080px")
+    finally:
+        g.filter_menu = True
+
+
+# compact HTML export: a columnar payload decoded in the page, and one copy of
+# vis-network, inline or from its CDN, instead of the pyvis template
+HTML_EXPORT_MODES = ("Full", "Compact", "Compact, gzipped")
+VIS_NETWORK_CDN = (
+    "https://cdnjs.cloudflare.com/ajax/libs/vis-network/9.1.2/dist/vis-network.min.js"
+)
+# digits kept of sizes and coordinates
+COMPACT_FLOAT_DIGITS = 1
+_COMPACT_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>NebulaGraph Gephi Exchange</title>
+{assets}<style>html,body{{margin:0;height:100%;background:{bgcolor}}}\
+#graph{{width:100%;height:100%}}</style></head>
+<body><div id="graph"></div><script>
+var d={payload};
+function rows(p,n){{var r=[],i,k,c,v;for(i=0;i<n;i++)r.push({{}});\
+for(k in p){{c=p[k];for(i=0;i<n;i++){{v="c" in c?c.c:"s" in c?d.s[c.s[i]]:c.v[i];\
+if(v!==null)r[i][k]=v;}}}}return r;}}
+new vis.Network(document.getElementById("graph"),{{nodes:new vis.DataSet(\
+rows(d.n,d.nn)),edges:new vis.DataSet(rows(d.e,d.ne))}},d.o);
+</script></body></html>
+"""
+
+
+@lru_cache(maxsize=None)
+def vis_network_assets() -> Tuple[str, str]:
+    """vis-network script shipped with pyvis and the tooltip rules of its
+    stylesheet, read once per process."""
+    import pyvis
+
+    lib = os.path.join(os.path.dirname(pyvis.__file__), "templates", "lib")
+    with open(os.path.join(lib, "vis-9.1.2", "vis-network.min.js")) as f:
+        script = f.read()
+    with open(os.path.join(lib, "vis-9.1.2", "vis-network.css")) as f:
+        rules = f.read().split("}")
+    style = "".join(rule + "}" for rule in rules if "vis-tooltip" in rule)
+    return script, style
+
+
+def _pack_rows(rows: List[dict], strings: Dict[str, int]) -> dict:
+    """Columns of rows, keyed like the rows.
+
+    A column with a single value is stored once as {"c": value}, string
+    columns with repeats as {"s": [index into strings]}, others as
+    {"v": [value]} with floats rounded. Missing values are null.
+    """
+    keys = list(OrderedDict.fromkeys(key for row in rows for key in row))
+    packed = {}
+    for key in keys:
+        column = [row.get(key) for row in rows]
+        first = column[0]
+        if all(value == first for value in column):
+            packed[key] = {"c": first}
+        elif all(type(v) is str for v in column) and len(set(column)) < len(rows):
+            packed[key] = {
+                "s": [strings.setdefault(value, len(strings)) for value in column]
+            }
+        else:
+            digits = COMPACT_FLOAT_DIGITS
+            packed[key] = {
+                "v": [round(v, digits) if type(v) is float else v for v in column]
+            }
+    return packed
+
+
+def compact_html(g: Network, assets: str = "inline") -> str:
+    """Standalone page drawing g, a fraction of the size of g.generate_html().
+
+    Nodes and edges are packed by _pack_rows into minified JSON. assets is
+    "inline" for a page that works offline or "cdn" to load vis-network from
+    its CDN. The pyvis filter menu and neighborhood highlight are left out.
+    """
+    strings = {}
+    payload = {
+        "nn": len(g.nodes),
+        "n": _pack_rows(g.nodes, strings),
+        "ne": len(g.edges),
+        "e": _pack_rows(g.edges, strings),
+        "o": json.loads(g.options.to_json()),
+    }
+    payload["s"] = list(strings)
+    packed = json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+    script, style = vis_network_assets()
+    if assets == "cdn":
+        tags = f'<script src="{VIS_NETWORK_CDN}"></script>\n'
+    else:
+        tags = f"<script>{script}</script>\n"
+    return _COMPACT_HTML.format(
+        assets=f"{tags}<style>{style}</style>",
+        bgcolor=g.bgcolor,
+        # </script> must not end the script early
+        payload=packed.replace("</", "<\\/"),
+    )
+
+
+def html_export(g: Network, mode: str) -> Union[str, bytes]:
+    """Download of g in one of HTML_EXPORT_MODES."""
+    if mode == "Full":
+        return generate_download_html(g)
+    html = compact_html(g)
+    if mode == "Compact":
+        return html
+    return gzip.compress(html.encode("utf-8"), compresslevel=6, mtime=0)
+
+
+# COLORS = ["#E2DBBE", "#D5D6AA", "#9DBBAE", "#769FB6", "#188FA7"]
+# solarized dark
+COLORS = [
+    "#93A1A1",
+    "#B58900",
+    "#CB4B16",
+    "#DC322F",
+    "#D33682",
+    "#6C71C4",
+    "#268BD2",
+    "#2AA198",
+    "#859900",
+]
+
+
+def truncate(string: str, length: int = 10) -> str:
+    if len(string) > length:
+        return string[:length] + ".."
+    else:
+        return string
+
+
+def get_color(input_str: str) -> str:
+    hash_val = 0
+    for char in input_str:
+        hash_val = (hash_val * 31 + ord(char)) & 0xFFFFFFFF
+    return COLORS[hash_val % len(COLORS)]
+
+
+class IndexedIds(list):
+    """A list with O(1) `in`, used as pyvis Network.node_ids.
+
+    pyvis checks node ids with `in` on every add_node and add_edge, which is
+    a scan of the list otherwise.
+    """
+
+    def __init__(self, ids=()):
+        super().__init__(ids)
+        self._ids = set(self)
+
+    def append(self, node_id) -> None:
+        super().append(node_id)
+        self._ids.add(node_id)
+
+    def __contains__(self, node_id) -> bool:
+        return node_id in self._ids
+
+
+class PropertyTable:
+    """Columnar string properties of the vertices of one tag set, or the edges
+    of one edge type. Missing properties are None."""
+
+    def __init__(self):
+        self.columns: Dict[str, List[Optional[str]]] = {}
+        self.size = 0
+
+    def append(self, props: Dict[str, str]) -> int:
+        """Add props as a row, returns its row number."""
+        row = self.size
+        columns = self.columns
+        for k, v in props.items():
+            column = columns.get(k)
+            if column is None:
+                column = columns[k] = [None] * row
+            column.append(v)
+        self.size = row + 1
+        if len(props) != len(columns):
+            for column in columns.values():
+                if len(column) == row:
+                    column.append(None)
+        return row
+
+    def row(self, row: int) -> Dict[str, str]:
+        props = {}
+        for k, column in self.columns.items():
+            if column[row] is not None:
+                props[k] = column[row]
+        return props
+
+    def copy(self) -> "PropertyTable":
+        other = PropertyTable()
+        other.columns = {k: column[:] for k, column in self.columns.items()}
+        other.size = self.size
+        return other
+
+
+class GraphModel:
+    """The graph of a query batch, built once and shared by all renderers and
+    exporters: pyvis HTML, GEXF, the node/edge CSVs and metrics.
+
+    Vertex ids are interned to integer indices. Edges are int64 columns of
+    source, destination, type and rank indices, and properties are stored
+    per tag set and edge type in PropertyTables. Edge endpoints that never
+    show up as a vertex are kept as bare vertices, without a table.
+
+    Each element shared by statements or paths is added only once, the
+    skipped duplicates are counted per query.
+    """
+
+    def __init__(self):
+        self.node_ids: List[str] = []
+        self._node_index: Dict[str, int] = {}
+        # table and row of each vertex, table -1 for bare vertices
+        self.node_table = array("i")
+        self.node_row = array("i")
+        self.node_tables: List[PropertyTable] = []
+        self.node_table_tags: List[Tuple[str, ...]] = []
+        self._node_table_index: Dict[Tuple[str, ...], int] = {}
+
+        self.edge_src = array("q")
+        self.edge_dst = array("q")
+        self.edge_type = array("i")
+        self.edge_rank = array("q")
+        self.edge_row = array("i")
+        self.edge_types: List[str] = []
+        self.edge_tables: List[PropertyTable] = []
+        self._edge_type_index: Dict[str, int] = {}
+        # (src, dst, type, rank) of each edge packed into one int
+        self._edge_keys: Set[int] = set()
+        # colors of the first len(_colors) vertices, see colors()
+        self._colors: List[str] = []
+        # (n, 2) coordinates of the first n vertices, see layout_model()
+        self.layout: Optional[np.ndarray] = None
+        # name -> (num_nodes, num_edges, values) of model_metric
+        self.metrics: Dict[str, Tuple[int, int, np.ndarray]] = {}
+
+        # skipped duplicates, one {"nodes": n, "edges": n} per query
+        self.duplicates: List[Dict[str, int]] = []
+        # the query skipped duplicates are counted for
+        self.current = -1
+
+        # vertices whose neighbors were added by expand_graph, and whether
+        # the space has INT64 vids, once expand_graph asked
+        self.expanded: Set[str] = set()
+        self.int_vids: Optional[bool] = None
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.edge_src)
+
+    def copy(self) -> "GraphModel":
+        """A copy to grow, leaving this one as is, e.g. a cached one."""
+        other = GraphModel()
+        for name, value in vars(self).items():
+            if name in ("node_tables", "edge_tables"):
+                value = [table.copy() for table in value]
+            elif name == "duplicates":
+                value = [dict(counts) for counts in value]
+            elif isinstance(value, (list, array)):
+                value = value[:]
+            elif isinstance(value, (dict, set, np.ndarray)):
+                value = value.copy()
+            setattr(other, name, value)
+        return other
+
+    def start_query(self) -> None:
+        self.duplicates.append({"nodes": 0, "edges": 0})
+        self.current = len(self.duplicates) - 1
+
+    def select_query(self, index: int) -> None:
+        """Count duplicates for the index-th query, e.g. for its next page."""
+        while len(self.duplicates) <= index:
+            self.duplicates.append({"nodes": 0, "edges": 0})
+        self.current = index
+
+    def _skip(self, kind: str) -> None:
+        if not self.duplicates:
+            self.start_query()
+        self.duplicates[self.current][kind] += 1
+
+    def _intern(self, node_id: str) -> int:
+        index = self._node_index.get(node_id)
+        if index is None:
+            index = self._node_index[node_id] = len(self.node_ids)
+            self.node_ids.append(node_id)
+            self.node_table.append(-1)
+            self.node_row.append(-1)
+        return index
+
+    def _edge_type_id(self, edge_name: str) -> int:
+        type_id = self._edge_type_index.get(edge_name)
+        if type_id is None:
+            type_id = self._edge_type_index[edge_name] = len(self.edge_types)
+            self.edge_types.append(edge_name)
+            self.edge_tables.append(PropertyTable())
+        return type_id
+
+    def seen_node(self, node_id: str) -> bool:
+        """Whether the vertex node_id was added before, as a vertex."""
+        index = self._node_index.get(node_id)
+        if index is not None and self.node_table[index] >= 0:
+            self._skip("nodes")
+            return True
+        return False
+
+    def add_node(self, node_id: str, tags: List[str], props: Dict[str, str]) -> None:
+        # props are stringified properties of all tags of the vertex
+        index = self._intern(node_id)
+        key = tuple(tags)
+        table = self._node_table_index.get(key)
+        if table is None:
+            table = self._node_table_index[key] = len(self.node_tables)
+            self.node_tables.append(PropertyTable())
+            self.node_table_tags.append(key)
+        self.node_table[index] = table
+        self.node_row[index] = self.node_tables[table].append(props)
+
+    def add_tag(self, node_id: str, tag: str, props: Dict[str, str]) -> None:
+        """Add tag and its props to the vertex node_id, e.g. scanned per tag.
+
+        A vertex that has other tags moves to the table of its new tag set,
+        its former row is left unused.
+        """
+        index = self._node_index.get(node_id)
+        if index is None or self.node_table[index] < 0:
+            self.add_node(node_id, [tag], props)
+            return
+        tags = self.node_tags(index)
+        if tag in tags:
+            self._skip("nodes")
+            return
+        self.add_node(node_id, [*tags, tag], {**self.node_props(index), **props})
+
+    def seen_edge(self, src_id: str, dst_id: str, edge_name: str, rank: int) -> bool:
+        """Whether the edge was added before, records it otherwise."""
+        key = (
+            (self._intern(src_id) << 32 | self._intern(dst_id)) << 16
+            | self._edge_type_id(edge_name)
+        ) << 64 | rank & 0xFFFFFFFFFFFFFFFF
+        if key in self._edge_keys:
+            self._skip("edges")
+            return True
+        self._edge_keys.add(key)
+        return False
+
+    def add_edge(
+        self, src_id: str, dst_id: str, edge_name: str, rank: int, props: Dict[str, str]
+    ) -> None:
+        type_id = self._edge_type_id(edge_name)
+        self.edge_src.append(self._intern(src_id))
+        self.edge_dst.append(self._intern(dst_id))
+        self.edge_type.append(type_id)
+        self.edge_rank.append(rank)
+        self.edge_row.append(self.edge_tables[type_id].append(props))
+
+    def node_tags(self, index: int) -> Tuple[str, ...]:
+        table = self.node_table[index]
+        return self.node_table_tags[table] if table >= 0 else ()
+
+    def node_props(self, index: int) -> Dict[str, str]:
+        table = self.node_table[index]
+        if table < 0:
+            return {}
+        return self.node_tables[table].row(self.node_row[index])
+
+    def node_attrs(self, index: int, skip: Iterable[str] = ()) -> Dict[str, str]:
+        """Exported attributes of a vertex, its first tag as type if it has many,
+        without the properties named in skip."""
+        tags = self.node_tags(index)
+        props = self.node_props(index)
+        for name in skip:
+            props.pop(name, None)
+        return {"type": tags[0], **props} if len(tags) > 1 else props
+
+    def edge_props(self, edge: int) -> Dict[str, str]:
+        return self.edge_tables[self.edge_type[edge]].row(self.edge_row[edge])
+
+    def edge_columns(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Source and destination indices of all edges, without copying.
+
+        The arrays can't grow while views of them are alive, so drop these
+        before adding edges.
+        """
+        if not self.edge_src:
+            return np.zeros(0, np.int64), np.zeros(0, np.int64)
+        return (
+            np.frombuffer(self.edge_src, dtype=np.int64),
+            np.frombuffer(self.edge_dst, dtype=np.int64),
+        )
+
+    def in_degrees(self) -> np.ndarray:
+        return np.bincount(self.edge_columns()[1], minlength=self.num_nodes)
+
+    def out_degrees(self) -> np.ndarray:
+        return np.bincount(self.edge_columns()[0], minlength=self.num_nodes)
+
+    def degrees(self) -> np.ndarray:
+        return self.in_degrees() + self.out_degrees()
+
+    def colors(self) -> List[str]:
+        """Color of every vertex, hashed once per vertex as vertices only grow."""
+        if len(self._colors) < self.num_nodes:
+            self._colors.extend(node_colors(self.node_ids[len(self._colors) :]))
+        return self._colors
+
+    def node_property_names(self) -> List[str]:
+        names = {name for table in self.node_tables for name in table.columns}
+        return sorted(names)
+
+    def node_column(self, name: str) -> np.ndarray:
+        """Property name of every vertex, None where missing."""
+        values = np.full(self.num_nodes, None, dtype=object)
+        if not self.num_nodes:
+            return values
+        node_table = np.frombuffer(self.node_table, dtype=np.int32)
+        node_row = np.frombuffer(self.node_row, dtype=np.int32)
+        for table_id, table in enumerate(self.node_tables):
+            column = table.columns.get(name)
+            if column is None:
+                continue
+            nodes = np.flatnonzero(node_table == table_id)
+            values[nodes] = np.asarray(column, dtype=object)[node_row[nodes]]
+        return values
+
+    def node_values(self, name: str) -> np.ndarray:
+        """Property name of every vertex as float, NaN if missing or not numeric."""
+        import pandas as pd
+
+        values = pd.to_numeric(pd.Series(self.node_column(name)), errors="coerce")
+        return values.to_numpy(dtype=float)
+
+    def node_frame(self) -> pd.DataFrame:
+        """One row per vertex: id, tags and the properties of all tags."""
+        import pandas as pd
+
+        rows = []
+        for index, node_id in enumerate(self.node_ids):
+            rows.append(
+                _keyed_row(
+                    {"id": node_id, "tags": ",".join(self.node_tags(index))},
+                    self.node_props(index),
+                )
+            )
+        return pd.DataFrame(rows, columns=None if rows else ["id", "tags"])
+
+    def edge_frame(self) -> pd.DataFrame:
+        """One row per edge: src, dst, edge_type, rank and its properties."""
+        import pandas as pd
+
+        rows = []
+        for edge in range(self.num_edges):
+            rows.append(
+                _keyed_row(
+                    {
+                        "src": self.node_ids[self.edge_src[edge]],
+                        "dst": self.node_ids[self.edge_dst[edge]],
+                        "edge_type": self.edge_types[self.edge_type[edge]],
+                        "rank": self.edge_rank[edge],
+                    },
+                    self.edge_props(edge),
+                )
+            )
+        return pd.DataFrame(
+            rows, columns=None if rows else ["src", "dst", "edge_type", "rank"]
+        )
+
+
+def node_label(node_id: str, tags: List[str], props: Dict[str, str]) -> str:
+    if "name" in props:
+        return props["name"]
+    for k in props:
+        if "name" in str(k).lower():
+            return props[k]
+    return f"tag: {tags}, id: {node_id}"
+
+
+def edge_label(edge_name: str, props: Dict[str, str]) -> str:
+    props_str_list: List[str] = []
+    for k in props:
+        if len(props_str_list) >= 1:
+            break
+        props_str_list.append(f"{truncate(k, 7)}: {truncate(str(props[k]), 8)}")
+    props_str = "\n".join(props_str_list)
+
+    return f"{props_str}\n{edge_name}" if props else edge_name
+
+
+def render_pd_item(model: GraphModel, item):
+    if isinstance(item, Node):
+        node_id = str(item.get_id().cast())
+        if model.seen_node(node_id):
+            return
+        tags = item.tags()  # list of strings
+        props_raw = dict()
+        for tag in tags:
+            props_raw.update(item.properties(tag))
+        props = {
+            k: str(v.cast()) if hasattr(v, "cast") else str(v)
+            for k, v in props_raw.items()
+        }
+        model.add_node(node_id, tags, props)
+    elif isinstance(item, Relationship):
+        src_id = str(item.start_vertex_id().cast())
+        dst_id = str(item.end_vertex_id().cast())
+        edge_name = item.edge_name()
+        rank = item.ranking()
+        if model.seen_edge(src_id, dst_id, edge_name, rank):
+            return
+        props_raw = item.properties()
+        props = {
+            k: str(v.cast()) if hasattr(v, "cast") else str(v)
+            for k, v in props_raw.items()
+        }
+        model.add_edge(src_id, dst_id, edge_name, rank, props)
+    elif isinstance(item, PathWrapper):
+        for node in item.nodes():
+            render_pd_item(model, node)
+        for edge in item.relationships():
+            render_pd_item(model, edge)
+    elif isinstance(item, list):
+        for it in item:
+            render_pd_item(model, it)
+
+
+# streaming conversion: raw thrift values of a ResultSet straight to the graph,
+# without ValueWrapper/Node/Relationship/PathWrapper objects or a DataFrame
+DECODE_TYPE = "utf-8"
+
+
+def value_to_str(value: Value, timezone_offset: int = 0) -> str:
+    """Same as str(ValueWrapper(value).cast()), fast for primitive values."""
+    value_type = value.getType()
+    if value_type == Value.SVAL:
+        return value.get_sVal().decode(DECODE_TYPE)
+    if value_type == Value.IVAL:
+        return str(value.get_iVal())
+    if value_type == Value.FVAL:
+        return str(value.get_fVal())
+    if value_type == Value.BVAL:
+        return str(value.get_bVal())
+    return str(
+        ValueWrapper(
+            value, decode_type=DECODE_TYPE, timezone_offset=timezone_offset
+        ).cast()
+    )
+
+
+def render_vertex(
+    model: GraphModel,
+    vertex: Vertex,
+    timezone_offset: int = 0,
+    prop_value=value_to_str,
+) -> None:
+    node_id = value_to_str(vertex.vid, timezone_offset)
+    if model.seen_node(node_id):
+        return
+    tags = [tag.name.decode(DECODE_TYPE) for tag in vertex.tags]
+    props = dict()
+    for tag in vertex.tags:
+        if tag.props is None:
+            continue
+        for k, v in tag.props.items():
+            props[k.decode(DECODE_TYPE)] = prop_value(v, timezone_offset)
+    model.add_node(node_id, tags, props)
+
+
+def render_raw_edge(
+    model: GraphModel,
+    src: Value,
+    dst: Value,
+    name: bytes,
+    rank: int,
+    props_raw,
+    timezone_offset: int = 0,
+    prop_value=value_to_str,
+) -> None:
+    src_id = value_to_str(src, timezone_offset)
+    dst_id = value_to_str(dst, timezone_offset)
+    edge_name = name.decode(DECODE_TYPE)
+    if model.seen_edge(src_id, dst_id, edge_name, rank):
+        return
+    props = dict()
+    if props_raw is not None:
+        for k, v in props_raw.items():
+            props[k.decode(DECODE_TYPE)] = prop_value(v, timezone_offset)
+    model.add_edge(src_id, dst_id, edge_name, rank, props)
+
+
+def render_value(
+    model: GraphModel,
+    value: Value,
+    timezone_offset: int = 0,
+    prop_value=value_to_str,
+) -> None:
+    # same semantics as render_pd_item(model, ValueWrapper(value).cast());
+    # prop_value converts property values, to str for a GraphModel
+    value_type = value.getType()
+    if value_type == Value.VVAL:
+        render_vertex(model, value.get_vVal(), timezone_offset, prop_value)
+    elif value_type == Value.EVAL:
+        edge = value.get_eVal()
+        if edge.type > 0:
+            src, dst = edge.src, edge.dst
+        else:
+            src, dst = edge.dst, edge.src
+        render_raw_edge(
+            model,
+            src,
+            dst,
+            edge.name,
+            edge.ranking,
+            edge.props,
+            timezone_offset,
+            prop_value,
+        )
+    elif value_type == Value.PVAL:
+        path = value.get_pVal()
+        render_vertex(model, path.src, timezone_offset, prop_value)
+        for step in path.steps:
+            render_vertex(model, step.dst, timezone_offset, prop_value)
+        prev_vid = path.src.vid
+        for step in path.steps:
+            if step.type > 0:
+                src, dst = prev_vid, step.dst.vid
+            else:
+                src, dst = step.dst.vid, prev_vid
+            render_raw_edge(
+                model,
+                src,
+                dst,
+                step.name,
+                step.ranking,
+                step.props,
+                timezone_offset,
+                prop_value,
+            )
+            prev_vid = step.dst.vid
+    elif value_type == Value.LVAL:
+        for item in value.get_lVal().values:
+            render_value(model, item, timezone_offset, prop_value)
+
+
+def render_result(
+    model: GraphModel, result: ResultSet, prop_value=value_to_str
+) -> None:
+    """Stream every Node/Relationship/PathWrapper value of result into model."""
+    timezone_offset = getattr(result, "_timezone_offset", 0)
+    for row in result.rows():
+        for value in row.values:
+            render_value(model, value, timezone_offset, prop_value)
+
+
+def new_network() -> Network:
+    from pyvis.network import Network
+
+    g = Network(
+        notebook=True,
+        directed=True,
+        cdn_resources="in_line",
+        height="600px",
+        width="100%",
+        bgcolor="#002B36",
+        font_color="#93A1A1",
+        neighborhood_highlight=True,
+        # select_menu=True,
+        filter_menu=True,
+    )
+    g.node_ids = IndexedIds()
+    return g
+
+
+# large graphs are laid out on the server and drawn without physics
+LARGE_GRAPH_NODES = 1000
+LAYOUT_ITERATIONS = 100
+LAYOUT_TIME_BUDGET_SECONDS = 10.0
+# per page of a paged fetch, warm started from the former page
+LAYOUT_PREVIEW_ITERATIONS = 20
+LAYOUT_PREVIEW_TIME_BUDGET_SECONDS = 2.0
+# exact pairwise repulsion up to this many vertices, grid cells above
+EXACT_LAYOUT_NODES = 1500
+LAYOUT_GRID_SIZE = 32
+# pixels, the median edge length of a drawn layout
+LAYOUT_EDGE_LENGTH = 120.0
+_LAYOUT_CHUNK = 1024
+
+
+def _repulsion(pos: np.ndarray, centers: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Sum of weight / distance forces of centers on every position."""
+    force = np.zeros_like(pos)
+    cx, cy = centers[:, 0], centers[:, 1]
+    for start in range(0, len(pos), _LAYOUT_CHUNK):
+        chunk = pos[start : start + _LAYOUT_CHUNK]
+        dx = chunk[:, 0, None] - cx[None, :]
+        dy = chunk[:, 1, None] - cy[None, :]
+        dist2 = dx * dx + dy * dy
+        # coincident points, e.g. a vertex and itself, don't push
+        dist2[dist2 < 1e-12] = np.inf
+        scale = weights[None, :] / dist2
+        force[start : start + _LAYOUT_CHUNK, 0] = (scale * dx).sum(axis=1)
+        force[start : start + _LAYOUT_CHUNK, 1] = (scale * dy).sum(axis=1)
+    return force
+
+
+def _grid_repulsion(pos: np.ndarray, mass: np.ndarray, size: int) -> np.ndarray:
+    """_repulsion from the centers of mass of a size x size grid of cells.
+
+    Barnes-Hut with a single level: each vertex is pushed by whole cells,
+    its own cell counts without the vertex itself.
+    """
+    low = pos.min(axis=0)
+    span = np.maximum(pos.max(axis=0) - low, 1e-9)
+    cell_xy = np.minimum(((pos - low) / span * size).astype(np.int64), size - 1)
+    cell = cell_xy[:, 0] * size + cell_xy[:, 1]
+    weights = np.bincount(cell, weights=mass, minlength=size * size)
+    moments = np.stack(
+        [
+            np.bincount(cell, weights=mass * pos[:, 0], minlength=size * size),
+            np.bincount(cell, weights=mass * pos[:, 1], minlength=size * size),
+        ],
+        axis=1,
+    )
+    occupied = weights > 0
+    centers = moments[occupied] / weights[occupied, None]
+    force = _repulsion(pos, centers, weights[occupied])
+
+    def own_cell(center: np.ndarray, weight: np.ndarray) -> np.ndarray:
+        delta = pos - center
+        dist2 = np.einsum("ij,ij->i", delta, delta)
+        scale = np.zeros_like(dist2)
+        np.divide(weight, dist2, out=scale, where=dist2 > 1e-12)
+        return delta * scale[:, None]
+
+    # replace the own cell's push by the one of the other vertices in it
+    own_weight = weights[cell]
+    rest_weight = own_weight - mass
+    rest_center = np.zeros_like(pos)
+    has_rest = rest_weight > 1e-9
+    rest_center[has_rest] = (
+        moments[cell][has_rest] - mass[has_rest, None] * pos[has_rest]
+    ) / rest_weight[has_rest, None]
+    force -= own_cell(moments[cell] / own_weight[:, None], own_weight)
+    force += own_cell(rest_center, np.where(has_rest, rest_weight, 0.0))
+    return force
+
+
+def force_layout(
+    model: GraphModel,
+    initial: np.ndarray = None,
+    iterations: int = LAYOUT_ITERATIONS,
+    time_budget: float = LAYOUT_TIME_BUDGET_SECONDS,
+    seed: int = 0,
+) -> np.ndarray:
+    """ForceAtlas2 style coordinates of the vertices of model, (num_nodes, 2).
+
+    Vertices repel each other with (degree + 1) * (degree + 1) / distance,
+    edges pull their endpoints linearly and gravity keeps components
+    together. Vertices in initial keep their place as the start, new ones
+    start at random. Runs iterations steps at most, fewer once time_budget
+    seconds are spent.
+    """
+    n = model.num_nodes
+    rng = np.random.default_rng(seed)
+    spread = math.sqrt(max(n, 1))
+    pos = rng.uniform(-spread, spread, (n, 2))
+    if initial is not None and len(initial):
+        pos[: len(initial)] = initial[:n]
+    if n < 2:
+        return pos
+    mass = model.degrees().astype(float) + 1.0
+    src, dst = (column.copy() for column in model.edge_columns())
+    edges = src != dst
+    src, dst = src[edges], dst[edges]
+
+    deadline = time.perf_counter() + time_budget
+    for step in range(iterations):
+        if n <= EXACT_LAYOUT_NODES:
+            force = _repulsion(pos, pos, mass)
+        else:
+            force = _grid_repulsion(pos, mass, LAYOUT_GRID_SIZE)
+        force *= 2.0 * mass[:, None]
+        delta = pos[src] - pos[dst]
+        for axis in (0, 1):
+            force[:, axis] -= np.bincount(src, weights=delta[:, axis], minlength=n)
+            force[:, axis] += np.bincount(dst, weights=delta[:, axis], minlength=n)
+        norm = np.linalg.norm(pos, axis=1)
+        gravity = np.zeros_like(pos)
+        np.divide(pos, norm[:, None], out=gravity, where=norm[:, None] > 1e-12)
+        force -= gravity * mass[:, None]
+
+        # cooling: the step a vertex may take shrinks every iteration
+        temperature = spread * 0.5 * (1.0 - step / iterations) + 0.01
+        displacement = force / mass[:, None]
+        length = np.linalg.norm(displacement, axis=1)
+        capped = length > temperature
+        displacement[capped] *= (temperature / length[capped])[:, None]
+        pos += displacement
+        if time.perf_counter() > deadline:
+            break
+    return pos
+
+
+def layout_model(model: GraphModel, **kwargs) -> None:
+    """Compute model.layout, continuing from the former one if any."""
+    model.layout = force_layout(model, initial=model.layout, **kwargs)
+
+
+def node_positions(model: GraphModel) -> Optional[np.ndarray]:
+    """Pixel coordinates of the vertices, None unless all of them are laid out."""
+    layout = model.layout
+    if layout is None or len(layout) != model.num_nodes:
+        return None
+    src, dst = model.edge_columns()
+    lengths = np.linalg.norm(layout[src] - layout[dst], axis=1)
+    lengths = lengths[lengths > 0]
+    unit = float(np.median(lengths)) if len(lengths) else 1.0
+    return (layout - layout.mean(axis=0)) * (LAYOUT_EDGE_LENGTH / unit)
+
+
+# analytics: vertex metrics computed with numpy over the edge columns, so
+# PageRank and communities don't have to wait for Gephi-Lite in the browser
+ANALYTICS = ("pagerank", "eigenvector", "community")
+# per metric, past it the values of the last iteration are kept
+ANALYTICS_TIME_BUDGET_SECONDS = 2.0
+ANALYTICS_MAX_ITERATIONS = 100
+# change of the values, relative to their sum, under which they converged
+ANALYTICS_TOLERANCE = 1e-6
+PAGERANK_DAMPING = 0.85
+
+
+def pagerank(
+    model: GraphModel, deadline: float, damping: float = PAGERANK_DAMPING
+) -> Tuple[np.ndarray, int, bool]:
+    """PageRank of every vertex by power iteration, parallel edges counted.
+
+    Returns the ranks, the iterations run and whether they converged
+    before the deadline, a time.monotonic() value.
+    """
+    n = model.num_nodes
+    if not n:
+        return np.zeros(0), 0, True
+    src, dst = model.edge_columns()
+    out_degree = np.bincount(src, minlength=n).astype(float)
+    dangling = out_degree == 0
+    weight = np.divide(1.0, out_degree, out=np.zeros(n), where=~dangling)
+    rank = np.full(n, 1.0 / n)
+    for iteration in range(1, ANALYTICS_MAX_ITERATIONS + 1):
+        spread = np.bincount(dst, weights=(rank * weight)[src], minlength=n)
+        new = damping * (spread + rank[dangling].sum() / n) + (1 - damping) / n
+        delta = np.abs(new - rank).sum()
+        rank = new
+        # ranks sum to 1
+        if delta < ANALYTICS_TOLERANCE:
+            return rank, iteration, True
+        if time.monotonic() > deadline:
+            break
+    return rank, iteration, False
+
+
+def eigenvector_centrality(
+    model: GraphModel, deadline: float
+) -> Tuple[np.ndarray, int, bool]:
+    """Eigenvector centrality of the undirected graph, unit length.
+
+    Iterates x + Ax, as networkx does, so bipartite graphs converge too.
+    """
+    n = model.num_nodes
+    src, dst = model.edge_columns()
+    x = np.full(n, 1.0 / np.sqrt(max(n, 1)))
+    for iteration in range(1, ANALYTICS_MAX_ITERATIONS + 1):
+        new = (
+            x
+            + np.bincount(dst, weights=x[src], minlength=n)
+            + np.bincount(src, weights=x[dst], minlength=n)
+        )
+        norm = np.linalg.norm(new)
+        new = new / norm if norm else new
+        delta = np.abs(new - x).sum()
+        x = new
+        if delta < ANALYTICS_TOLERANCE * x.sum():
+            return x, iteration, True
+        if time.monotonic() > deadline:
+            break
+    return x, iteration if n else 0, not n
+
+
+def label_propagation(
+    model: GraphModel, deadline: float
+) -> Tuple[np.ndarray, int, bool]:
+    """Community of every vertex, numbered by size, largest first.
+
+    Every round, all vertices at once take the label most common among
+    themselves and their neighbors, the smallest one on ties; counting the
+    vertex itself keeps labels from flipping back and forth.
+    """
+    n = model.num_nodes
+    if not n:
+        return np.zeros(0, dtype=np.int64), 0, True
+    src, dst = model.edge_columns()
+    own = np.arange(n, dtype=np.int64)
+    vertex = np.concatenate([src, dst, own])
+    neighbor = np.concatenate([dst, src, own])
+    labels = own
+    converged = False
+    for iteration in range(1, ANALYTICS_MAX_ITERATIONS + 1):
+        pairs, counts = np.unique(vertex * n + labels[neighbor], return_counts=True)
+        vertices, candidates = np.divmod(pairs, n)
+        # per vertex, the most counted label, then the smallest
+        order = np.lexsort((candidates, -counts, vertices))
+        first = order[np.r_[True, np.diff(vertices[order]) != 0]]
+        new = labels.copy()
+        new[vertices[first]] = candidates[first]
+        if np.array_equal(new, labels):
+            converged = True
+            break
+        labels = new
+        if time.monotonic() > deadline:
+            break
+    _, community, sizes = np.unique(labels, return_inverse=True, return_counts=True)
+    by_size = np.empty(len(sizes), dtype=np.int64)
+    by_size[np.argsort(-sizes, kind="stable")] = np.arange(len(sizes))
+    return by_size[community], iteration, converged
+
+
+_ANALYTICS = {
+    "pagerank": pagerank,
+    "eigenvector": eigenvector_centrality,
+    "community": label_propagation,
+}
+
+
+def model_metric(
+    model: GraphModel,
+    name: str,
+    time_budget: float = ANALYTICS_TIME_BUDGET_SECONDS,
+    profile: Profile = None,
+) -> np.ndarray:
+    """The ANALYTICS metric name of every vertex.
+
+    Computed once per graph and kept in model.metrics, so it is shared by
+    the reruns, renderers and exports of a result version; an expanded
+    graph gets it computed again.
+    """
+    cached = model.metrics.get(name)
+    if cached is not None and cached[:2] == (model.num_nodes, model.num_edges):
+        return cached[2]
+    with _profiled(profile, "analytics") as fields:
+        values, iterations, converged = _ANALYTICS[name](
+            model, time.monotonic() + time_budget
+        )
+        fields.update(
+            metric=name,
+            count=model.num_nodes,
+            iterations=iterations,
+            converged=converged,
+        )
+    model.metrics[name] = (model.num_nodes, model.num_edges, values)
+    return values
+
+
+def analyze(
+    model: GraphModel,
+    metrics=ANALYTICS,
+    time_budget: float = ANALYTICS_TIME_BUDGET_SECONDS,
+    profile: Profile = None,
+) -> None:
+    """Compute metrics of model ahead, e.g. for the GEXF export."""
+    for name in metrics:
+        model_metric(model, name, time_budget, profile)
+
+
+def computed_metrics(model: GraphModel) -> Dict[str, np.ndarray]:
+    """The metrics in model.metrics that are up to date with model."""
+    return {
+        name: values
+        for name, (num_nodes, num_edges, values) in model.metrics.items()
+        if (num_nodes, num_edges) == (model.num_nodes, model.num_edges)
+    }
+
+
+# vertices are sized by one of these, or by a numeric vertex property
+SIZE_METRICS = ("degree", "in-degree", "out-degree", "pagerank", "eigenvector")
+# vertices are colored by a hash of their id, or by their community
+COLOR_BY = ("id", "community")
+# ids hashed in numpy per chunk, longer ones one by one with get_color
+COLOR_CHUNK_IDS = 65536
+COLOR_MAX_ID_LENGTH = 256
+_COLOR_TABLE = np.array(COLORS)
+
+
+def node_metric(model: GraphModel, metric: str = "degree") -> np.ndarray:
+    """metric of every vertex, a SIZE_METRICS name or a vertex property."""
+    if metric == "degree":
+        return model.degrees()
+    if metric == "in-degree":
+        return model.in_degrees()
+    if metric == "out-degree":
+        return model.out_degrees()
+    if metric in ("pagerank", "eigenvector"):
+        values = model_metric(model, metric)
+        # relative to the mean, so sizes compare to those by degree
+        mean = values.mean() if len(values) else 0.0
+        return values / mean if mean > 0 else values
+    return model.node_values(metric)
+
+
+def node_sizes(values: np.ndarray) -> np.ndarray:
+    # configure pyvis Network node size based on node degree, or another metric
+    values = np.maximum(np.nan_to_num(values.astype(float)), 0)
+    return np.log(values + 2) * 10
+
+
+def node_colors(node_ids: List[str]) -> List[str]:
+    """get_color of every id, with the hash computed for many ids at once."""
+    colors: List[str] = []
+    for start in range(0, len(node_ids), COLOR_CHUNK_IDS):
+        chunk = node_ids[start : start + COLOR_CHUNK_IDS]
+        chars = np.array(chunk, dtype=str)
+        if chars.itemsize // 4 > COLOR_MAX_ID_LENGTH:
+            colors.extend(get_color(node_id) for node_id in chunk)
+            continue
+        # one row of code points per id, NUL padded to the longest id
+        codes = chars.view(np.uint32).reshape(len(chunk), -1).astype(np.uint64)
+        hashes = np.zeros(len(chunk), dtype=np.uint64)
+        for column in codes.T:
+            hashes = np.where(column != 0, (hashes * 31 + column) & 0xFFFFFFFF, hashes)
+        colors.extend(_COLOR_TABLE[hashes % len(COLORS)].tolist())
+    return colors
+
+
+def vertex_colors(model: GraphModel, color_by: str = "id") -> List[str]:
+    """Color of every vertex, by a COLOR_BY name."""
+    if color_by == "community":
+        return _COLOR_TABLE[model_metric(model, "community") % len(COLORS)].tolist()
+    return model.colors()
+
+
+def to_network(
+    model: GraphModel, size_by: str = "degree", color_by: str = "id"
+) -> Network:
+    """pyvis graph of model, to be rendered as HTML.
+
+    With a layout of all vertices, they are placed at its coordinates and
+    the browser runs no physics.
+    """
+    g = new_network()
+    sizes = node_sizes(node_metric(model, size_by)).tolist()
+    colors = vertex_colors(model, color_by)
+    positions = node_positions(model)
+    xy = positions.tolist() if positions is not None else None
+    for index in range(model.num_nodes):
+        _add_vertex(g, model, index, sizes[index], colors[index], xy and xy[index])
+    for edge in range(model.num_edges):
+        _add_model_edge(g, model, edge)
+    style_graph(g, placed=xy is not None)
+    return g
+
+
+def extend_network(
+    g: Network,
+    model: GraphModel,
+    nodes_from: int,
+    edges_from: int,
+    size_by: str = "degree",
+    color_by: str = "id",
+) -> Network:
+    """Bring g, the to_network graph of model when it had nodes_from vertices
+    and edges_from edges, up to date with model.
+
+    Vertices and edges added since are drawn, sizes, colors and coordinates
+    of the others updated, and bare endpoints that became vertices relabeled. Other
+    vertices keep their labels, so this costs the added elements plus a pass
+    over the sizes. When the graph changed between placed and physics, a
+    new to_network graph is returned instead.
+    """
+    positions = node_positions(model)
+    xy = positions.tolist() if positions is not None else None
+    if (xy is not None) == g.options.physics.enabled:
+        return to_network(model, size_by, color_by)
+    sizes = node_sizes(node_metric(model, size_by)).tolist()
+    colors = vertex_colors(model, color_by)
+    for index, node in enumerate(g.nodes):
+        node["size"] = sizes[index]
+        # communities change as the graph grows, hashes of ids don't
+        node["color"] = colors[index]
+        if xy:
+            node["x"], node["y"] = xy[index]
+        if model.node_table[index] >= 0 and node["title"] == node["id"]:
+            node["label"], node["title"] = _vertex_text(model, index)
+    for index in range(nodes_from, model.num_nodes):
+        _add_vertex(g, model, index, sizes[index], colors[index], xy and xy[index])
+    for edge in range(edges_from, model.num_edges):
+        _add_model_edge(g, model, edge)
+    return g
+
+
+def _vertex_text(model: GraphModel, index: int) -> Tuple[str, str]:
+    """Label and title of a vertex."""
+    node_id = model.node_ids[index]
+    if model.node_table[index] < 0:
+        # an edge endpoint only
+        return str(node_id), str(node_id)
+    props = model.node_props(index)
+    label = node_label(node_id, list(model.node_tags(index)), props)
+    if "id" not in props:
+        props["id"] = node_id
+    return label, str(props)
+
+
+def _add_vertex(
+    g: Network, model: GraphModel, index: int, size: float, color: str, xy=None
+) -> None:
+    place = {"x": xy[0], "y": xy[1]} if xy else {}
+    label, title = _vertex_text(model, index)
+    g.add_node(
+        model.node_ids[index],
+        label=label,
+        title=title,
+        color=color,
+        size=size,
+        **place,
+    )
+
+
+def _add_model_edge(g: Network, model: GraphModel, edge: int) -> None:
+    props = model.edge_props(edge)
+    g.add_edge(
+        model.node_ids[model.edge_src[edge]],
+        model.node_ids[model.edge_dst[edge]],
+        label=edge_label(model.edge_types[model.edge_type[edge]], props),
+        title=str(props),
+    )
+
+
+def style_graph(g: Network, placed: bool = False) -> None:
+    g.repulsion(
+        node_distance=90,
+        central_gravity=0.2,
+        spring_length=200,
+        spring_strength=0.05,
+        damping=0.09,
+    )
+    if placed:
+        # nodes come with coordinates, see force_layout
+        g.toggle_physics(False)
+        # dynamic smooth edges add support nodes to the physics
+        g.options.edges.smooth.enabled = False
+
+    # g.hrepulsion(
+    #     node_distance=100,
+    #     central_gravity=0.2,
+    #     spring_length=200,
+    #     spring_strength=0.05,
+    #     damping=0.09,
+    # )
+    # g.force_atlas_2based(
+    # )
+
+
+# level of detail: big graphs are drawn as groups of vertices
+AGGREGATE_ABOVE = 5000
+NO_GROUP = "(none)"
+
+
+def group_vertices(
+    model: GraphModel, group_by: str = "tag"
+) -> Tuple[np.ndarray, List[str]]:
+    """Group of every vertex and the group names.
+
+    Vertices are grouped by their tags, their community, or by the value of
+    a vertex property; vertices without one form NO_GROUP.
+    """
+    if group_by == "community":
+        groups = model_metric(model, "community")
+        count = int(groups.max()) + 1 if len(groups) else 0
+        return groups, [f"community {group}" for group in range(count)]
+    if group_by == "tag":
+        names = [",".join(tags) for tags in model.node_table_tags] + [NO_GROUP]
+        groups = np.frombuffer(model.node_table, dtype=np.int32).copy()
+        groups[groups < 0] = len(names) - 1
+        return groups.astype(np.int64), names
+    import pandas as pd
+
+    column = model.node_column(group_by)
+    column[pd.isna(column)] = NO_GROUP
+    groups, names = pd.factorize(column.astype(str))
+    return groups.astype(np.int64), list(names)
+
+
+def group_id(name: str) -> str:
+    return f"group: {name}"
+
+
+def to_group_network(
+    model: GraphModel,
+    groups: np.ndarray,
+    names: List[str],
+    expanded: Set[int] = frozenset(),
+    size_by: str = "degree",
+    color_by: str = "id",
+) -> Network:
+    """pyvis graph of model with each group not in expanded as one supernode.
+
+    Edges between two shown vertices are drawn as they are, all the others
+    are merged per end, end and edge type into superedges weighted by their
+    count. The size of the output depends on the number of groups and the
+    size of the expanded ones, not on the size of model.
+    """
+    g = new_network()
+    shown = np.flatnonzero(np.isin(groups, list(expanded)))
+    counts = np.bincount(groups, minlength=len(names))
+    collapsed = [
+        group for group in range(len(names)) if counts[group] and group not in expanded
+    ]
+    # display node of every vertex: shown vertices first, then supernodes
+    supernode = np.full(len(names), -1, dtype=np.int64)
+    supernode[collapsed] = len(shown) + np.arange(len(collapsed))
+    display = supernode[groups]
+    display[shown] = np.arange(len(shown))
+    display_ids = [model.node_ids[index] for index in shown.tolist()]
+    display_ids += [group_id(names[group]) for group in collapsed]
+
+    positions = node_positions(model)
+    sizes = node_sizes(node_metric(model, size_by)).tolist()
+    colors = vertex_colors(model, color_by)
+    for index in shown.tolist():
+        xy = positions[index].tolist() if positions is not None else None
+        _add_vertex(g, model, index, sizes[index], colors[index], xy)
+    if positions is not None:
+        # supernodes sit at the center of their vertices
+        sums = np.stack(
+            [
+                np.bincount(groups, weights=positions[:, 0], minlength=len(names)),
+                np.bincount(groups, weights=positions[:, 1], minlength=len(names)),
+            ],
+            axis=1,
+        )
+        centers = sums / np.maximum(counts, 1)[:, None]
+    group_sizes = node_sizes(counts).tolist()
+    for group in collapsed:
+        place = {}
+        if positions is not None:
+            place = {"x": float(centers[group, 0]), "y": float(centers[group, 1])}
+        g.add_node(
+            group_id(names[group]),
+            label=f"{names[group]} ({counts[group]})",
+            title=f"{names[group]}: {counts[group]} vertices",
+            color=get_color(names[group]),
+            size=group_sizes[group] * 2,
+            shape="diamond",
+            **place,
+        )
+
+    if model.num_edges:
+        src, dst = (display[column] for column in model.edge_columns())
+        edge_type = np.frombuffer(model.edge_type, dtype=np.int32).astype(np.int64)
+        single = (src < len(shown)) & (dst < len(shown))
+        for edge in np.flatnonzero(single).tolist():
+            _add_model_edge(g, model, edge)
+        merged = ~single
+        num_display, num_types = len(display_ids), len(model.edge_types)
+        keys = (src[merged] * num_display + dst[merged]) * num_types + edge_type[merged]
+        keys, weights = np.unique(keys, return_counts=True)
+        for key, weight in zip(keys.tolist(), weights.tolist()):
+            pair, type_id = divmod(key, num_types)
+            pair_src, pair_dst = divmod(pair, num_display)
+            edge_name = model.edge_types[type_id]
+            g.add_edge(
+                display_ids[pair_src],
+                display_ids[pair_dst],
+                label=f"{edge_name} x{weight}",
+                title=f"{weight} {edge_name} edges",
+                value=weight,
+            )
+    style_graph(g, placed=positions is not None)
+    return g
+
+
+def create_graph(result: ResultSet, model: GraphModel = None) -> GraphModel:
+    # pass the same model to merge the results of a query batch
+    if model is None:
+        model = GraphModel()
+    model.start_query()
+    render_result(model, result)
+    return model
+
+
+# idle sessions/pools older than this are signed out and closed
+SESSION_IDLE_TIMEOUT_SECONDS = 300
+# idle sessions kept per (host, port, user, space)
+MAX_IDLE_SESSIONS_PER_KEY = 4
+
+
+class _PooledSession:
+    """An authenticated session plus the space it currently points to."""
+
+    def __init__(self, session, password_digest: str, space: Optional[str]):
+        self.session = session
+        self.password_digest = password_digest
+        self.space = space
+        self.last_used = time.monotonic()
+        # False once a statement was killed on it, see StatementWatch
+        self.reusable = True
+
+    @property
+    def session_id(self) -> Optional[int]:
+        # nebula3's Session has no public accessor for it
+        return getattr(self.session, "_session_id", None)
+
+
+class NebulaSessionManager:
+    """Process-wide ConnectionPool and session cache.
+
+    One ConnectionPool per (host, port), idle authenticated sessions kept per
+    (host, port, user, space), so reruns and users of the app skip the TCP
+    connect, authentication and `USE <space>` round trips. Every session
+    holds a connection of its pool, so once max_connections are taken, the
+    least recently used idle sessions of any user and space are released
+    for new ones.
+
+    pool_factory makes a pool, nebula3's ConnectionPool by default, imported
+    on the first connect as it pulls in the whole network client.
+    """
+
+    def __init__(
+        self,
+        idle_timeout: float = SESSION_IDLE_TIMEOUT_SECONDS,
+        max_idle_per_key: int = MAX_IDLE_SESSIONS_PER_KEY,
+        pool_factory=None,
+        max_connections: int = None,
+    ):
+        self.idle_timeout = idle_timeout
+        self.max_idle_per_key = max_idle_per_key
+        self.max_connections = max_connections or POOL_MAX_CONNECTIONS
+        self.pool_factory = pool_factory
+        self._lock = threading.Lock()
+        self._pools: Dict[Tuple[str, int], ConnectionPool] = {}
+        self._pool_last_used: Dict[Tuple[str, int], float] = {}
+        self._idle: Dict[Tuple[str, int, str, Optional[str]], List[_PooledSession]] = {}
+        self._in_use: Dict[Tuple[str, int], int] = {}
+        self.counters: Dict[str, int] = {
+            "pool_hits": 0,
+            "pool_misses": 0,
+            "session_hits": 0,
+            "session_misses": 0,
+            "use_skipped": 0,
+            "evicted": 0,
+        }
+
+    def _get_pool(self, address: str, port: int) -> ConnectionPool:
+        pool_key = (address, port)
+        pool = self._pools.get(pool_key)
+        if pool is not None:
+            self.counters["pool_hits"] += 1
+        else:
+            self.counters["pool_misses"] += 1
+            from nebula3.Config import Config
+
+            if self.pool_factory is None:
+                from nebula3.gclient.net import ConnectionPool
+
+                self.pool_factory = ConnectionPool
+            config: Config = Config()
+            config.max_connection_pool_size = self.max_connections
+            pool = self.pool_factory()
+            pool.init([(address, port)], config)
+            self._pools[pool_key] = pool
+        self._pool_last_used[pool_key] = time.monotonic()
+        return pool
+
+    def _acquire(
+        self, address: str, port: int, user: str, password: str, space: Optional[str]
+    ) -> _PooledSession:
+        digest = hashlib.sha256(password.encode("utf-8")).hexdigest()
+        self.evict_idle()
+        with self._lock:
+            pool = self._get_pool(address, port)
+            # prefer a session already in the space, then any idle session
+            # of this user, which only needs a `USE` to switch
+            for key in ((address, port, user, space),) + tuple(
+                k
+                for k in self._idle
+                if k[:3] == (address, port, user) and k[3] != space
+            ):
+                idle = self._idle.get(key, [])
+                for pooled in reversed(idle):
+                    # the password is checked as sessions are keyed by user
+                    if pooled.password_digest == digest:
+                        idle.remove(pooled)
+                        self.counters["session_hits"] += 1
+                        self._in_use[(address, port)] = (
+                            self._in_use.get((address, port), 0) + 1
+                        )
+                        return pooled
+            self.counters["session_misses"] += 1
+            self._in_use[(address, port)] = self._in_use.get((address, port), 0) + 1
+            victims = self._take_over_capacity(address, port)
+        for pooled in victims:
+            self._release(pooled)
+        try:
+            session = pool.get_session(user, password)
+        except Exception:
+            with self._lock:
+                self._in_use[(address, port)] -= 1
+            raise
+        return _PooledSession(session, digest, None)
+
+    def _take_over_capacity(self, address: str, port: int) -> List[_PooledSession]:
+        """Least recently used idle sessions of the pool of (address, port),
+        forgotten, whose connections the sessions in use need.
+
+        Must be called with the lock held.
+        """
+        idle = [
+            (pooled.last_used, key, pooled)
+            for key, sessions in self._idle.items()
+            if key[:2] == (address, port)
+            for pooled in sessions
+        ]
+        over = self._in_use[(address, port)] + len(idle) - self.max_connections
+        victims = []
+        for _, key, pooled in sorted(idle, key=lambda item: item[0])[: max(over, 0)]:
+            self._idle[key].remove(pooled)
+            if not self._idle[key]:
+                del self._idle[key]
+            victims.append(pooled)
+            self.counters["evicted"] += 1
+        return victims
+
+    def _checkin(self, address: str, port: int, user: str, pooled: _PooledSession):
+        pooled.last_used = time.monotonic()
+        with self._lock:
+            self._in_use[(address, port)] -= 1
+            idle = self._idle.setdefault((address, port, user, pooled.space), [])
+            if len(idle) < self.max_idle_per_key:
+                idle.append(pooled)
+                return
+        self._release(pooled)
+
+    @staticmethod
+    def _release(pooled: _PooledSession) -> None:
+        try:
+            pooled.session.release()
+        except Exception:
+            pass
+
+    def use_space(self, pooled: _PooledSession, space: Optional[str]) -> None:
+        """Switch the session to space, skipping `USE` if already there."""
+        if not space:
+            return
+        if pooled.space == space:
+            self.counters["use_skipped"] += 1
+            return
+        result = pooled.session.execute("USE {}".format(space))
+        if not result.is_succeeded():
+            raise RuntimeError(result.error_msg())
+        pooled.space = space
+
+    @contextmanager
+    def session(
+        self,
+        address: str,
+        port: int,
+        user: str,
+        password: str,
+        space: Optional[str] = None,
+    ):
+        """Check out a session switched to space, returned to the cache on exit.
+
+        Sessions that raised, or had a statement killed, are released
+        instead of being reused.
+        """
+        pooled = self._acquire(address, port, user, password, space)
+        try:
+            self.use_space(pooled, space)
+            yield pooled
+        except Exception:
+            self._discard(address, port, pooled)
+            raise
+        else:
+            if pooled.reusable:
+                self._checkin(address, port, user, pooled)
+            else:
+                self._discard(address, port, pooled)
+
+    def _discard(self, address: str, port: int, pooled: _PooledSession) -> None:
+        with self._lock:
+            self._in_use[(address, port)] -= 1
+        self._release(pooled)
+
+    def evict_idle(self) -> None:
+        """Release idle sessions and close unused pools past the idle timeout.
+
+        They are taken under the lock, then signed out and closed without
+        it, so checkouts don't wait for these round trips.
+        """
+        with self._lock:
+            stale, pools = self._take_stale()
+        for pooled in stale:
+            self._release(pooled)
+        for pool in pools:
+            pool.close()
+
+    def _take_stale(self) -> Tuple[List[_PooledSession], List[ConnectionPool]]:
+        """Idle sessions and unused pools past the idle timeout, forgotten.
+
+        Must be called with the lock held.
+        """
+        deadline = time.monotonic() - self.idle_timeout
+        stale, pools = [], []
+        for key in list(self._idle):
+            idle = self._idle[key]
+            for pooled in [pooled for pooled in idle if pooled.last_used < deadline]:
+                idle.remove(pooled)
+                stale.append(pooled)
+                self.counters["evicted"] += 1
+            if not idle:
+                del self._idle[key]
+        for pool_key in list(self._pools):
+            if (
+                self._pool_last_used[pool_key] < deadline
+                and not self._in_use.get(pool_key)
+                and not any(k[:2] == pool_key for k in self._idle)
+            ):
+                pools.append(self._pools.pop(pool_key))
+                del self._pool_last_used[pool_key]
+        return stale, pools
+
+    def close(self) -> None:
+        """Release the idle sessions and close the pools, e.g. before exit."""
+        with self._lock:
+            for idle in self._idle.values():
+                for pooled in idle:
+                    self._release(pooled)
+            self._idle.clear()
+            for pool in self._pools.values():
+                pool.close()
+            self._pools.clear()
+            self._pool_last_used.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self.counters)
+            stats["pools"] = len(self._pools)
+            stats["idle_sessions"] = sum(len(idle) for idle in self._idle.values())
+        return stats
+
+
+@lru_cache(maxsize=None)
+def get_session_manager() -> NebulaSessionManager:
+    """One NebulaSessionManager per process, shared by all reruns and users."""
+    return NebulaSessionManager()
+
+
+# result cache
+RESULT_CACHE_TTL_SECONDS = 600
+RESULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# rough in-memory cost of a result value and of a converted vertex/edge, the
+# cache charges entries by these estimates
+RESULT_VALUE_BYTES = 512
+GRAPH_ELEMENT_BYTES = 512
+# only read statements are cached
+CACHEABLE_STATEMENTS = ("MATCH", "GO", "GET", "FIND", "FETCH", "LOOKUP", "OPTIONAL")
+NGQL_KEYWORDS = {
+    "ALL", "AND", "AS", "ASC", "BIDIRECT", "BOTH", "BY", "CASE", "DESC",
+    "DISTINCT", "EDGE", "EDGES", "ELSE", "END", "FALSE", "FETCH", "FIND",
+    "FROM", "GET", "GO", "IN", "IS", "LIMIT", "LOOKUP", "MATCH", "NOLOOP",
+    "NOT", "NULL", "OF", "ON", "OPTIONAL", "OR", "ORDER", "OUT", "OVER",
+    "PATH", "PROP", "RETURN", "REVERSELY", "SAMPLE", "SHORTEST", "SKIP",
+    "STEP", "STEPS", "SUBGRAPH", "THEN", "TO", "TRUE", "UNWIND", "UPTO",
+    "VERTEX", "VERTICES", "WHEN", "WHERE", "WITH", "XOR", "YIELD",
+}  # fmt: skip
+_QUERY_TOKEN = re.compile(
+    r"""("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*'|`[^`]*`)|(\s+)|(\w+)|(.)""", re.S
+)
+
+
+def normalize_query(query: str) -> str:
+    """Collapse whitespace and upper-case nGQL keywords.
+
+    Quoted strings and the case of other identifiers, which are case
+    sensitive in NebulaGraph, are kept, as is the case of names after `.`,
+    `:` or AS, such as the property in `v.player.end` or the alias in
+    `AS path`.
+    """
+    tokens = []
+    # the former token starts a name
+    before_name = False
+    for quoted, space, word, other in _QUERY_TOKEN.findall(query):
+        if space:
+            tokens.append(" ")
+            continue
+        if word:
+            upper = word.upper()
+            keyword = not before_name and upper in NGQL_KEYWORDS
+            tokens.append(upper if keyword else word)
+            before_name = keyword and upper == "AS"
+        else:
+            tokens.append(quoted or other)
+            before_name = other in (".", ":")
+    return "".join(tokens).strip()
+
+
+def is_cacheable(query: str) -> bool:
+    return query.lstrip().upper().startswith(CACHEABLE_STATEMENTS)
+
+
+def result_cache_key(
+    address: str, port: int, user: str, space_name: str, query: str
+) -> Tuple:
+    # graphd and user are part of the key as they scope what a query sees
+    return (address, port, user, space_name, normalize_query(query))
+
+
+class ResultCache:
+    """Thread-safe LRU cache with a TTL and a memory cap, shared by sessions.
+
+    Entries are charged by a caller-supplied size estimate in bytes; least
+    recently used entries are evicted once max_bytes is exceeded.
+    """
+
+    def __init__(
+        self,
+        ttl: float = RESULT_CACHE_TTL_SECONDS,
+        max_bytes: int = RESULT_CACHE_MAX_BYTES,
+    ):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> (expires at, size, value)
+        self._entries: "OrderedDict[Tuple, Tuple[float, int, object]]" = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key: Tuple, value, size: int) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self.size += size
+            while self.size > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def _pop(self, key: Tuple) -> None:
+        self.size -= self._entries.pop(key)[1]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+@lru_cache(maxsize=None)
+def get_result_cache() -> ResultCache:
+    """One ResultCache per process, shared by all reruns and users."""
+    return ResultCache()
+
+
+def estimate_result_size(result: ResultSet) -> int:
+    return result.row_size() * max(result.col_size(), 1) * RESULT_VALUE_BYTES
+
+
+# session memory: the results, graphs and exports each session of the app
+# keeps, capped per session and for all sessions of the process
+SESSION_MEMORY_MAX_BYTES = 256 * 1024 * 1024
+MEMORY_MAX_BYTES = 1024 * 1024 * 1024
+
+
+def estimate_bytes(value) -> int:
+    """Rough in-memory size of an artifact: a result, graph, table or export."""
+    if isinstance(value, ResultSet):
+        return estimate_result_size(value)
+    if isinstance(value, GraphModel):
+        return (value.num_nodes + value.num_edges) * GRAPH_ELEMENT_BYTES
+    if isinstance(value, (str, bytes)):
+        return sys.getsizeof(value)
+    if isinstance(value, tempfile.SpooledTemporaryFile):
+        # a GEXF export of write_gexf, in memory up to GEXF_SPOOL_MAX_SIZE
+        position = value.tell()
+        size = value.seek(0, io.SEEK_END)
+        value.seek(position)
+        return min(size, GEXF_SPOOL_MAX_SIZE)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if hasattr(value, "memory_usage"):
+        # a DataFrame
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if hasattr(value, "nbytes"):
+        # an Arrow table
+        return value.nbytes
+    if isinstance(getattr(value, "nodes", None), list):
+        # a pyvis Network
+        return (len(value.nodes) + len(value.edges)) * GRAPH_ELEMENT_BYTES
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_bytes(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class _Artifact:
+    # in memory with value, or spilled to the file at path; spilling while
+    # it is written out, see MemoryManager._spill
+    __slots__ = ("value", "size", "spill", "path", "spilling")
+
+    def __init__(self, value, size: int, spill: bool):
+        self.value = value
+        self.size = size
+        self.spill = spill
+        self.path: Optional[str] = None
+        self.spilling = False
+
+
+class SessionArtifacts:
+    """Results, graphs and exports of one session of the app, in the memory
+    of a MemoryManager.
+
+    Keys are tuples, the kind of artifact first. Artifacts put with spill
+    are pickled to a temporary file when evicted and loaded again by get,
+    the others are dropped: get returns None for them, for the caller to
+    build them again. Values are not copied, so they mustn't change once
+    put, but to be put again. Artifacts and their files are released once
+    the SessionArtifacts is, with the session state.
+    """
+
+    def __init__(self, manager: "MemoryManager", session_id: int):
+        self.manager = manager
+        self.id = session_id
+        self._artifacts: Dict[Tuple, _Artifact] = {}
+
+    def __deepcopy__(self, memo) -> "SessionArtifacts":
+        # a handle on the memory of the manager, copies of the session state
+        # share it
+        return self
+
+    def put(self, key: Tuple, value, spill: bool = False, size: int = None) -> None:
+        """Keep value, charged size bytes, estimate_bytes(value) by default."""
+        size = estimate_bytes(value) if size is None else size
+        manager = self.manager
+        with manager._lock:
+            manager._discard(self.id, key)
+            artifact = self._artifacts[key] = _Artifact(value, size, spill)
+            manager._charge(self.id, key, artifact)
+            victims = manager._victims(self.id, key)
+        manager._spill(victims)
+
+    def get(self, key: Tuple, default=None):
+        """The value of key, loaded if it was spilled, default if dropped."""
+        manager = self.manager
+        victims = []
+        with manager._lock:
+            artifact = self._artifacts.get(key)
+            if artifact is None:
+                return default
+            path = artifact.path
+            if path is None:
+                if artifact.spilling:
+                    # used again before it was written out, see _spill
+                    artifact.spilling = False
+                    manager._charge(self.id, key, artifact)
+                    victims = manager._victims(self.id, key)
+                else:
+                    manager._lru.move_to_end((self.id, key))
+                value = artifact.value
+        if path is None:
+            manager._spill(victims)
+            return value
+        with open(path, "rb") as f:
+            value = pickle.load(f)
+        with manager._lock:
+            loaded = self._artifacts.get(key) is artifact and artifact.path == path
+            if loaded:
+                artifact.value, artifact.path = value, None
+                manager.spilled_bytes -= artifact.size
+                manager.counters["loaded"] += 1
+                manager._charge(self.id, key, artifact)
+                victims = manager._victims(self.id, key)
+        if loaded:
+            _remove_file(path)
+        manager._spill(victims)
+        return value
+
+    def peek(self, key: Tuple):
+        """The value of key if it is in memory, None otherwise."""
+        with self.manager._lock:
+            artifact = self._artifacts.get(key)
+            return artifact.value if artifact and artifact.path is None else None
+
+    def __contains__(self, key: Tuple) -> bool:
+        """Whether key is in memory or spilled, not dropped."""
+        return key in self._artifacts
+
+    def keys(self, kind: str = None) -> List[Tuple]:
+        with self.manager._lock:
+            return [key for key in self._artifacts if kind is None or key[0] == kind]
+
+    def pop(self, key: Tuple) -> None:
+        with self.manager._lock:
+            self.manager._discard(self.id, key)
+
+    def clear(self, kind: str = None) -> None:
+        """Release the artifacts of kind, all of them by default."""
+        with self.manager._lock:
+            for key in list(self._artifacts):
+                if kind is None or key[0] == kind:
+                    self.manager._discard(self.id, key)
+
+    @property
+    def size(self) -> int:
+        """Bytes of the artifacts in memory."""
+        with self.manager._lock:
+            return self.manager._session_bytes.get(self.id, 0)
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class MemoryManager:
+    """Memory of the SessionArtifacts of all sessions of the app.
+
+    Artifacts in memory are charged by their size and kept in one least
+    recently used order across sessions. A session holding more than
+    session_max_bytes has its own least recently used artifacts evicted,
+    and once all sessions hold more than max_bytes, the least recently used
+    ones of any session are, those of idle sessions first. The artifact a
+    session puts or gets is kept, even above the caps.
+
+    Spilled artifacts are written to and read from directory, a temporary
+    one by default, outside the lock, so sessions don't wait for each
+    other's disk.
+    """
+
+    def __init__(
+        self,
+        session_max_bytes: int = SESSION_MEMORY_MAX_BYTES,
+        max_bytes: int = MEMORY_MAX_BYTES,
+        directory: str = None,
+    ):
+        self.session_max_bytes = session_max_bytes
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self._lock = threading.Lock()
+        # (session id, key) -> artifact in memory, least recently used first
+        self._lru: "OrderedDict[Tuple[int, Tuple], _Artifact]" = OrderedDict()
+        self._stores: Dict[int, Dict[Tuple, _Artifact]] = {}
+        self._session_bytes: Dict[int, int] = {}
+        # sessions whose SessionArtifacts were released, see _reap
+        self._ended: List[int] = []
+        self._next_id = 0
+        self.size = 0
+        self.spilled_bytes = 0
+        self.counters: Dict[str, int] = {"spilled": 0, "dropped": 0, "loaded": 0}
+
+    def session(self) -> SessionArtifacts:
+        """SessionArtifacts of a new session."""
+        with self._lock:
+            self._reap()
+            self._next_id += 1
+            store = SessionArtifacts(self, self._next_id)
+            self._stores[store.id] = store._artifacts
+            self._session_bytes[store.id] = 0
+        # the finalizer may run in any thread, even one holding the lock
+        weakref.finalize(store, self._ended.append, store.id)
+        return store
+
+    def _reap(self) -> None:
+        """Release the artifacts of ended sessions, with the lock held."""
+        while self._ended:
+            session_id = self._ended.pop()
+            for key in list(self._stores.get(session_id, ())):
+                self._discard(session_id, key)
+            self._stores.pop(session_id, None)
+            self._session_bytes.pop(session_id, None)
+
+    def _charge(self, session_id: int, key: Tuple, artifact: _Artifact) -> None:
+        self._lru[(session_id, key)] = artifact
+        self.size += artifact.size
+        self._session_bytes[session_id] += artifact.size
+
+    def _uncharge(self, session_id: int, key: Tuple) -> Optional[_Artifact]:
+        artifact = self._lru.pop((session_id, key), None)
+        if artifact is not None:
+            self.size -= artifact.size
+            self._session_bytes[session_id] -= artifact.size
+        return artifact
+
+    def _discard(self, session_id: int, key: Tuple) -> None:
+        artifact = self._stores[session_id].pop(key, None)
+        if artifact is None:
+            return
+        self._uncharge(session_id, key)
+        artifact.spilling = False
+        if artifact.path is not None:
+            self.spilled_bytes -= artifact.size
+            _remove_file(artifact.path)
+
+    def _evict(self, session_id: int, key: Tuple, victims: list) -> None:
+        artifact = self._uncharge(session_id, key)
+        if artifact.spill:
+            artifact.spilling = True
+            victims.append((session_id, key, artifact))
+        else:
+            del self._stores[session_id][key]
+            self.counters["dropped"] += 1
+
+    def _victims(self, session_id: int, keep: Tuple) -> List[tuple]:
+        """Evict artifacts past the caps, but keep of session_id, with the
+        lock held. Returns the ones to spill, see _spill."""
+        self._reap()
+        victims = []
+        if self._session_bytes[session_id] > self.session_max_bytes:
+            for sid, key in list(self._lru):
+                if self._session_bytes[session_id] <= self.session_max_bytes:
+                    break
+                if sid == session_id and key != keep:
+                    self._evict(sid, key, victims)
+        for sid, key in list(self._lru):
+            if self.size <= self.max_bytes:
+                break
+            if (sid, key) != (session_id, keep):
+                self._evict(sid, key, victims)
+        return victims
+
+    def _spill_directory(self) -> str:
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix="nebulagraph-spill-")
+        return self.directory
+
+    def _spill(self, victims: List[tuple]) -> None:
+        """Pickle the victims of _victims to files, without the lock."""
+        for session_id, key, artifact in victims:
+            path = None
+            try:
+                fd, path = tempfile.mkstemp(
+                    prefix="artifact-", dir=self._spill_directory()
+                )
+                with os.fdopen(fd, "wb") as f:
+                    pickle.dump(artifact.value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                # e.g. an unpicklable value, kept in memory
+                if path is not None:
+                    _remove_file(path)
+                path = None
+            with self._lock:
+                current = self._stores.get(session_id, {}).get(key) is artifact
+                if not (current and artifact.spilling):
+                    # released, or used again meanwhile
+                    if path is not None:
+                        _remove_file(path)
+                    continue
+                artifact.spilling = False
+                if path is None:
+                    self._charge(session_id, key, artifact)
+                    continue
+                artifact.value, artifact.path = None, path
+                self.spilled_bytes += artifact.size
+                self.counters["spilled"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._reap()
+            stats = dict(self.counters)
+            stats["bytes"] = self.size
+            stats["spilled_bytes"] = self.spilled_bytes
+            stats["sessions"] = len(self._stores)
+        return stats
+
+
+@lru_cache(maxsize=None)
+def get_memory_manager() -> MemoryManager:
+    """One MemoryManager per process, shared by all sessions of the app."""
+    return MemoryManager()
+
+
+# upper bound of the per-batch concurrency
+MAX_PARALLEL_STATEMENTS = 8
+# seconds a statement of the app may run before it is killed
+QUERY_TIMEOUT_SECONDS = 300
+# how often timeouts and cancellation are checked, and the app polls batches
+QUERY_POLL_SECONDS = 0.25
+# batches running in the background at once, across sessions of the app
+MAX_BACKGROUND_BATCHES = 8
+# connections per graphd: the statements of every background batch, each
+# with a session to kill it, plus the script threads, paged fetches and
+# imports; idle sessions are released to stay below it
+POOL_MAX_CONNECTIONS = 2 * MAX_BACKGROUND_BATCHES * MAX_PARALLEL_STATEMENTS + 16
+# of a statement in a QueryBatch, the last two are final as "done"
+STATEMENT_STATES = ("pending", "running", "done", "timed out", "cancelled")
+
+
+def _profiled(profile: Optional[Profile], stage: str, statement: int = None):
+    """profile.stage, or a context yielding a throwaway dict without profile."""
+    if profile is None:
+        return nullcontext({})
+    return profile.stage(stage, statement)
+
+
+def kill_queries(
+    manager: NebulaSessionManager,
+    session_id: int,
+    address: str,
+    port: int,
+    user: str,
+    password: str,
+) -> int:
+    """Send `KILL QUERY` for every query graphd runs for session_id.
+
+    Sent over another session of user, as the one running the queries is
+    blocked, so the queries of all sessions are listed, SHOW QUERIES only
+    lists those of the session running it. Returns the number of queries
+    killed.
+    """
+    killed = 0
+    with manager.session(address, port, user, password) as pooled:
+        shown: ResultSet = pooled.session.execute("SHOW ALL QUERIES")
+        if not shown.is_succeeded():
+            raise RuntimeError(shown.error_msg())
+        for sid, plan in zip(
+            shown.column_values("SessionID"), shown.column_values("ExecutionPlanID")
+        ):
+            if sid.as_int() != session_id:
+                continue
+            result = pooled.session.execute(
+                f"KILL QUERY (session={session_id}, plan={plan.as_int()})"
+            )
+            killed += result.is_succeeded()
+    return killed
+
+
+class StatementWatch:
+    """Timeout and cancellation of the statements of a batch.
+
+    A statement running for more than timeout seconds, or while cancel is
+    set, is killed with kill_queries and its session is released instead of
+    being reused. on_stop(statement, state) is called with "timed out" or
+    "cancelled" as the kill is sent, so callers needn't wait for graphd to
+    answer the killed statement, which it does with an error. Kills that
+    failed are kept in kill_errors, as the statement then runs, and holds
+    its session and thread, until graphd answers it.
+    """
+
+    def __init__(
+        self,
+        address: str,
+        port: int,
+        user: str,
+        password: str,
+        timeout: Optional[float] = None,
+        cancel: Optional[threading.Event] = None,
+        on_stop=None,
+    ):
+        self.connection = (address, port, user, password)
+        self.timeout = timeout
+        self.cancel = cancel or threading.Event()
+        self.on_stop = on_stop
+        self.stopped: Dict[int, str] = {}
+        self.kill_errors: Dict[int, str] = {}
+
+    @contextmanager
+    def running(self, pooled: _PooledSession, statement: int = None):
+        """Watch the statement executed on pooled in the with block."""
+        finished = threading.Event()
+        deadline = time.monotonic() + self.timeout if self.timeout else math.inf
+
+        def watch() -> None:
+            while not finished.wait(QUERY_POLL_SECONDS):
+                if self.cancel.is_set():
+                    state = "cancelled"
+                elif time.monotonic() > deadline:
+                    state = "timed out"
+                else:
+                    continue
+                pooled.reusable = False
+                self.stopped[statement] = state
+                if self.on_stop is not None:
+                    self.on_stop(statement, state)
+                if pooled.session_id is not None:
+                    try:
+                        killed = kill_queries(
+                            get_session_manager(), pooled.session_id, *self.connection
+                        )
+                    except Exception as e:
+                        self.kill_errors[statement] = str(e) or type(e).__name__
+                        return
+                    # nothing killed is only fine if the statement ended meanwhile
+                    if not killed and not finished.is_set():
+                        self.kill_errors[statement] = (
+                            f"no query of session {pooled.session_id} was killed"
+                        )
+                return
+
+        watcher = threading.Thread(target=watch, name="statement-watch", daemon=True)
+        watcher.start()
+        try:
+            yield
+        finally:
+            finished.set()
+
+
+def _execute_statement(
+    manager: NebulaSessionManager,
+    pooled: _PooledSession,
+    space_name: str,
+    query: str,
+    profile: Profile = None,
+    statement: int = None,
+    watch: StatementWatch = None,
+) -> Tuple[ResultSet, float]:
+    # each statement starts in space_name, as a statement may `USE` another space
+    start = time.perf_counter()
+    with _profiled(profile, "execute", statement) as fields:
+        manager.use_space(pooled, space_name)
+        with watch.running(pooled, statement) if watch else nullcontext():
+            result: ResultSet = pooled.session.execute(query)
+        if result.is_succeeded() and result.space_name():
+            pooled.space = result.space_name()
+        fields["query"] = query
+        if result.is_succeeded():
+            fields["count"] = result.row_size()
+            # graphd's own time, the rest is network and decoding
+            fields["server_seconds"] = result.latency() / 1e6
+        else:
+            fields["error"] = result.error_msg()
+    return result, time.perf_counter() - start
+
+
+def split_statements(query: str) -> List[str]:
+    """The non-empty `;` separated statements of query."""
+    return [q.strip() for q in query.strip().split(";") if q.strip()]
+
+
+def run_statements(
+    queries: List[str],
+    space_name: str,
+    address: str,
+    port: int,
+    user: str = "root",
+    password: str = "nebula",
+    parallel: bool = False,
+    max_workers: int = 4,
+    cache: ResultCache = None,
+    bypass_cache: bool = False,
+    profile: Profile = None,
+    watch: StatementWatch = None,
+    progress=None,
+) -> List[Tuple[Optional[ResultSet], float, bool]]:
+    """Run queries, returning (result, seconds, cached) per statement, in order.
+
+    With parallel, statements are treated as independent and sent
+    concurrently, over up to max_workers pooled sessions.
+
+    With a cache, read statements are answered from it unless bypass_cache,
+    and their results stored in it; cached marks the statements served from
+    the cache. Connection errors are raised.
+
+    With a profile, session checkouts are recorded as connect stages, cache
+    lookups as cache and statements as execute stages.
+
+    With a watch, statements are killed past its timeout or once it is
+    cancelled, and statements not started by then get a None result. Killed
+    statements get graphd's error. progress(index, state, executed) is
+    called as statements start ("running") and end ("done"), from the
+    threads running them.
+    """
+    manager = get_session_manager()
+    keys = [result_cache_key(address, port, user, space_name, q) for q in queries]
+    executed: List[Optional[Tuple[ResultSet, float]]] = [None] * len(queries)
+    if cache is not None and not bypass_cache:
+        for i, query in enumerate(queries):
+            if is_cacheable(query):
+                with _profiled(profile, "cache", i) as fields:
+                    executed[i] = cache.get(keys[i])
+                    fields["hit"] = executed[i] is not None
+    cached = [e is not None for e in executed]
+    pending = [i for i, e in enumerate(executed) if e is None]
+    if progress is not None:
+        for i in range(len(queries)):
+            if cached[i]:
+                progress(i, "done", (*executed[i], True))
+
+    def execute(pooled: _PooledSession, i: int) -> Tuple[ResultSet, float]:
+        if progress is not None:
+            progress(i, "running", None)
+        done = _execute_statement(
+            manager, pooled, space_name, queries[i], profile, i, watch
+        )
+        if progress is not None:
+            progress(i, "done", (*done, False))
+        return done
+
+    def cancelled() -> bool:
+        return watch is not None and watch.cancel.is_set()
+
+    def checkout(stack: ExitStack, statement: int = None) -> _PooledSession:
+        with _profiled(profile, "connect", statement):
+            return stack.enter_context(
+                manager.session(address, port, user, password, space_name)
+            )
+
+    def run_one(i: int) -> Optional[Tuple[ResultSet, float]]:
+        if cancelled():
+            return None
+        with ExitStack() as stack:
+            return execute(checkout(stack, i), i)
+
+    if parallel and len(pending) > 1:
+        workers = max(1, min(max_workers, MAX_PARALLEL_STATEMENTS, len(pending)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # map keeps the statement order
+            for i, done in zip(pending, executor.map(run_one, pending)):
+                executed[i] = done
+    elif pending:
+        with ExitStack() as stack:
+            pooled = checkout(stack)
+            for i in pending:
+                if cancelled():
+                    break
+                executed[i] = execute(pooled, i)
+    if cache is not None:
+        for i in pending:
+            if executed[i] is None or i in (watch.stopped if watch else ()):
+                continue
+            result = executed[i][0]
+            if is_cacheable(queries[i]) and result.is_succeeded():
+                cache.put(keys[i], executed[i], estimate_result_size(result))
+    return [
+        (None, 0.0, False) if done is None else (*done, hit)
+        for done, hit in zip(executed, cached)
+    ]
+
+
+@lru_cache(maxsize=None)
+def get_query_executor() -> ThreadPoolExecutor:
+    """Threads running QueryBatches, shared by all reruns and users."""
+    return ThreadPoolExecutor(MAX_BACKGROUND_BATCHES, thread_name_prefix="query-batch")
+
+
+class QueryBatch:
+    """Statements run by run_statements on a background thread, to be polled.
+
+    states[i] is one of STATEMENT_STATES and executed[i] the (result,
+    seconds, cached) of statement i once it is done, so statements that
+    finished can be shown while others still run, time out or are
+    cancelled. error is the exception that ended the batch, e.g. of a
+    failed connect, and kill_errors the errors of the statements that
+    couldn't be killed, see StatementWatch. Options are passed on to
+    run_statements.
+    """
+
+    def __init__(
+        self,
+        queries: List[str],
+        space_name: str,
+        address: str,
+        port: int,
+        user: str = "root",
+        password: str = "nebula",
+        timeout: Optional[float] = QUERY_TIMEOUT_SECONDS,
+        **options,
+    ):
+        self.queries = queries
+        self.states = ["pending"] * len(queries)
+        self.executed = [None] * len(queries)
+        self.started: List[Optional[float]] = [None] * len(queries)
+        self.error: Optional[Exception] = None
+        self.watch = StatementWatch(
+            address, port, user, password, timeout, on_stop=self._stop
+        )
+        self._args = (queries, space_name, address, port, user, password)
+        self._options = options
+        self._lock = threading.Lock()
+
+    def start(self) -> "QueryBatch":
+        get_query_executor().submit(self._run)
+        return self
+
+    def _run(self) -> None:
+        try:
+            run_statements(
+                *self._args, watch=self.watch, progress=self._progress, **self._options
+            )
+        except Exception as e:
+            self.error = e
+        finally:
+            with self._lock:
+                self.states = [
+                    "cancelled" if state in ("pending", "running") else state
+                    for state in self.states
+                ]
+
+    def _progress(self, index: int, state: str, executed) -> None:
+        with self._lock:
+            if self.states[index] in ("timed out", "cancelled"):
+                return
+            self.states[index] = state
+            if state == "running":
+                self.started[index] = time.monotonic()
+            else:
+                self.executed[index] = executed
+
+    def _stop(self, index: int, state: str) -> None:
+        with self._lock:
+            if self.states[index] == "running":
+                self.states[index] = state
+
+    def cancel(self) -> None:
+        """Kill the running statements and skip the pending ones."""
+        self.watch.cancel.set()
+        with self._lock:
+            self.states = [
+                "cancelled" if state == "pending" else state for state in self.states
+            ]
+
+    @property
+    def done(self) -> bool:
+        """True once every statement is done, timed out or cancelled.
+
+        Killed statements count as ended as soon as the kill is sent.
+        """
+        with self._lock:
+            return all(state not in ("pending", "running") for state in self.states)
+
+    @property
+    def kill_errors(self) -> Dict[int, str]:
+        return dict(self.watch.kill_errors)
+
+    def elapsed(self, index: int) -> Optional[float]:
+        """Seconds statement index has been running, None if not started."""
+        started = self.started[index]
+        return None if started is None else time.monotonic() - started
+
+
+# paged fetch
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_MAX_VERTICES = 5000
+DEFAULT_MAX_EDGES = 10000
+_TRAILING_SKIP_LIMIT = re.compile(r"\b(SKIP|LIMIT)\s+\d+\s*$", re.IGNORECASE)
+
+
+def page_statement(query: str, skip: int, limit: int) -> Optional[str]:
+    """query limited to its rows [skip, skip + limit), None if it can't be paged.
+
+    GO statements are piped into `LIMIT skip, limit`, MATCH statements get
+    `SKIP skip LIMIT limit` appended, unless they end with a SKIP or LIMIT
+    of their own. Without an ORDER BY, pages follow the server's scan order.
+    """
+    statement = query.strip()
+    head = statement.split(None, 1)[0].upper() if statement else ""
+    if head == "GO":
+        return f"{statement} | LIMIT {skip}, {limit}"
+    if head in ("MATCH", "OPTIONAL") and not _TRAILING_SKIP_LIMIT.search(statement):
+        return f"{statement} SKIP {skip} LIMIT {limit}"
+    return None
+
+
+class PagedQuery:
+    """A statement of a batch, fetched one page at a time.
+
+    Pages are merged into result, so tables and exports still see one
+    ResultSet per statement. Statements that can't be paged are fetched
+    whole, as a single page. A failing first page is the result, the error
+    of a later one goes to error, e.g. of a page killed at the timeout, and
+    the pages fetched before it stay in result.
+    """
+
+    def __init__(self, index: int, query: str):
+        self.index = index
+        self.query = query
+        self.skip = 0
+        self.pages = 0
+        self.seconds = 0.0
+        self.done = False
+        self.result: Optional[ResultSet] = None
+        self.error: Optional[str] = None
+
+    def fetch(
+        self,
+        manager: NebulaSessionManager,
+        pooled: _PooledSession,
+        space_name: str,
+        page_size: int,
+        profile: Profile = None,
+        watch: StatementWatch = None,
+    ) -> ResultSet:
+        """Fetch the next page, a failing page ends the statement with its error."""
+        statement = page_statement(self.query, self.skip, page_size)
+        page, seconds = _execute_statement(
+            manager,
+            pooled,
+            space_name,
+            statement or self.query,
+            profile,
+            self.index,
+            watch,
+        )
+        self.pages += 1
+        self.seconds += seconds
+        if not page.is_succeeded():
+            self.done = True
+            if self.result is None:
+                self.result = page
+            else:
+                self.error = page.error_msg()
+            return page
+        rows = page.row_size()
+        self.skip += rows
+        self.done = statement is None or rows < page_size
+        if self.result is None:
+            self.result = page
+        else:
+            # rows() is the row list of the first page's DataSet
+            self.result.rows().extend(page.rows())
+        return page
+
+
+def fetch_pages(
+    paged_queries: List[PagedQuery],
+    model: GraphModel,
+    space_name: str,
+    address: str,
+    port: int,
+    user: str,
+    password: str,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    max_vertices: int = DEFAULT_MAX_VERTICES,
+    max_edges: int = DEFAULT_MAX_EDGES,
+    profile: Profile = None,
+    watch: StatementWatch = None,
+) -> Iterator[PagedQuery]:
+    """Fetch the pending pages of paged_queries in statement order.
+
+    Every page is added to model as soon as it arrives, then its statement
+    is yielded, for progressive rendering. No further page is fetched once
+    model holds max_vertices vertices or max_edges edges; calling again
+    with higher caps fetches more. With a watch, pages past its timeout are
+    killed and end their statement with graphd's error.
+    """
+    manager = get_session_manager()
+    with ExitStack() as stack:
+        with _profiled(profile, "connect"):
+            pooled = stack.enter_context(
+                manager.session(address, port, user, password, space_name)
+            )
+        for paged in paged_queries:
+            while not paged.done:
+                if model.num_nodes >= max_vertices or model.num_edges >= max_edges:
+                    return
+                page = paged.fetch(
+                    manager, pooled, space_name, page_size, profile, watch
+                )
+                if page.is_succeeded():
+                    with _profiled(profile, "graph", paged.index) as fields:
+                        model.select_query(paged.index)
+                        render_result(model, page)
+                        fields["count"] = page.row_size()
+                yield paged
+
+
+# expand vertices: one GET SUBGRAPH from picked vertices, merged into the graph
+EXPAND_STEPS = 1
+MAX_EXPAND_VERTICES = 100
+
+
+def string_literal(value: str) -> str:
+    """nGQL string literal of value."""
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+    return '"' + escaped.replace("\n", "\\n").replace("\r", "\\r") + '"'
+
+
+def vid_literal(vid: str, int_vids: bool) -> str:
+    """nGQL literal of a vertex id as GraphModel keeps it, a str."""
+    if int_vids:
+        return str(int(vid))
+    return string_literal(vid)
+
+
+def expand_statement(vids: List[str], int_vids: bool, steps: int = EXPAND_STEPS) -> str:
+    return (
+        f"GET SUBGRAPH WITH PROP {steps} STEPS FROM"
+        f" {', '.join(vid_literal(vid, int_vids) for vid in vids)}"
+        " YIELD VERTICES AS nodes, EDGES AS relationships"
+    )
+
+
+def expand_graph(
+    model: GraphModel,
+    vids: List[str],
+    space_name: str,
+    address: str,
+    port: int,
+    user: str = "root",
+    password: str = "nebula",
+    steps: int = EXPAND_STEPS,
+    profile: Profile = None,
+) -> Optional[Tuple[str, ResultSet, float]]:
+    """Add the vertices and edges up to steps hops from vids to model.
+
+    Only vids not expanded before are queried, at most MAX_EXPAND_VERTICES,
+    with one GET SUBGRAPH; nothing else is fetched again. The new elements
+    are appended to model, from its former num_nodes and num_edges on, see
+    extend_network. Returns the statement, its result and seconds, or None
+    if there was nothing to expand. A failed statement leaves model as is.
+    """
+    vids = [vid for vid in dict.fromkeys(vids) if vid not in model.expanded]
+    vids = vids[:MAX_EXPAND_VERTICES]
+    if not vids:
+        return None
+    manager = get_session_manager()
+    with manager.session(address, port, user, password, space_name) as pooled:
+        if model.int_vids is None:
+            described, _ = _execute_statement(
+                manager, pooled, space_name, f"DESCRIBE SPACE `{space_name}`", profile
+            )
+            if not described.is_succeeded():
+                return "DESCRIBE SPACE", described, 0.0
+            vid_type = described.column_values("Vid Type")[0].cast()
+            model.int_vids = vid_type.upper().startswith("INT")
+        statement = expand_statement(vids, model.int_vids, steps)
+        result, seconds = _execute_statement(
+            manager, pooled, space_name, statement, profile
+        )
+    if result.is_succeeded():
+        with _profiled(profile, "graph") as fields:
+            create_graph(result, model)
+            fields["count"] = result.row_size()
+        model.expanded.update(vids)
+    return statement, result, seconds
+
+
+# bulk export: every vertex and edge of a space, scanned partition by partition
+# on storaged instead of queried through graphd
+SCAN_BATCH_ROWS = 4096
+SCAN_WORKERS = 8
+# scanned batches waiting to be written, what bounds the memory of a scan
+SCAN_QUEUE_BATCHES = 8
+SCAN_KINDS = ("vertex", "edge")
+
+
+class StorageScanSource:
+    """Partition scans of storaged, with nebula3's GraphStorageClient.
+
+    meta_addrs are the (host, port) of metad, which knows the partitions
+    and their storaged leaders; storaged must be reachable here at the
+    addresses metad has for them. Imported on first use, as the storage
+    client pulls in its own thrift services.
+
+    A scan source has parts(space) and scan(space, kind, name, part,
+    batch_rows), yielding nebula3 DataSets of columns `<name>._vid` and
+    `<name>.<prop>` for vertices, `<name>._src`, `<name>._type`,
+    `<name>._rank`, `<name>._dst` and `<name>.<prop>` for edges.
+    """
+
+    def __init__(
+        self,
+        meta_addrs: List[Tuple[str, int]],
+        user: str = "root",
+        password: str = "nebula",
+        timeout_ms: int = 60000,
+    ):
+        from nebula3.mclient import MetaCache
+        from nebula3.sclient.GraphStorageClient import GraphStorageClient
+
+        self._meta = MetaCache(meta_addrs, timeout_ms)
+        self._client = GraphStorageClient(self._meta, time_out=timeout_ms)
+        self._client.set_user_passwd(user, password)
+
+    def parts(self, space: str) -> List[int]:
+        return sorted(self._meta.get_part_leaders(space))
+
+    def scan(
+        self, space: str, kind: str, name: str, part: int, batch_rows: int
+    ) -> Iterator:
+        if kind == "vertex":
+            scanned = self._client.scan_vertex_with_part(
+                space, part, name, limit=batch_rows
+            )
+        else:
+            scanned = self._client.scan_edge_with_part(
+                space, part, name, limit=batch_rows
+            )
+        while scanned.has_next():
+            batch = scanned.next()
+            if batch is not None:
+                yield batch.get_data_set()
+
+    def close(self) -> None:
+        self._client.close()
+        self._meta.close()
+
+
+def space_schema(
+    space_name: str,
+    address: str,
+    port: int,
+    user: str = "root",
+    password: str = "nebula",
+) -> Tuple[List[str], List[str]]:
+    """The tags and edge types of space_name, asked to graphd."""
+    executed = run_statements(
+        ["SHOW TAGS", "SHOW EDGES"], space_name, address, port, user, password
+    )
+    names = []
+    for result, _, _ in executed:
+        if not result.is_succeeded():
+            raise RuntimeError(result.error_msg())
+        names.append([value.cast() for value in result.column_values("Name")])
+    return names[0], names[1]
+
+
+def scan_space(
+    source,
+    space: str,
+    tags: List[str],
+    edge_types: List[str],
+    workers: int = SCAN_WORKERS,
+    batch_rows: int = SCAN_BATCH_ROWS,
+    queue_batches: int = SCAN_QUEUE_BATCHES,
+) -> Iterator[Tuple[str, str, int, Optional[DataSet]]]:
+    """Scan every partition of space for tags and edge_types, in parallel.
+
+    Yields (kind, name, part, data_set) per scanned batch, in the calling
+    thread, and (kind, name, part, None) once a partition of a tag or edge
+    type is done. Workers block while queue_batches batches wait to be
+    consumed, so a slow consumer bounds the memory of the scan rather than
+    the size of the space. Closing the iterator stops the scan.
+    """
+    parts = source.parts(space)
+    jobs = [("vertex", tag, part) for tag in tags for part in parts] + [
+        ("edge", edge_type, part) for edge_type in edge_types for part in parts
+    ]
+    batches = queue.Queue(maxsize=queue_batches)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=QUERY_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def scan_job(job: Tuple[str, str, int]) -> None:
+        try:
+            for data_set in source.scan(space, *job, batch_rows):
+                if not put((job, data_set)):
+                    return
+        except Exception as e:
+            put((job, e))
+        else:
+            put((job, None))
+
+    executor = ThreadPoolExecutor(
+        max(1, min(workers, len(jobs))), thread_name_prefix="scan"
+    )
+    try:
+        for job in jobs:
+            executor.submit(scan_job, job)
+        done = 0
+        while done < len(jobs):
+            job, item = batches.get()
+            if isinstance(item, Exception):
+                raise item
+            yield (*job, item)
+            done += item is None
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _scan_value(value: Value) -> Optional[str]:
+    # NULL as None, an empty CSV field, rather than "None"
+    if value.getType() in (Value.__EMPTY__, Value.NVAL):
+        return None
+    return value_to_str(value)
+
+
+class BulkExport:
+    """Writes scanned batches of scan_space, one CSV file per tag and per
+    edge type, and/or into a GraphModel for the GEXF export.
+
+    CSV files are streamed: vertex files have the columns _vid and the
+    properties of their tag, edge files _src, _dst, _rank and the
+    properties of their edge type. A model grows with the space; vertices
+    scanned for several tags get all of them, see GraphModel.add_tag.
+    rows counts the rows of every (kind, name, part) scanned so far and
+    done the ones finished.
+    """
+
+    def __init__(self, directory: str = None, model: GraphModel = None):
+        self.directory = directory
+        self.model = model
+        self.rows: Dict[Tuple[str, str, int], int] = {}
+        self.done: Set[Tuple[str, str, int]] = set()
+        self._files: Dict[Tuple[str, str], Tuple[object, csv.writer]] = {}
+
+    @property
+    def num_rows(self) -> int:
+        return sum(self.rows.values())
+
+    def csv_path(self, kind: str, name: str) -> str:
+        prefix = "vertices" if kind == "vertex" else "edges"
+        return os.path.join(self.directory, f"{prefix}_{name}.csv")
+
+    def add(self, kind: str, name: str, part: int, data_set: Optional[DataSet]):
+        """Write a batch of scan_space, None marks the partition as done."""
+        key = (kind, name, part)
+        self.rows.setdefault(key, 0)
+        if data_set is None:
+            self.done.add(key)
+            return
+        self.rows[key] += len(data_set.rows)
+        # column names are <name>.<column>
+        columns = [
+            c.decode(DECODE_TYPE).split(".", 1)[1] for c in data_set.column_names
+        ]
+        if self.directory is not None:
+            self._write_csv(kind, name, columns, data_set)
+        if self.model is not None:
+            self._add_to_model(kind, name, columns, data_set)
+
+    def _write_csv(self, kind: str, name: str, columns: List[str], data_set):
+        opened = self._files.get((kind, name))
+        if kind == "vertex":
+            header = columns
+            picked = range(len(columns))
+        else:
+            # the type column is the edge type's id
+            order = [columns.index(c) for c in ("_src", "_dst", "_rank")]
+            picked = order + [i for i in range(4, len(columns))]
+            header = [columns[i] for i in picked]
+        if opened is None:
+            out = open(self.csv_path(kind, name), "w", newline="", encoding="utf-8")
+            writer = csv.writer(out, lineterminator="\n")
+            writer.writerow(header)
+            opened = self._files[(kind, name)] = (out, writer)
+        writer = opened[1]
+        for row in data_set.rows:
+            values = row.values
+            writer.writerow([_scan_value(values[i]) for i in picked])
+
+    def _add_to_model(self, kind: str, name: str, columns: List[str], data_set):
+        model = self.model
+        if kind == "vertex":
+            for row in data_set.rows:
+                values = row.values
+                props = {
+                    columns[i]: value_to_str(values[i]) for i in range(1, len(values))
+                }
+                model.add_tag(value_to_str(values[0]), name, props)
+            return
+        src, dst, rank = (columns.index(c) for c in ("_src", "_dst", "_rank"))
+        for row in data_set.rows:
+            values = row.values
+            src_id = value_to_str(values[src])
+            dst_id = value_to_str(values[dst])
+            ranking = values[rank].get_iVal()
+            if model.seen_edge(src_id, dst_id, name, ranking):
+                continue
+            props = {columns[i]: value_to_str(values[i]) for i in range(4, len(values))}
+            model.add_edge(src_id, dst_id, name, ranking, props)
+
+    def close(self) -> None:
+        for out, _ in self._files.values():
+            out.close()
+        self._files.clear()
+
+
+def bulk_export(
+    source,
+    space: str,
+    tags: List[str],
+    edge_types: List[str],
+    directory: str = None,
+    model: GraphModel = None,
+    workers: int = SCAN_WORKERS,
+    batch_rows: int = SCAN_BATCH_ROWS,
+    profile: Profile = None,
+) -> Iterator[BulkExport]:
+    """Scan space with scan_space into a BulkExport, yielded after every
+    batch and partition done, for progress displays."""
+    export = BulkExport(directory, model)
+    try:
+        with _profiled(profile, "scan") as fields, closing(
+            scan_space(source, space, tags, edge_types, workers, batch_rows)
+        ) as scanned:
+            for batch in scanned:
+                export.add(*batch)
+                yield export
+            fields["count"] = export.num_rows
+    finally:
+        export.close()
+
+
+# bulk import: GEXF and CSV graphs, e.g. enriched in Gephi-Lite, written back
+# with multi-row INSERT statements over several pooled sessions
+IMPORT_BATCH_ROWS = 256
+IMPORT_WORKERS = 4
+IMPORT_RETRIES = 3
+# before the first retry of a batch, doubled for every further one
+IMPORT_RETRY_SECONDS = 0.5
+# errors kept for the report, the rows of all failed batches are counted
+IMPORT_MAX_ERRORS = 20
+# viz elements of GEXF vertices imported as properties, if their tag has them
+GEXF_VIZ_PROPS = ("x", "y", "size")
+_CSV_GRAPH_FILE = re.compile(r"^(vertices|edges)_(.+)\.csv$")
+_TEMPORAL_TEXT = re.compile(r"^utc (?:date)?time: ([^,]*)")
+
+
+def prop_literal(value: Optional[str], prop_type: str) -> str:
+    """nGQL literal of a property of prop_type, as DESCRIBE TAG shows it,
+    from its str as exported: by value_to_str, in a CSV file or in a GEXF
+    attribute. None is NULL. Raises ValueError for values not of the type."""
+    if value is None:
+        return "NULL"
+    prop_type = prop_type.lower()
+    if prop_type.startswith("int"):
+        try:
+            return str(int(value))
+        except ValueError:
+            pass
+        try:
+            number = float(value)
+        except ValueError:
+            number = math.nan
+        if not number.is_integer():
+            raise ValueError(f"{value!r} is not an integer")
+        return str(int(number))
+    if prop_type in ("float", "double"):
+        number = float(value)
+        if not math.isfinite(number):
+            raise ValueError(f"{value!r} can't be written as {prop_type}")
+        return repr(number)
+    if prop_type == "bool":
+        lowered = value.strip().lower()
+        if lowered in ("true", "1"):
+            return "true"
+        if lowered in ("false", "0"):
+            return "false"
+        raise ValueError(f"{value!r} is not a bool")
+    if prop_type.startswith(("string", "fixed_string")):
+        return string_literal(value)
+    if prop_type in ("date", "time", "datetime"):
+        # "utc datetime: 2023-01-01T10:00:00.000000, timezone_offset: 0"
+        matched = _TEMPORAL_TEXT.match(value)
+        text = matched.group(1) if matched else value
+        return f"{prop_type}({string_literal(text.strip())})"
+    if prop_type == "timestamp":
+        if value.strip().isdigit():
+            return value.strip()
+        return f"timestamp({string_literal(value)})"
+    if prop_type.startswith("geography"):
+        return f"ST_GeogFromText({string_literal(value)})"
+    raise ValueError(f"{prop_type} properties can't be imported")
+
+
+def read_csv_graph(file, kind: str, name: str) -> Iterator[Tuple]:
+    """Records of a CSV file of BulkExport, from the binary file file.
+
+    Vertex files have a _vid column, edge files _src, _dst and optionally
+    _rank; the other columns are properties, empty fields NULL. Records are
+    ("vertex", tag, (vid,), props) and ("edge", edge_type, (src, dst,
+    rank), props), as graph_records yields them, the rank a str or None,
+    checked by BulkImport.add as the other values are.
+    """
+    text = io.TextIOWrapper(file, encoding="utf-8", newline="")
+    try:
+        yield from _csv_records(csv.reader(text), kind, name)
+    finally:
+        # file is the caller's to close, e.g. an upload read again on rerun
+        text.detach()
+
+
+def _csv_records(reader, kind: str, name: str) -> Iterator[Tuple]:
+    header = next(reader, None)
+    if header is None:
+        return
+    keys = ("_vid",) if kind == "vertex" else ("_src", "_dst")
+    missing = [key for key in keys if key not in header]
+    if missing:
+        raise ValueError(f"{kind} file of {name} has no {', '.join(missing)} column")
+    picked = [header.index(key) for key in keys]
+    rank = header.index("_rank") if "_rank" in header else None
+    props = [
+        (i, column)
+        for i, column in enumerate(header)
+        if column not in ("_vid", "_src", "_dst", "_rank")
+    ]
+    for row in reader:
+        if not row:
+            continue
+        key = tuple(row[i] for i in picked)
+        if kind == "edge":
+            key += (row[rank] if rank is not None else None,)
+        yield kind, name, key, {column: row[i] or None for i, column in props}
+
+
+def read_gexf_graph(
+    file, tags: List[str], edge_types: List[str] = ()
+) -> Iterator[Tuple]:
+    """Records of a GEXF document, parsed as a stream from the binary file
+    file, each vertex or edge dropped once read.
+
+    GEXF has no tags: every vertex is written to each of tags, with its
+    attributes and viz position and size (GEXF_VIZ_PROPS) as properties.
+    Edges are written if their edge_type attribute, which dump_gexf adds,
+    is one of edge_types; edges without it go to the only edge type of
+    edge_types. Their rank is the rank attribute, None without it.
+    """
+    from xml.etree import ElementTree
+
+    def local(element) -> str:
+        return element.tag.rpartition("}")[2]
+
+    titles: Dict[str, Dict[str, str]] = {"node": {}, "edge": {}}
+    attr_class = "node"
+    parent = None
+    for event, element in ElementTree.iterparse(file, events=("start", "end")):
+        name = local(element)
+        if event == "start":
+            if name == "attributes":
+                attr_class = element.get("class", "node")
+            elif name in ("nodes", "edges"):
+                parent = element
+            continue
+        if name == "attribute":
+            titles[attr_class][element.get("id")] = element.get("title")
+            continue
+        if name not in ("node", "edge"):
+            continue
+        declared = titles[name]
+        props = {}
+        for child in element.iter():
+            child_name = local(child)
+            if child_name == "attvalue":
+                attr_id = child.get("for", child.get("id"))
+                props[declared.get(attr_id, attr_id)] = child.get("value")
+            elif name == "node" and child_name == "position":
+                props.setdefault("x", child.get("x"))
+                props.setdefault("y", child.get("y"))
+            elif name == "node" and child_name == "size":
+                props.setdefault("size", child.get("value"))
+        if name == "node":
+            for tag in tags:
+                yield "vertex", tag, (element.get("id"),), props
+        else:
+            edge_type = props.pop("edge_type", None)
+            if edge_type is None and len(edge_types) == 1:
+                edge_type = edge_types[0]
+            if edge_type in edge_types:
+                if element.get("weight") is not None:
+                    props.setdefault("weight", element.get("weight"))
+                rank = props.pop("rank", None)
+                key = (element.get("source"), element.get("target"), rank)
+                yield "edge", edge_type, key, props
+        # drop the vertices and edges read so far
+        if parent is not None:
+            parent.clear()
+
+
+def csv_graph_file(file_name: str) -> Optional[Tuple[str, str]]:
+    """(kind, name) of a CSV file of BulkExport, from its file name."""
+    matched = _CSV_GRAPH_FILE.match(os.path.basename(file_name))
+    if matched is None:
+        return None
+    return ("vertex" if matched.group(1) == "vertices" else "edge", matched.group(2))
+
+
+def graph_records(
+    file_name: str, file, tags: List[str] = (), edge_types: List[str] = ()
+) -> Iterator[Tuple]:
+    """Records of the binary file file, by the extension of file_name: a
+    GEXF document, see read_gexf_graph, a CSV file of BulkExport named
+    vertices_<tag>.csv or edges_<edge type>.csv, or a zip of such files as
+    the app exports spaces."""
+    lowered = file_name.lower()
+    if lowered.endswith(".gexf"):
+        yield from read_gexf_graph(file, tags, edge_types)
+    elif lowered.endswith(".csv"):
+        target = csv_graph_file(file_name)
+        if target is None:
+            raise ValueError(
+                f"{file_name}: CSV files are named vertices_<tag>.csv"
+                " or edges_<edge type>.csv"
+            )
+        yield from read_csv_graph(file, *target)
+    elif lowered.endswith(".zip"):
+        with zipfile.ZipFile(file) as zipped:
+            for member in zipped.namelist():
+                if member.lower().endswith((".gexf", ".csv")):
+                    with zipped.open(member) as opened:
+                        yield from graph_records(member, opened, tags, edge_types)
+    else:
+        raise ValueError(f"{file_name}: import GEXF, CSV or zip files")
+
+
+class BulkImport:
+    """Records of graph_records batched into multi-row INSERT statements,
+    and what bulk_import did with them.
+
+    Properties are written as their tag or edge type declares them, see
+    prop_literal; columns unknown to it are left out and listed in ignored.
+    A statement only sets the properties its rows have, so vertices
+    missing an attribute of a GEXF file keep theirs. rows and failed count
+    the rows written and failed per (kind, name), rows of invalid values
+    fail without being sent.
+    """
+
+    def __init__(self, int_vids: bool, batch_rows: int = IMPORT_BATCH_ROWS):
+        self.int_vids = int_vids
+        self.batch_rows = batch_rows
+        # (kind, name) -> property -> type, None if it doesn't exist
+        self.schemas: Dict[Tuple[str, str], Optional[Dict[str, str]]] = {}
+        self.rows: Dict[Tuple[str, str], int] = {}
+        self.failed: Dict[Tuple[str, str], int] = {}
+        self.ignored: Dict[Tuple[str, str], Set[str]] = {}
+        self.batches = 0
+        self.retries = 0
+        self.errors: List[str] = []
+        self.started = time.monotonic()
+        self.seconds = 0.0
+        # (kind, name, columns) -> literal rows
+        self._pending: Dict[Tuple[str, str, Tuple[str, ...]], List[str]] = {}
+
+    @property
+    def num_rows(self) -> int:
+        return sum(self.rows.values())
+
+    @property
+    def num_failed(self) -> int:
+        return sum(self.failed.values())
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.num_rows / self.seconds if self.seconds else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.num_rows} rows in {self.seconds:.2f}s,"
+            f" {self.rows_per_second:.0f} rows/s, {self.num_failed} failed,"
+            f" {self.batches} batches, {self.retries} retries"
+        )
+
+    def error(self, message: str) -> None:
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append(message)
+
+    def add(self, kind: str, name: str, key: tuple, props: Dict[str, str]):
+        """Batch a record, returns the statements of batches it filled, as
+        (kind, name, statement, rows)."""
+        target = (kind, name)
+        self.rows.setdefault(target, 0)
+        schema = self.schemas.get(target)
+        if schema is None:
+            self.failed[target] = self.failed.get(target, 0) + 1
+            return []
+        unknown = [column for column in props if column not in schema]
+        if unknown:
+            self.ignored.setdefault(target, set()).update(unknown)
+        columns = tuple(column for column in schema if column in props)
+        try:
+            ids = [vid_literal(vid, self.int_vids) for vid in key[:2]]
+            if kind == "edge":
+                # 0 without a rank, Gephi-Lite may write it as 1.0
+                rank = prop_literal(key[2] or "0", "int64")
+            values = ", ".join(prop_literal(props[c], schema[c]) for c in columns)
+        except ValueError as e:
+            self.failed[target] = self.failed.get(target, 0) + 1
+            self.error(f"{kind} {name} {key[0]}: {e}")
+            return []
+        if kind == "vertex":
+            row = f"{ids[0]}:({values})"
+        else:
+            row = f"{ids[0]}->{ids[1]}@{rank}:({values})"
+        pending = self._pending.setdefault((kind, name, columns), [])
+        pending.append(row)
+        if len(pending) < self.batch_rows:
+            return []
+        return [self._statement((kind, name, columns))]
+
+    def flush(self) -> list:
+        """Statements of the batches not full yet."""
+        return [self._statement(batch) for batch in list(self._pending)]
+
+    def _statement(self, batch: Tuple[str, str, Tuple[str, ...]]):
+        kind, name, columns = batch
+        rows = self._pending.pop(batch)
+        quoted = ", ".join(f"`{column}`" for column in columns)
+        statement = (
+            f"INSERT {'VERTEX' if kind == 'vertex' else 'EDGE'} `{name}`({quoted})"
+            f" VALUES {', '.join(rows)}"
+        )
+        return kind, name, statement, len(rows)
+
+    def record(
+        self, kind: str, name: str, rows: int, retries: int, error: Optional[str]
+    ) -> None:
+        """Count a batch bulk_import executed, error if it failed every try."""
+        self.batches += 1
+        self.retries += retries
+        if error is None:
+            self.rows[(kind, name)] += rows
+        else:
+            self.failed[(kind, name)] = self.failed.get((kind, name), 0) + rows
+            self.error(f"{kind} {name}, {rows} rows: {error}")
+        self.seconds = time.monotonic() - self.started
+
+
+def describe_schema(
+    kind: str,
+    name: str,
+    space_name: str,
+    address: str,
+    port: int,
+    user: str = "root",
+    password: str = "nebula",
+) -> Dict[str, str]:
+    """Property -> type of the tag or edge type name, asked to graphd."""
+    statement = f"DESCRIBE {'TAG' if kind == 'vertex' else 'EDGE'} `{name}`"
+    executed = run_statements([statement], space_name, address, port, user, password)
+    result = executed[0][0]
+    if not result.is_succeeded():
+        raise RuntimeError(result.error_msg())
+    return {
+        field.cast(): prop_type.cast()
+        for field, prop_type in zip(
+            result.column_values("Field"), result.column_values("Type")
+        )
+    }
+
+
+def bulk_import(
+    records: Iterator[Tuple],
+    space_name: str,
+    address: str,
+    port: int,
+    user: str = "root",
+    password: str = "nebula",
+    batch_rows: int = IMPORT_BATCH_ROWS,
+    workers: int = IMPORT_WORKERS,
+    retries: int = IMPORT_RETRIES,
+    profile: Profile = None,
+) -> Iterator[BulkImport]:
+    """Write records of graph_records to space_name, yielding a BulkImport
+    after every batch executed, for progress displays.
+
+    Batches of batch_rows rows are sent by up to workers threads, each over
+    its own pooled session, while the records are read; a batch that fails
+    is retried up to retries times, then counted as failed. Tags and edge
+    types are described the first time a record has them; records of ones
+    the space doesn't have fail. At most twice workers batches are built
+    ahead of the inserts, so a file is read as fast as it is written.
+    """
+    manager = get_session_manager()
+    workers = max(1, min(workers, MAX_PARALLEL_STATEMENTS))
+    executed = run_statements(
+        [f"DESCRIBE SPACE `{space_name}`"], space_name, address, port, user, password
+    )
+    result = executed[0][0]
+    if not result.is_succeeded():
+        raise RuntimeError(result.error_msg())
+    vid_type = result.column_values("Vid Type")[0].cast()
+    progress = BulkImport(vid_type.upper().startswith("INT"), batch_rows)
+
+    def insert(kind: str, name: str, statement: str, rows: int):
+        error = None
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(IMPORT_RETRY_SECONDS * 2 ** (attempt - 1))
+            try:
+                with _profiled(profile, "insert") as fields, manager.session(
+                    address, port, user, password, space_name
+                ) as pooled:
+                    inserted: ResultSet = pooled.session.execute(statement)
+                    fields.update(count=rows, name=name, attempt=attempt)
+            except Exception as e:
+                # e.g. a lost connection, the session was released
+                error = str(e)
+                continue
+            if inserted.is_succeeded():
+                return kind, name, rows, attempt, None
+            error = inserted.error_msg()
+        return kind, name, rows, retries, error
+
+    in_flight = set()
+
+    def collect(limit: int) -> Iterator[BulkImport]:
+        while len(in_flight) > limit:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            in_flight.difference_update(done)
+            for future in done:
+                progress.record(*future.result())
+            yield progress
+
+    executor = ThreadPoolExecutor(workers, thread_name_prefix="import")
+    try:
+        with _profiled(profile, "import") as fields:
+            for record in records:
+                target = record[:2]
+                if target not in progress.schemas:
+                    try:
+                        progress.schemas[target] = describe_schema(
+                            *target, space_name, address, port, user, password
+                        )
+                    except RuntimeError as e:
+                        progress.schemas[target] = None
+                        progress.error(f"{target[0]} {target[1]}: {e}")
+                for batch in progress.add(*record):
+                    yield from collect(2 * workers - 1)
+                    in_flight.add(executor.submit(insert, *batch))
+            for batch in progress.flush():
+                yield from collect(2 * workers - 1)
+                in_flight.add(executor.submit(insert, *batch))
+            yield from collect(0)
+            progress.seconds = time.monotonic() - progress.started
+            fields["count"] = progress.num_rows
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    yield progress
+
+
+# end for nebulagraph
+
+
+def build_graphs(
+    graph_results: List[ResultSet],
+    cache: ResultCache = None,
+    cache_key: Tuple = None,
+    layout_above: int = None,
+    profile: Profile = None,
+    analytics: bool = False,
+) -> GraphModel:
+    """Graph of the successful results of a batch.
+
+    With analytics, the ANALYTICS metrics are computed and exported too.
+    Graphs of more than layout_above vertices get a precomputed layout.
+    With a cache, they are reused while the batch is answered by the very
+    same cached ResultSets, so a cache hit skips create_graph as well.
+    With a profile, every result is recorded as a graph stage, then the
+    layout stage. Exports, the GEXF one included, are left to be built when
+    requested.
+    """
+    if cache is not None:
+        cached = cache.get(cache_key)
+        if cached is not None and len(cached[0]) == len(graph_results):
+            if all(a is b for a, b in zip(cached[0], graph_results)):
+                return cached[1]
+
+    model = GraphModel()
+    for index, result in enumerate(graph_results):
+        with _profiled(profile, "graph", index) as fields:
+            create_graph(result, model)
+            fields["count"] = result.row_size()
+    if analytics:
+        analyze(model, profile=profile)
+    if layout_above is not None and model.num_nodes > layout_above:
+        with _profiled(profile, "layout") as fields:
+            layout_model(model)
+            fields["count"] = model.num_nodes
+
+    if cache is not None:
+        size = (model.num_nodes + model.num_edges) * GRAPH_ELEMENT_BYTES
+        cache.put(cache_key, (list(graph_results), model), size)
+    return model
+
+
+# gexf export
+# exports up to this size are kept in memory, larger ones spill to a temp file
+GEXF_SPOOL_MAX_SIZE = 16 * 1024 * 1024
+# elements serialized per write
+GEXF_CHUNK_ELEMENTS = 4096
+_XML_ATTR_ENTITIES = {'"': "&quot;", "\n": "&#10;", "\r": "&#13;", "\t": "&#09;"}
+
+
+def _gexf_quote(value) -> str:
+    return escape(str(value), _XML_ATTR_ENTITIES)
+
+
+def _gexf_attvalues(declared: Dict[str, str], attrs: Dict[str, str]) -> str:
+    if not attrs:
+        return ""
+    lines = ["        <attvalues>\n"]
+    for title, value in attrs.items():
+        lines.append(
+            f'          <attvalue for="{declared[title]}" '
+            f'value="{_gexf_quote(value)}" />\n'
+        )
+    lines.append("        </attvalues>\n")
+    return "".join(lines)
+
+
+def write_gexf(model: GraphModel, max_size: int = GEXF_SPOOL_MAX_SIZE):
+    """GEXF document of model in a spooled temporary file positioned at 0."""
+    out = tempfile.SpooledTemporaryFile(max_size=max_size)
+    dump_gexf(model, out)
+    out.seek(0)
+    return out
+
+
+def dump_gexf(model: GraphModel, out) -> None:
+    """Write the GEXF 1.2 document of model to the binary file out, in the
+    layout networkx.write_gexf uses.
+
+    Elements are written in chunks, so the document is never held whole in
+    memory. The attribute declarations GEXF needs ahead of
+    the nodes come from the columns of the property tables. A layout of all
+    vertices goes into their viz:position, the computed_metrics of model
+    into typed attributes. Edges get their edge type and rank as
+    attributes, so bulk_import can write them back. A property named as
+    one of these added attributes is left out, with a warning.
+    """
+    metrics = {
+        name: values.tolist() for name, values in computed_metrics(model).items()
+    }
+    metric_types = {
+        name: "integer" if name == "community" else "double" for name in metrics
+    }
+    added = {"node": set(metrics), "edge": set()}
+    if any(len(tags) > 1 for tags in model.node_table_tags):
+        added["node"].add("type")
+    if model.num_edges:
+        added["edge"].update(("edge_type", "rank"))
+    # properties left out, per class
+    shadowed: Dict[str, Set[str]] = {"node": set(), "edge": set()}
+
+    def property_titles(attr_class: str, tables: List[PropertyTable]) -> List[str]:
+        titles = []
+        for table in tables:
+            for title in table.columns:
+                if title in added[attr_class]:
+                    shadowed[attr_class].add(title)
+                else:
+                    titles.append(title)
+        return titles
+
+    # attribute title -> id, per class, ids are unique across classes
+    attributes: Dict[str, Dict[str, str]] = {"node": {}, "edge": {}}
+    node_titles = []
+    for tags, table in zip(model.node_table_tags, model.node_tables):
+        node_titles.extend(["type"] if len(tags) > 1 else [])
+        node_titles.extend(property_titles("node", [table]))
+    node_titles.extend(metrics)
+    edge_titles = property_titles("edge", model.edge_tables)
+    if model.num_edges:
+        edge_titles.extend(("edge_type", "rank"))
+    for attr_class, titles in shadowed.items():
+        for title in sorted(titles):
+            logger.warning(
+                "%s property %r left out of the GEXF export, an attribute of"
+                " the export has its name",
+                attr_class,
+                title,
+            )
+    for attr_class, titles in (("node", node_titles), ("edge", edge_titles)):
+        declared = attributes[attr_class]
+        for title in titles:
+            if title not in declared:
+                declared[title] = str(len(attributes["node"]) + len(attributes["edge"]))
+
+    header = [
+        "<?xml version='1.0' encoding='utf-8'?>\n",
+        '<gexf xmlns="http://www.gexf.net/1.2draft" '
+        'xmlns:viz="http://www.gexf.net/1.2draft/viz" '
+        'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+        'xsi:schemaLocation="http://www.gexf.net/1.2draft '
+        'http://www.gexf.net/1.2draft/gexf.xsd" version="1.2">\n',
+        f'  <meta lastmodifieddate="{time.strftime("%Y-%m-%d")}">\n',
+        "    <creator>NebulaGraph Gephi Exchange</creator>\n",
+        "  </meta>\n",
+        '  <graph defaultedgetype="directed" mode="static" name="">\n',
+    ]
+    for attr_class in ("edge", "node"):
+        declared = attributes[attr_class]
+        if not declared:
+            continue
+        header.append(f'    <attributes mode="static" class="{attr_class}">\n')
+        for title, attr_id in declared.items():
+            attr_type = "string"
+            if attr_class == "node":
+                attr_type = metric_types.get(title, "string")
+            header.append(
+                f'      <attribute id="{attr_id}" '
+                f'title="{_gexf_quote(title)}" type="{attr_type}" />\n'
+            )
+        header.append("    </attributes>\n")
+    header.append("    <nodes>\n")
+    out.write("".join(header).encode("utf-8"))
+
+    def flush(chunk: List[str]) -> None:
+        out.write("".join(chunk).encode("utf-8"))
+        chunk.clear()
+
+    chunk: List[str] = []
+    declared = attributes["node"]
+    positions = node_positions(model)
+    xy = positions.tolist() if positions is not None else None
+    for index, node_id in enumerate(model.node_ids):
+        quoted = _gexf_quote(node_id)
+        attrs = model.node_attrs(index, shadowed["node"])
+        for name, values in metrics.items():
+            attrs[name] = values[index]
+        attvalues = _gexf_attvalues(declared, attrs)
+        if xy:
+            # gephi's y axis points up
+            attvalues += (
+                f'        <viz:position x="{xy[index][0]:.2f}" '
+                f'y="{-xy[index][1]:.2f}" z="0.0" />\n'
+            )
+        if attvalues:
+            chunk.append(
+                f'      <node id="{quoted}" label="{quoted}">\n'
+                f"{attvalues}      </node>\n"
+            )
+        else:
+            chunk.append(f'      <node id="{quoted}" label="{quoted}" />\n')
+        if len(chunk) >= GEXF_CHUNK_ELEMENTS:
+            flush(chunk)
+    chunk.append("    </nodes>\n    <edges>\n")
+
+    declared = attributes["edge"]
+    node_ids = model.node_ids
+    for edge in range(model.num_edges):
+        attrs = model.edge_props(edge)
+        for title in shadowed["edge"]:
+            attrs.pop(title, None)
+        attrs["edge_type"] = model.edge_types[model.edge_type[edge]]
+        attrs["rank"] = model.edge_rank[edge]
+        head = (
+            f'      <edge source="{_gexf_quote(node_ids[model.edge_src[edge]])}" '
+            f'target="{_gexf_quote(node_ids[model.edge_dst[edge]])}" id="{edge}"'
+        )
+        chunk.append(f"{head}>\n{_gexf_attvalues(declared, attrs)}      </edge>\n")
+        if len(chunk) >= GEXF_CHUNK_ELEMENTS:
+            flush(chunk)
+    chunk.append("    </edges>\n  </graph>\n</gexf>\n")
+    flush(chunk)
+
+
+# typed node and edge tables: the vertices and edges of results as Arrow
+# record batches, properties typed by their nebula3 value type
+ARROW_BATCH_ROWS = 65536
+TABLE_FORMATS = ("parquet", "arrow")
+_NODE_COLUMNS = ("id", "tags")
+_EDGE_COLUMNS = ("src", "dst", "edge_type", "rank")
+
+
+def _keyed_row(keys: Dict[str, object], props: Dict[str, object]) -> Dict[str, object]:
+    """The key columns of a table row then props. A property named as one of
+    them doesn't replace it but is renamed with trailing underscores, e.g. id_,
+    to a name no other property has."""
+    if props.keys().isdisjoint(keys):
+        return {**keys, **props}
+    row = dict(keys)
+    taken = set(keys).union(props)
+    for name, value in props.items():
+        if name in keys:
+            while name in taken:
+                name += "_"
+            taken.add(name)
+        row[name] = value
+    return row
+
+
+def value_to_python(value: Value, timezone_offset: int = 0):
+    """Property value as the Python object Arrow types it by.
+
+    Strings, numbers and booleans as such, dates, times and datetimes as
+    datetime objects in UTC, null as None, others as value_to_str.
+    """
+    value_type = value.getType()
+    if value_type == Value.SVAL:
+        return value.get_sVal().decode(DECODE_TYPE)
+    if value_type == Value.IVAL:
+        return value.get_iVal()
+    if value_type == Value.FVAL:
+        return value.get_fVal()
+    if value_type == Value.BVAL:
+        return value.get_bVal()
+    if value_type in (Value.NVAL, Value.__EMPTY__):
+        return None
+    try:
+        if value_type == Value.DVAL:
+            d = value.get_dVal()
+            return datetime.date(d.year, d.month, d.day)
+        if value_type == Value.TVAL:
+            t = value.get_tVal()
+            return datetime.time(t.hour, t.minute, t.sec, t.microsec)
+        if value_type == Value.DTVAL:
+            dt = value.get_dtVal()
+            return datetime.datetime(
+                dt.year,
+                dt.month,
+                dt.day,
+                dt.hour,
+                dt.minute,
+                dt.sec,
+                dt.microsec,
+                tzinfo=datetime.timezone.utc,
+            )
+    except ValueError:
+        # out of the range of datetime, e.g. year 0
+        pass
+    return value_to_str(value, timezone_offset)
+
+
+def _arrow_array(values: list) -> pa.Array:
+    import pyarrow as pa
+
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+        # a property of mixed types, e.g. of two tags
+        return pa.array([None if v is None else str(v) for v in values], pa.string())
+
+
+def _common_type(types: List[pa.DataType]) -> pa.DataType:
+    """Type of a column whose batches have types, widened to float or str."""
+    import pyarrow as pa
+
+    types = {t for t in types if not pa.types.is_null(t)}
+    if not types:
+        return pa.null()
+    if len(types) == 1:
+        return types.pop()
+    if all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in types):
+        return pa.float64()
+    return pa.string()
+
+
+class ArrowGraphWriter:
+    """Typed node and edge tables of query results, as Arrow record batches.
+
+    A sink for render_result, like GraphModel, that keeps properties as
+    value_to_python converts them. Rows are buffered in PropertyTables and
+    turned into a record batch every batch_rows rows, so results can be
+    added page by page. Columns are those of node_frame and edge_frame, with
+    tags as a list; a property seen with different types across batches is
+    widened to float or str.
+
+    tables() hands the batches out as pyarrow Tables without copying them,
+    e.g. to pandas (Table.to_pandas) or DuckDB, which scans them in place.
+    write() stores them as Parquet or Arrow IPC files.
+    """
+
+    def __init__(self, batch_rows: int = ARROW_BATCH_ROWS):
+        self.batch_rows = batch_rows
+        self._node_ids: Set[str] = set()
+        self._edge_keys: Set[Tuple[str, str, str, int]] = set()
+        self._rows = {"nodes": PropertyTable(), "edges": PropertyTable()}
+        self._batches: Dict[str, List[pa.RecordBatch]] = {"nodes": [], "edges": []}
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self._node_ids)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self._edge_keys)
+
+    def seen_node(self, node_id: str) -> bool:
+        return node_id in self._node_ids
+
+    def add_node(self, node_id: str, tags: List[str], props: Dict[str, object]) -> None:
+        self._node_ids.add(node_id)
+        self._append("nodes", _keyed_row({"id": node_id, "tags": tags}, props))
+
+    def seen_edge(self, src_id: str, dst_id: str, edge_name: str, rank: int) -> bool:
+        key = (src_id, dst_id, edge_name, rank)
+        if key in self._edge_keys:
+            return True
+        self._edge_keys.add(key)
+        return False
+
+    def add_edge(
+        self,
+        src_id: str,
+        dst_id: str,
+        edge_name: str,
+        rank: int,
+        props: Dict[str, object],
+    ) -> None:
+        self._append(
+            "edges",
+            _keyed_row(
+                {"src": src_id, "dst": dst_id, "edge_type": edge_name, "rank": rank},
+                props,
+            ),
+        )
+
+    def _append(self, kind: str, row: Dict[str, object]) -> None:
+        rows = self._rows[kind]
+        rows.append(row)
+        if rows.size >= self.batch_rows:
+            self._flush(kind)
+
+    def _flush(self, kind: str) -> None:
+        import pyarrow as pa
+
+        rows = self._rows[kind]
+        if not rows.size:
+            return
+        self._batches[kind].append(
+            pa.RecordBatch.from_arrays(
+                [_arrow_array(column) for column in rows.columns.values()],
+                names=list(rows.columns),
+            )
+        )
+        self._rows[kind] = PropertyTable()
+
+    def add_result(self, result: ResultSet) -> None:
+        render_result(self, result, value_to_python)
+
+    def table(self, kind: str) -> pa.Table:
+        """The nodes or edges table, its batches brought to one schema."""
+        import pyarrow as pa
+
+        self._flush(kind)
+        batches = self._batches[kind]
+        names = dict.fromkeys(_NODE_COLUMNS if kind == "nodes" else _EDGE_COLUMNS)
+        for batch in batches:
+            names.update(dict.fromkeys(batch.schema.names))
+        schema = pa.schema(
+            [
+                (
+                    name,
+                    _common_type(
+                        [
+                            batch.schema.field(name).type
+                            for batch in batches
+                            if name in batch.schema.names
+                        ]
+                    ),
+                )
+                for name in names
+            ]
+        )
+        unified = []
+        for batch in batches:
+            if batch.schema.equals(schema):
+                unified.append(batch)
+                continue
+            columns = []
+            for field in schema:
+                if field.name not in batch.schema.names:
+                    columns.append(pa.nulls(batch.num_rows, field.type))
+                    continue
+                column = batch.column(field.name)
+                columns.append(
+                    column if column.type == field.type else column.cast(field.type)
+                )
+            unified.append(pa.RecordBatch.from_arrays(columns, schema=schema))
+        # later calls and batches start from the unified ones
+        self._batches[kind] = unified
+        return pa.Table.from_batches(unified, schema)
+
+    def tables(self) -> Tuple[pa.Table, pa.Table]:
+        """The nodes and edges tables, sharing the memory of the batches."""
+        return self.table("nodes"), self.table("edges")
+
+    def write(self, directory: str, fmt: str = "parquet") -> List[str]:
+        """Write nodes.<fmt> and edges.<fmt> to directory, returns their paths."""
+        paths = []
+        for kind in ("nodes", "edges"):
+            path = os.path.join(directory, f"{kind}.{fmt}")
+            with open(path, "wb") as out:
+                write_table(self.table(kind), out, fmt)
+            paths.append(path)
+        return paths
+
+
+def write_table(table: pa.Table, out, fmt: str = "parquet") -> None:
+    """Write table to the binary file out batch by batch, as Parquet row
+    groups or an Arrow IPC file."""
+    import pyarrow as pa
+
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        writer = pq.ParquetWriter(out, table.schema)
+    elif fmt == "arrow":
+        writer = pa.ipc.new_file(out, table.schema)
+    else:
+        raise ValueError(f"unknown table format {fmt!r}, not one of {TABLE_FORMATS}")
+    with writer:
+        for batch in table.to_batches():
+            writer.write_batch(batch)
+
+
+def table_bytes(table: pa.Table, fmt: str = "parquet") -> bytes:
+    import pyarrow as pa
+
+    sink = pa.BufferOutputStream()
+    write_table(table, sink, fmt)
+    return sink.getvalue().to_pybytes()
+
+
+def graph_tables(results: List[ResultSet]) -> Tuple[pa.Table, pa.Table]:
+    """Typed nodes and edges tables of the graph of results."""
+    writer = ArrowGraphWriter()
+    for result in results:
+        writer.add_result(result)
+    return writer.tables()
+
+
+# command line
+def stream_statements(
+    queries: List[str],
+    space_name: str,
+    address: str,
+    port: int,
+    user: str = "root",
+    password: str = "nebula",
+    page_size: int = DEFAULT_PAGE_SIZE,
+    profile: Profile = None,
+    watch: StatementWatch = None,
+) -> Iterator[Tuple[int, ResultSet, float]]:
+    """Run queries one after another, yielding (index, page, seconds).
+
+    Statements page_statement can page are fetched page_size rows at a
+    time, others whole. Pages are not kept, so a consumer that writes them
+    out holds one page at a time. With a watch, pages are killed past its
+    timeout.
+    """
+    manager = get_session_manager()
+    with manager.session(address, port, user, password, space_name) as pooled:
+        for index, query in enumerate(queries):
+            skip = 0
+            while True:
+                statement = page_statement(query, skip, page_size)
+                page, seconds = _execute_statement(
+                    manager,
+                    pooled,
+                    space_name,
+                    statement or query,
+                    profile,
+                    index,
+                    watch,
+                )
+                yield index, page, seconds
+                rows = page.row_size() if page.is_succeeded() else 0
+                if statement is None or rows < page_size:
+                    break
+                skip += rows
+
+
+def write_csv(result: ResultSet, out, header: bool = True) -> None:
+    """Append the rows of result to the text file out, as result_frame casts
+    them; nested values are written as their str."""
+    writer = csv.writer(out, lineterminator="\n")
+    if header:
+        writer.writerow(result.keys())
+    for row in range(result.row_size()):
+        writer.writerow([value.cast() for value in result.row_values(row)])
+
+
+def _csv_path(directory: str, index: int) -> str:
+    return os.path.join(directory, f"nebulagraph_export_{index + 1}.csv")
+
+
+def _open_output(path: str):
+    """Binary file at path, or stdout for -."""
+    if path == "-":
+        return nullcontext(sys.stdout.buffer)
+    return open(path, "wb")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m nebulagraph_gephi",
+        description="Run nGQL statements and export their results.",
+    )
+    parser.add_argument(
+        "queries",
+        nargs="?",
+        help="file of `;` separated nGQL statements, - for stdin",
+    )
+    parser.add_argument("--address", default="graphd", help="graphd host")
+    parser.add_argument("--port", type=int, default=9669, help="graphd port")
+    parser.add_argument("--user", default="root")
+    parser.add_argument(
+        "--password",
+        default=os.environ.get("NEBULA_PASSWORD", "nebula"),
+        help="defaults to $NEBULA_PASSWORD, else nebula",
+    )
+    parser.add_argument("--space", help="graph space the statements start in")
+    parser.add_argument("--gexf", help="GEXF file of the merged graph, - for stdout")
+    parser.add_argument(
+        "--csv", metavar="DIR", help="directory for a CSV file per statement"
+    )
+    parser.add_argument(
+        "--html", help="HTML page of the graph, gzipped if it ends with .gz"
+    )
+    parser.add_argument(
+        "--tables",
+        metavar="DIR",
+        help="directory for typed nodes and edges tables, see ArrowGraphWriter",
+    )
+    parser.add_argument(
+        "--tables-format",
+        choices=TABLE_FORMATS,
+        default="parquet",
+        help="Parquet, or Arrow IPC files",
+    )
+    parser.add_argument(
+        "--html-mode",
+        choices=("full", "compact"),
+        default="compact",
+        help="the pyvis page, or the compact one, see compact_html",
+    )
+    parser.add_argument(
+        "--layout-above",
+        type=int,
+        default=LARGE_GRAPH_NODES,
+        help="precompute a layout of graphs with more vertices",
+    )
+    parser.add_argument(
+        "--analytics",
+        action="store_true",
+        help="add PageRank, eigenvector centrality and communities to the GEXF,"
+        " and size and color the HTML graph by PageRank and community",
+    )
+    run = parser.add_mutually_exclusive_group()
+    run.add_argument(
+        "--parallel",
+        type=int,
+        default=1,
+        metavar="N",
+        help=f"run up to N statements at once, at most {MAX_PARALLEL_STATEMENTS}",
+    )
+    run.add_argument(
+        "--stream",
+        action="store_true",
+        help="run statements one after another, writing CSV rows as pages"
+        " arrive instead of holding the results",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="log every stage to stderr as a JSON line, see Profile",
+    )
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=DEFAULT_PAGE_SIZE,
+        help="rows per page of MATCH and GO statements, with --stream",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        metavar="SECONDS",
+        help="kill statements, or pages with --stream, running for longer",
+    )
+    scan = parser.add_argument_group(
+        "bulk export", "scan a whole space on storaged instead of running queries"
+    )
+    scan.add_argument(
+        "--scan",
+        metavar="METAD",
+        help="comma separated host:port of metad, scanning --space with"
+        " BulkExport: --csv gets a file per tag and edge type",
+    )
+    scan.add_argument(
+        "--tags",
+        help="comma separated tags to scan, all by default, see --address;"
+        " with --import, the tags GEXF vertices are written to",
+    )
+    scan.add_argument(
+        "--edge-types",
+        help="comma separated edge types to scan, all by default; with --import,"
+        " the edge types of GEXF edges written",
+    )
+    scan.add_argument(
+        "--scan-workers",
+        type=int,
+        default=SCAN_WORKERS,
+        metavar="N",
+        help="partitions scanned at once",
+    )
+    load = parser.add_argument_group(
+        "bulk import", "write GEXF or CSV graphs to --space, see bulk_import"
+    )
+    load.add_argument(
+        "--import",
+        dest="import_files",
+        nargs="+",
+        metavar="FILE",
+        help="GEXF files, vertices_<tag>.csv and edges_<edge type>.csv files as"
+        " --scan writes them, or zips of these",
+    )
+    load.add_argument(
+        "--batch-rows",
+        type=int,
+        default=IMPORT_BATCH_ROWS,
+        metavar="N",
+        help="vertices or edges per INSERT statement",
+    )
+    load.add_argument(
+        "--import-workers",
+        type=int,
+        default=IMPORT_WORKERS,
+        metavar="N",
+        help=f"INSERT statements sent at once, at most {MAX_PARALLEL_STATEMENTS}",
+    )
+    load.add_argument(
+        "--retries",
+        type=int,
+        default=IMPORT_RETRIES,
+        metavar="N",
+        help="tries of a failed INSERT statement before its rows count as failed",
+    )
+    args = parser.parse_args(argv)
+    if args.import_files:
+        exports = args.gexf or args.csv or args.html or args.tables
+        if args.queries or args.scan or exports or not args.space:
+            parser.error("--import takes --space, and no queries or exports")
+    elif args.scan:
+        if args.queries or args.html or args.tables or not args.space:
+            parser.error("--scan takes --space, and --gexf or --csv only")
+        if not (args.gexf or args.csv):
+            parser.error("nothing to export, give --gexf or --csv")
+    elif not args.queries:
+        parser.error("give a file of queries, --scan or --import")
+    elif not (args.gexf or args.csv or args.html or args.tables):
+        parser.error("nothing to export, give --gexf, --csv, --html or --tables")
+    return args
+
+
+def export(args: argparse.Namespace) -> bool:
+    """Run the statements of args and write the exports it asks for.
+
+    Returns False if a statement failed; its error is printed and the other
+    statements are still exported.
+    """
+    if args.queries == "-":
+        queries = split_statements(sys.stdin.read())
+    else:
+        with open(args.queries, encoding="utf-8") as f:
+            queries = split_statements(f.read())
+    connection = (args.space, args.address, args.port, args.user, args.password)
+    if args.csv:
+        os.makedirs(args.csv, exist_ok=True)
+    tables = None
+    if args.tables:
+        os.makedirs(args.tables, exist_ok=True)
+        tables = ArrowGraphWriter()
+    profile = None
+    if args.profile:
+        enable_stage_logs()
+        profile = Profile(batch_version(args.space, queries))
+    watch = None
+    if args.timeout:
+        watch = StatementWatch(*connection[1:], timeout=args.timeout)
+
+    # tables and CSV files are written from the results, not the graph
+    model = GraphModel() if args.gexf or args.html else None
+    failed = set()
+    if args.stream:
+        # one open CSV file at a time, pages come in statement order
+        csv_file, csv_index = None, None
+        try:
+            for index, page, seconds in stream_statements(
+                queries,
+                *connection,
+                page_size=args.page_size,
+                profile=profile,
+                watch=watch,
+            ):
+                if not page.is_succeeded():
+                    failed.add(index)
+                    print(f"-- Query {index + 1}: {page.error_msg()}", file=sys.stderr)
+                    continue
+                print(
+                    f"-- Query {index + 1}: {page.row_size()} rows in {seconds:.3f}s",
+                    file=sys.stderr,
+                )
+                if model is not None:
+                    with _profiled(profile, "graph", index) as fields:
+                        model.select_query(index)
+                        render_result(model, page)
+                        fields["count"] = page.row_size()
+                if tables is not None:
+                    with _profiled(profile, "tables", index) as fields:
+                        tables.add_result(page)
+                        fields["count"] = page.row_size()
+                if args.csv:
+                    if index != csv_index:
+                        if csv_file is not None:
+                            csv_file.close()
+                        csv_file = open(
+                            _csv_path(args.csv, index),
+                            "w",
+                            newline="",
+                            encoding="utf-8",
+                        )
+                    with _profiled(profile, "csv", index) as fields:
+                        write_csv(page, csv_file, header=index != csv_index)
+                        fields["count"] = page.row_size()
+                    csv_index = index
+        finally:
+            if csv_file is not None:
+                csv_file.close()
+    else:
+        executed = run_statements(
+            queries,
+            *connection,
+            parallel=args.parallel > 1,
+            max_workers=args.parallel,
+            profile=profile,
+            watch=watch,
+        )
+        for index, (result, seconds, _) in enumerate(executed):
+            if not result.is_succeeded():
+                failed.add(index)
+                print(f"-- Query {index + 1}: {result.error_msg()}", file=sys.stderr)
+                continue
+            print(
+                f"-- Query {index + 1}: {result.row_size()} rows in {seconds:.3f}s",
+                file=sys.stderr,
+            )
+            if model is not None:
+                with _profiled(profile, "graph", index) as fields:
+                    create_graph(result, model)
+                    fields["count"] = result.row_size()
+            if tables is not None:
+                with _profiled(profile, "tables", index) as fields:
+                    tables.add_result(result)
+                    fields["count"] = result.row_size()
+            if args.csv:
+                with _profiled(profile, "csv", index) as fields, open(
+                    _csv_path(args.csv, index), "w", newline="", encoding="utf-8"
+                ) as csv_file:
+                    write_csv(result, csv_file)
+                    fields["count"] = result.row_size()
+
+    if model is not None:
+        print(
+            f"-- {model.num_nodes} vertices, {model.num_edges} edges", file=sys.stderr
+        )
+        if args.analytics:
+            analyze(model, profile=profile)
+        if model.num_nodes > args.layout_above:
+            with _profiled(profile, "layout") as fields:
+                layout_model(model)
+                fields["count"] = model.num_nodes
+    if args.gexf:
+        with _profiled(profile, "gexf"), _open_output(args.gexf) as out:
+            dump_gexf(model, out)
+    if args.html:
+        with _profiled(profile, "html") as fields:
+            mode = "Full" if args.html_mode == "full" else "Compact"
+            styled = ("pagerank", "community") if args.analytics else ()
+            data = html_export(to_network(model, *styled), mode).encode("utf-8")
+            if args.html.endswith(".gz"):
+                data = gzip.compress(data, compresslevel=6, mtime=0)
+            with _open_output(args.html) as out:
+                out.write(data)
+            fields["bytes"] = len(data)
+    if tables is not None:
+        with _profiled(profile, "tables") as fields:
+            tables.write(args.tables, args.tables_format)
+            fields["count"] = tables.num_nodes + tables.num_edges
+    return not failed
+
+
+def scan_export(args: argparse.Namespace) -> bool:
+    """Scan the space of args on storaged and write its CSV files and GEXF."""
+    meta_addrs = []
+    for meta in args.scan.split(","):
+        host, _, port = meta.strip().rpartition(":")
+        meta_addrs.append((host, int(port)))
+    if args.tags is None or args.edge_types is None:
+        tags, edge_types = space_schema(
+            args.space, args.address, args.port, args.user, args.password
+        )
+    if args.tags is not None:
+        tags = [tag.strip() for tag in args.tags.split(",") if tag.strip()]
+    if args.edge_types is not None:
+        edge_types = [e.strip() for e in args.edge_types.split(",") if e.strip()]
+    profile = None
+    if args.profile:
+        enable_stage_logs()
+        profile = Profile(batch_version(args.space, ["SCAN"]))
+    if args.csv:
+        os.makedirs(args.csv, exist_ok=True)
+    model = GraphModel() if args.gexf else None
+    source = StorageScanSource(meta_addrs, args.user, args.password)
+    export = None
+    try:
+        for export in bulk_export(
+            source,
+            args.space,
+            tags,
+            edge_types,
+            args.csv,
+            model,
+            workers=args.scan_workers,
+            profile=profile,
+        ):
+            pass
+    finally:
+        source.close()
+    rows = export.num_rows if export else 0
+    parts = {part for _, _, part in export.rows} if export else ()
+    print(
+        f"-- {rows} rows of {len(tags)} tags and {len(edge_types)} edge types,"
+        f" {len(parts)} partitions",
+        file=sys.stderr,
+    )
+    if model is not None:
+        if args.analytics:
+            analyze(model, profile=profile)
+        if model.num_nodes > args.layout_above:
+            with _profiled(profile, "layout") as fields:
+                layout_model(model)
+                fields["count"] = model.num_nodes
+        with _profiled(profile, "gexf"), _open_output(args.gexf) as out:
+            dump_gexf(model, out)
+    return True
+
+
+def import_graph(args: argparse.Namespace) -> bool:
+    """Write the files of args to its space, returns False if rows failed."""
+    tags = [tag.strip() for tag in (args.tags or "").split(",") if tag.strip()]
+    edge_types = [
+        name.strip() for name in (args.edge_types or "").split(",") if name.strip()
+    ]
+    profile = None
+    if args.profile:
+        enable_stage_logs()
+        profile = Profile(batch_version(args.space, ["IMPORT", *args.import_files]))
+
+    def records() -> Iterator[Tuple]:
+        for path in args.import_files:
+            with open(path, "rb") as f:
+                yield from graph_records(path, f, tags, edge_types)
+
+    progress = None
+    for progress in bulk_import(
+        records(),
+        args.space,
+        args.address,
+        args.port,
+        args.user,
+        args.password,
+        batch_rows=args.batch_rows,
+        workers=args.import_workers,
+        retries=args.retries,
+        profile=profile,
+    ):
+        pass
+    for (kind, name), rows in sorted(progress.rows.items()):
+        failed = progress.failed.get((kind, name), 0)
+        ignored = sorted(progress.ignored.get((kind, name), ()))
+        print(
+            f"-- {kind} {name}: {rows} rows written, {failed} failed"
+            + (f", not in its schema: {', '.join(ignored)}" if ignored else ""),
+            file=sys.stderr,
+        )
+    for error in progress.errors:
+        print(f"-- {error}", file=sys.stderr)
+    print(f"-- {progress.summary()}", file=sys.stderr)
+    return not progress.num_failed
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    try:
+        if args.import_files:
+            ok = import_graph(args)
+        else:
+            ok = scan_export(args) if args.scan else export(args)
+    except Exception as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        get_session_manager().close()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())